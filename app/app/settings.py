@@ -81,6 +81,8 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Worker processes write job progress concurrently with the web process
+        'OPTIONS': {'timeout': 20},
     }
 }
 
@@ -128,6 +130,57 @@ STATICFILES_DIRS = [
 MEDIA_ROOT = BASE_DIR / 'media'
 MEDIA_URL = '/media/'
 
+# Uploads are streamed to temporary files and hashed while they are received
+FILE_UPLOAD_HANDLERS = ['main.uploads.HashingUploadHandler']
+
+# Largest accepted upload in bytes, larger uploads are stopped while they are received
+MAX_UPLOAD_SIZE = 2 * 1024 ** 3
+
+# Limits of the zip archives processed in batch mode: number of files, and unpacked size of their images
+MAX_BATCH_MEMBERS = 20000
+MAX_BATCH_IMAGES_SIZE = 8 * 1024 ** 3
+
+# Total size of the outputs derived from the uploads: processed files, previews, processed frames, thumbnails and
+# results arrays. The outputs of the least recently used uploads are deleted beyond it, the results page then offers
+# to process those uploads again.
+OUTPUTS_CACHE_MAX_BYTES = 20 * 1024 ** 3
+
+# Recognition pipeline settings, see number_plate_recognition/config.py
+PIPELINE_CONFIG = {
+    'model_backend': 'pytorch',
+    'model_imgsz': 640,
+    'vehicle_conf': 0.25,
+    'license_plate_conf': 0.25,
+    'detector_iou': 0.7,
+    'batch_size': 8,
+    'detection_stride': 1,
+    'motion_threshold': None,
+    'tracker_max_age': 1,
+    'tracker_min_hits': 3,
+    'tracker_iou_threshold': 0.3,
+    'plate_search': 'frame',
+    'plate_min_overlap': 1.0,
+    'ocr_stop_score': 0.9,
+    'ocr_stop_agreements': 3,
+    'ocr_interval': 5,
+    'ocr_batch': False,
+    'ocr_workers': 1,
+    'queue_size': 4,
+    'render_buffer_size': 64,
+}
+
+# Stage, detection gate and OCR policy summaries of the pipeline are logged at INFO level
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'number_plate_recognition': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
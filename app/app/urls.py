@@ -25,5 +25,9 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('process-file/', views.process_file, name='process_file'),
     path('results/<int:file_id>/', views.get_processed_file, name='results'),
+    path('results/<int:file_id>/status/', views.get_job_status, name='job_status'),
+    path('results/<int:file_id>/reprocess/', views.reprocess_file, name='reprocess_file'),
     path('download-excel/<int:file_id>/', views.download_excel, name='download_excel'),
+    path('download-csv/<int:file_id>/', views.download_csv, name='download_csv'),
+    path('download-detections/<int:file_id>/', views.download_detections, name='download_detections'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,85 @@
+"""
+Measures the throughput of assigning license plates to tracked vehicles on synthetic dense traffic frames, with the
+former per-plate linear scan (util.get_car) against the batched assignment.
+
+Usage (from the app directory):
+    python benchmarks/bench_assignment.py --cars 10 50 200 --frames 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from number_plate_recognition.assignment import assign_plates_to_cars
+
+
+def get_car(license_plate, vehicle_track_ids):
+    """The former util.get_car: the first vehicle strictly containing the plate, in track order."""
+    x1, y1, x2, y2, *_ = license_plate
+
+    for j in range(len(vehicle_track_ids)):
+        xcar1, ycar1, xcar2, ycar2, _ = vehicle_track_ids[j]
+
+        if x1 > xcar1 and y1 > ycar1 and x2 < xcar2 and y2 < ycar2:
+            return vehicle_track_ids[j]
+
+    return -1, -1, -1, -1, -1
+
+
+def make_frame(car_count: int, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Builds a frame of queued traffic with overlapping vehicle boxes, and a plate for most vehicles.
+
+    Returns:
+        tuple: License plates as rows [x1, y1, x2, y2, score, class_id] and tracks as rows [x1, y1, x2, y2, id].
+    """
+    width = max(1920, car_count * 60)
+    x = rng.uniform(0, width - 240, car_count)
+    y = rng.uniform(0, 1080 - 180, car_count)
+    w = rng.uniform(160, 240, car_count)
+    h = w * 0.75
+    cars = np.column_stack((x, y, x + w, y + h, np.arange(1, car_count + 1)))
+
+    has_plate = rng.random(car_count) < 0.8
+    cx, bottom = (x + w / 2)[has_plate], (y + h * 0.9)[has_plate]
+    plates = np.column_stack((cx - 30, bottom - 15, cx + 30, bottom, rng.uniform(0.5, 1, len(cx)),
+                              np.zeros(len(cx))))
+    return plates[rng.permutation(len(plates))], cars
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='License plate to vehicle assignment throughput')
+    parser.add_argument('--cars', type=int, nargs='+', default=[10, 50, 200], help='Vehicles per frame')
+    parser.add_argument('--frames', type=int, default=1000, help='Frames per traffic density')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    assign_plates_to_cars(*make_frame(10, rng))  # imports the assignment solver
+    for car_count in args.cars:
+        frames = [make_frame(car_count, rng) for _ in range(args.frames)]
+        plate_count = sum(len(plates) for plates, _ in frames)
+
+        start = time.perf_counter()
+        scan_assigned = 0
+        for plates, cars in frames:
+            # The tracker returns an array, the detector boxes were converted to lists
+            scan_assigned += sum(get_car(plate, cars)[-1] != -1 for plate in plates.tolist())
+        scan_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batched_assigned = 0
+        for plates, cars in frames:
+            batched_assigned += len(assign_plates_to_cars(plates, cars))
+        batched_time = time.perf_counter() - start
+
+        print(f'{car_count:>4} cars/frame, {plate_count / args.frames:6.1f} plates/frame: '
+              f'scan {plate_count / scan_time:9.0f} plates/s ({scan_assigned} assigned), '
+              f'batched {plate_count / batched_time:9.0f} plates/s ({batched_assigned} assigned), '
+              f'speedup {scan_time / batched_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Compares the detector latency on CPU per inference backend and input size, with the batched calls the pipeline makes:
+both detectors on batches of --batch_size frames, and the license plate detector on the varying number of vehicle
+crops of a batch, as in 'vehicles' plate search. Missing exports are created next to the .pt files on first use,
+their creation is reported as part of the load time.
+
+Usage (from the app directory):
+    python benchmarks/bench_backends.py path/to/clip.mp4 --backends pytorch onnx openvino --imgsz 640 320 \
+        --batch_size 8
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Optional
+
+from common import read_frames, use_cpu
+
+use_cpu()
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from number_plate_recognition.config import PipelineConfig
+from number_plate_recognition.model_registry import BACKENDS, load_model
+from number_plate_recognition.paths import COCO_MODEL_PATH, LICENSE_PLATE_DETECTOR_MODEL_PATH
+from number_plate_recognition.plate_recognition import crop_vehicle, get_vehicle_boxes, vehicles
+
+
+def time_calls(model, batches: list[list], imgsz: int, **kwargs) -> tuple[list[float], list]:
+    """Calls the model once per batch, returning the latency per image of every call and the detections."""
+    latencies, detections = [], []
+    for batch in batches:
+        if not batch:
+            continue
+        start = time.perf_counter()
+        detections += model(batch, imgsz=imgsz, verbose=False, **kwargs)
+        latencies.append((time.perf_counter() - start) / len(batch))
+    return latencies, detections
+
+
+def report(backend: str, imgsz: int, name: str, load_time: Optional[float], latencies: list[float],
+           images: int) -> None:
+    load = f'load + warm-up {load_time:6.2f} s' if load_time is not None else ' ' * 23
+    print(f'{backend:<9} {imgsz:>4}px {name:<22} {load}, {images:>4} images, '
+          f'per image median {statistics.median(latencies) * 1000:7.1f} ms, '
+          f'mean {statistics.mean(latencies) * 1000:7.1f} ms')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Detector latency per inference backend')
+    parser.add_argument('video', help='Sample video (.mp4)')
+    parser.add_argument('--frames', type=int, default=32, help='Number of frames to detect on')
+    parser.add_argument('--batch_size', type=int, default=8, help='Frames per detector call')
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS), help='Backends to compare')
+    parser.add_argument('--imgsz', type=int, nargs='+', default=[640, 320], help='Model input sizes')
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.frames)
+    if not frames:
+        sys.exit(f'No frames could be read from {args.video}')
+
+    batches = [frames[i:i + args.batch_size] for i in range(0, len(frames), args.batch_size)]
+    padding = PipelineConfig().vehicle_crop_padding
+
+    for imgsz in args.imgsz:
+        for backend in args.backends:
+            start = time.perf_counter()
+            try:
+                coco_model = load_model(COCO_MODEL_PATH, backend, imgsz, args.batch_size)
+                coco_load_time = time.perf_counter() - start
+                start = time.perf_counter()
+                license_plate_detector = load_model(LICENSE_PLATE_DETECTOR_MODEL_PATH, backend, imgsz,
+                                                    args.batch_size)
+                license_plate_load_time = time.perf_counter() - start
+            except Exception as e:
+                print(f'{backend:<9} {imgsz:>4}px unavailable: {e}')
+                continue
+
+            latencies, vehicle_detections = time_calls(coco_model, batches, imgsz, classes=vehicles)
+            report(backend, imgsz, 'vehicles', coco_load_time, latencies, len(frames))
+
+            latencies, _ = time_calls(license_plate_detector, batches, imgsz)
+            report(backend, imgsz, 'license plates, frames', license_plate_load_time, latencies, len(frames))
+
+            # One call per batch with the crops of all its vehicles, so the number of images varies between calls
+            crops = [[crop_vehicle(frame, car, padding)[0] for car in get_vehicle_boxes(detections)]
+                     for frame, detections in zip(frames, vehicle_detections)]
+            crop_batches = [[crop for frame_crops in crops[i:i + args.batch_size] for crop in frame_crops if crop.size]
+                            for i in range(0, len(frames), args.batch_size)]
+            crop_count = sum(len(batch) for batch in crop_batches)
+            if crop_count:
+                latencies, _ = time_calls(license_plate_detector, crop_batches, imgsz)
+                report(backend, imgsz, 'license plates, crops', None, latencies, crop_count)
+
+
+if __name__ == '__main__':
+    main()
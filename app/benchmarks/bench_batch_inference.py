@@ -0,0 +1,45 @@
+"""
+Reports detector throughput on CPU for different frame batch sizes.
+
+Usage (from the app directory):
+    python benchmarks/bench_batch_inference.py path/to/clip.mp4 --frames 64
+"""
+import argparse
+import os
+import sys
+import time
+
+from common import read_frames, use_cpu
+
+use_cpu()
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from number_plate_recognition import plate_recognition
+
+BATCH_SIZES = [1, 4, 8, 16]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Detector throughput per frame batch size')
+    parser.add_argument('video', help='Sample video (.mp4)')
+    parser.add_argument('--frames', type=int, default=64, help='Number of frames to decode and detect on')
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.frames)
+    if not frames:
+        sys.exit(f'No frames could be read from {args.video}')
+
+    # Load the models and warm them up outside of the measurements
+    plate_recognition.detect(frames[:1])
+
+    for batch_size in BATCH_SIZES:
+        start = time.perf_counter()
+        for i in range(0, len(frames), batch_size):
+            plate_recognition.detect(frames[i:i + batch_size])
+        elapsed = time.perf_counter() - start
+
+        print(f'batch size {batch_size:>2}: {len(frames) / elapsed:6.2f} frames/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Measures the plate and detection exports on a temporary database: total time, time to the first byte and peak
+Python memory of the former in-memory workbook against the write-only workbook and the streamed CSV exports.
+
+Usage (from the app directory):
+    python benchmarks/bench_export.py --rows 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+import django
+from django.conf import settings
+
+django.setup()
+
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory
+from openpyxl import Workbook
+
+from main import views
+from main.models import Files, Plates
+from number_plate_recognition.results_store import RESULTS_DTYPE, save_results
+
+
+def download_excel_in_memory(request, file_id):
+    """The former export: every cell of the workbook is kept in memory until it is saved."""
+    wb = Workbook()
+    ws = wb.active
+    ws.append(['Frame Number', 'Plate Number', 'Accuracy %'])
+
+    for data in Plates.objects.filter(file_id=file_id):
+        ws.append([data.frame_number, data.plate_number, data.accuracy])
+
+    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    response['Content-Disposition'] = 'attachment; filename=processed_data.xlsx'
+    wb.save(response)
+
+    return response
+
+
+def consume(view, file_id: int) -> tuple[float, int]:
+    """Calls the view and reads the whole response, returning the time to the first byte and the response size."""
+    start = time.perf_counter()
+    response = view(RequestFactory().get('/'), file_id)
+
+    if not response.streaming:
+        return time.perf_counter() - start, len(response.content)
+
+    first_byte = None
+    size = 0
+    for chunk in response.streaming_content:
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        size += len(chunk)
+    response.close()
+    return first_byte, size
+
+
+def measure(view, file_id: int) -> tuple[float, float, int, float]:
+    """Returns the total time, time to the first byte, response size and peak traced memory in MiB of a view."""
+    start = time.perf_counter()
+    first_byte, size = consume(view, file_id)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    consume(view, file_id)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, first_byte, size, peak / 2 ** 20
+
+
+def make_file(root: str, row_count: int) -> Files:
+    rng = np.random.default_rng(0)
+    fp = Files.objects.create()
+
+    Plates.objects.bulk_create((Plates(file_id=fp.id, frame_number=i, plate_number=f'AB{i % 100:02d}CDE',
+                                       accuracy=round(float(score), 2), processed_frame=f'processed_frames/{i}.jpg')
+                                for i, score in enumerate(rng.uniform(0, 100, row_count))), batch_size=5000)
+
+    results = np.zeros(row_count, dtype=RESULTS_DTYPE)
+    results['frame_number'] = np.arange(row_count) // 4
+    results['car_id'] = np.arange(row_count) % 4 + 1
+    results['car_bbox'] = rng.uniform(0, 1000, (row_count, 4))
+    results['license_plate_bbox'] = rng.uniform(0, 1000, (row_count, 4))
+    results['license_plate_bbox_score'] = rng.uniform(0, 1, row_count)
+    results['license_number'] = 'AB12CDE'
+    results['license_number_score'] = rng.uniform(0, 1, row_count)
+
+    os.makedirs(os.path.join(root, 'results'))
+    save_results(results, os.path.join(root, 'results', 'clip.npy'))
+    fp.results_file = 'results/clip.npy'
+    fp.save()
+    return fp
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Export time and memory at a given number of rows')
+    parser.add_argument('--rows', type=int, default=100000, help='Number of plates and detections exported')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        settings.DATABASES['default']['NAME'] = os.path.join(root, 'db.sqlite3')
+        settings.MEDIA_ROOT = root
+        call_command('migrate', run_syncdb=True, verbosity=0)
+
+        fp = make_file(root, args.rows)
+
+        exports = {
+            'excel, in memory (former)': download_excel_in_memory,
+            'excel, write-only': views.download_excel,
+            'plates csv, streamed': views.download_csv,
+            'detections csv, streamed': views.download_detections,
+        }
+        for name, view in exports.items():
+            elapsed, first_byte, size, peak = measure(view, fp.id)
+            print(f'{name:<27} {args.rows} rows: {elapsed:6.2f} s, first byte after {first_byte:6.3f} s, '
+                  f'{size / 2 ** 20:6.1f} MiB, peak memory {peak:7.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
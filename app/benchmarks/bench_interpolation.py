@@ -0,0 +1,169 @@
+"""
+Measures bounding box interpolation on synthetic tracks and checks it against the previous quadratic implementation,
+which worked on CSV string rows.
+
+Usage (from the app directory):
+    python benchmarks/bench_interpolation.py --rows 10000 100000 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.interpolate import interp1d
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from number_plate_recognition.add_missing_data import interpolate_bounding_boxes
+from number_plate_recognition.results_store import RESULTS_DTYPE, results_to_rows
+
+
+def make_results(row_count: int, track_length: int = 500, seed: int = 0) -> np.ndarray:
+    """
+    Builds a results array like the one produced by plate_recognition.py, ordered by frame number.
+
+    Every track is a car moving across the frame, detected in roughly two out of three frames. Coordinates are
+    multiples of 1/4, so they are exact in float32 and the previous float64 implementation sees the same values.
+    """
+    rng = np.random.default_rng(seed)
+    frame_numbers, car_ids, positions = [], [], []
+    detections = 0
+    while detections < row_count:
+        car_id = len(frame_numbers) + 1
+        first_frame = int(rng.integers(0, 10 * track_length))
+        frames = np.flatnonzero(rng.random(track_length) < 0.66)[:row_count - detections]
+        start = rng.uniform(0, 1500, 2)
+        velocity = rng.uniform(-3, 3, 2)
+        frame_numbers.append(frames + first_frame)
+        car_ids.append(np.full(len(frames), car_id))
+        positions.append(start + velocity * frames[:, None] + rng.normal(0, 1, (len(frames), 2)))
+        detections += len(frames)
+
+    results = np.zeros(detections, dtype=RESULTS_DTYPE)
+    results['frame_number'] = np.concatenate(frame_numbers)
+    results['car_id'] = np.concatenate(car_ids)
+    x, y = (np.round(np.concatenate(positions) * 4) / 4).T
+    results['car_bbox'] = np.column_stack((x, y, x + 200, y + 150))
+    results['license_plate_bbox'] = np.column_stack((x + 60, y + 110, x + 140, y + 135))
+    results['license_plate_bbox_score'] = rng.uniform(0.5, 1, detections)
+    results['license_number'] = 'AB12CDE'
+    results['license_number_score'] = rng.uniform(0, 1, detections)
+
+    return results[np.argsort(results['frame_number'], kind='stable')]
+
+
+def matches_reference(interpolated: np.ndarray, expected: list[dict[str, str]]) -> bool:
+    """Checks the interpolated records against the string rows of the previous implementation."""
+    if len(interpolated) != len(expected):
+        return False
+
+    return all(
+        record['frame_number'] == int(row['frame_number']) and record['car_id'] == int(row['car_id']) and
+        np.array_equal(record['car_bbox'], np.array(row['car_bbox'].split(), dtype=np.float32)) and
+        np.array_equal(record['license_plate_bbox'], np.array(row['license_plate_bbox'].split(), dtype=np.float32)) and
+        record['license_plate_bbox_score'] == np.float32(row['license_plate_bbox_score']) and
+        record['license_number'] == row['license_number'] and
+        record['license_number_score'] == np.float32(row['license_number_score'])
+        for record, row in zip(interpolated, expected))
+
+
+def reference_interpolate_bounding_boxes(data):
+    """The previous implementation, kept to check that the output is unchanged."""
+    frame_numbers = np.array([int(row['frame_number']) for row in data])
+    car_ids = np.array([int(float(row['car_id'])) for row in data])
+    car_bboxes = np.array([list(map(float, row['car_bbox'][1:-1].split())) for row in data])
+    license_plate_bboxes = np.array([list(map(float, row['license_plate_bbox'][1:-1].split())) for row in data])
+
+    interpolated_data = []
+    unique_car_ids = np.unique(car_ids)
+    for car_id in unique_car_ids:
+
+        frame_numbers_ = [p['frame_number'] for p in data if int(float(p['car_id'])) == int(float(car_id))]
+
+        car_mask = car_ids == car_id
+        car_frame_numbers = frame_numbers[car_mask]
+        car_bboxes_interpolated = []
+        license_plate_bboxes_interpolated = []
+
+        first_frame_number = car_frame_numbers[0]
+
+        for i in range(len(car_bboxes[car_mask])):
+            frame_number = car_frame_numbers[i]
+            car_bbox = car_bboxes[car_mask][i]
+            license_plate_bbox = license_plate_bboxes[car_mask][i]
+
+            if i > 0:
+                prev_frame_number = car_frame_numbers[i-1]
+                prev_car_bbox = car_bboxes_interpolated[-1]
+                prev_license_plate_bbox = license_plate_bboxes_interpolated[-1]
+
+                if frame_number - prev_frame_number > 1:
+                    frames_gap = frame_number - prev_frame_number
+                    x = np.array([prev_frame_number, frame_number])
+                    x_new = np.linspace(prev_frame_number, frame_number, num=frames_gap, endpoint=False)
+                    interp_func = interp1d(x, np.vstack((prev_car_bbox, car_bbox)), axis=0, kind='linear')
+                    interpolated_car_bboxes = interp_func(x_new)
+                    interp_func = interp1d(x, np.vstack((prev_license_plate_bbox, license_plate_bbox)), axis=0,
+                                           kind='linear')
+                    interpolated_license_plate_bboxes = interp_func(x_new)
+
+                    car_bboxes_interpolated.extend(interpolated_car_bboxes[1:])
+                    license_plate_bboxes_interpolated.extend(interpolated_license_plate_bboxes[1:])
+
+            car_bboxes_interpolated.append(car_bbox)
+            license_plate_bboxes_interpolated.append(license_plate_bbox)
+
+        for i in range(len(car_bboxes_interpolated)):
+            frame_number = first_frame_number + i
+            row = {}
+            row['frame_number'] = str(frame_number)
+            row['car_id'] = str(car_id)
+            row['car_bbox'] = ' '.join(map(str, car_bboxes_interpolated[i]))
+            row['license_plate_bbox'] = ' '.join(map(str, license_plate_bboxes_interpolated[i]))
+
+            if str(frame_number) not in frame_numbers_:
+                row['license_plate_bbox_score'] = '0'
+                row['license_number'] = '0'
+                row['license_number_score'] = '0'
+            else:
+                original_row = [p for p in data if int(p['frame_number']) == frame_number and
+                                int(float(p['car_id'])) == int(float(car_id))][0]
+                row['license_plate_bbox_score'] = original_row['license_plate_bbox_score']
+                row['license_number'] = original_row['license_number']
+                row['license_number_score'] = original_row['license_number_score']
+
+            interpolated_data.append(row)
+
+    return interpolated_data
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Bounding box interpolation on synthetic tracks')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help='Numbers of detection rows to interpolate')
+    parser.add_argument('--reference-rows', type=int, default=10000,
+                        help='Largest number of rows also run through the previous implementation, which is quadratic')
+    args = parser.parse_args()
+
+    for row_count in args.rows:
+        results = make_results(row_count)
+
+        start = time.perf_counter()
+        interpolated = interpolate_bounding_boxes(results)
+        elapsed = time.perf_counter() - start
+        line = f'{row_count:>8} rows -> {len(interpolated):>8} rows: {elapsed:8.3f} s'
+
+        if row_count <= args.reference_rows:
+            rows = results_to_rows(results)
+            start = time.perf_counter()
+            expected = reference_interpolate_bounding_boxes(rows)
+            reference_elapsed = time.perf_counter() - start
+            identical = matches_reference(interpolated, expected)
+            line += f', previous {reference_elapsed:8.3f} s ({reference_elapsed / elapsed:.0f}x), ' \
+                    f'output {"identical" if identical else "DIFFERENT"}'
+
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
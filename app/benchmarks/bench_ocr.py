@@ -0,0 +1,86 @@
+"""
+Compares the OCR of synthetic license plate crops with and without EasyOCR's text detector.
+
+readtext runs the CRAFT text detector on every crop before recognizing it and is what the pipeline uses by default,
+readtext_batched in addition resizes the crops to a fixed size. With PipelineConfig.ocr_batch the pipeline passes all
+crops as text boxes of one image to recognize instead, see util.recognize_crops. Besides the throughput, the readings
+of every method are compared with the ones of readtext.
+
+Usage (from the app directory):
+    python benchmarks/bench_ocr.py --crops 64
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from number_plate_recognition.util import get_reader, parse_license_plate_detections, read_license_plate_batch
+
+# Size the crops are resized to for readtext_batched
+READTEXT_BATCHED_WIDTH = 320
+READTEXT_BATCHED_HEIGHT = 80
+
+
+def random_plate_text() -> str:
+    letters, digits = string.ascii_uppercase, string.digits
+    return ''.join(random.choice(letters) for _ in range(2)) + ''.join(random.choice(digits) for _ in range(2)) + \
+        ''.join(random.choice(letters) for _ in range(3))
+
+
+def make_crop(text: str) -> np.ndarray:
+    """Draws a binarized license plate crop of random size, like the ones produced by the detector."""
+    width = random.randint(120, 260)
+    height = int(width / random.uniform(3.5, 4.5))
+    crop = np.zeros((height, width), dtype=np.uint8)
+    font_scale = height / 40
+    (text_width, text_height), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 2)
+    origin = ((width - text_width) // 2, (height + text_height) // 2)
+    cv2.putText(crop, text, origin, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 255, 2)
+    return crop
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='OCR throughput with and without the text detector')
+    parser.add_argument('--crops', type=int, default=64, help='Number of synthetic plate crops')
+    args = parser.parse_args()
+
+    random.seed(0)
+    texts = [random_plate_text() for _ in range(args.crops)]
+    crops = [make_crop(text) for text in texts]
+
+    # Load and warm up the reader outside of the measurements
+    reader = get_reader()
+
+    def readtext():
+        return [parse_license_plate_detections(reader.readtext(crop)) for crop in crops]
+
+    def readtext_batched():
+        detections_per_crop = reader.readtext_batched(crops, n_width=READTEXT_BATCHED_WIDTH,
+                                                      n_height=READTEXT_BATCHED_HEIGHT, batch_size=len(crops))
+        return [parse_license_plate_detections(detections) for detections in detections_per_crop]
+
+    methods = (('readtext', readtext),
+               ('readtext_batched', readtext_batched),
+               ('recognize batch', lambda: read_license_plate_batch(crops)))
+
+    baseline = None
+    for name, method in methods:
+        start = time.perf_counter()
+        readings = method()
+        elapsed = time.perf_counter() - start
+
+        baseline = baseline or readings
+        correct = sum(text == expected for (text, _), expected in zip(readings, texts))
+        agreeing = sum(text == baseline_text for (text, _), (baseline_text, _) in zip(readings, baseline))
+        print(f'{name:>16}: {len(crops) / elapsed:7.2f} crops/s, {correct}/{len(crops)} read correctly, '
+              f'{agreeing}/{len(crops)} same as readtext')
+
+
+if __name__ == '__main__':
+    main()
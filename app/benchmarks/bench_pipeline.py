@@ -0,0 +1,123 @@
+"""
+Compares the per-upload wall time of the in-process pipeline against the former chain of three subprocesses, both
+with the stage scripts of the baseline and with the current ones.
+
+The baseline scripts are checked out of git, by default from the first commit of the repository, into a temporary
+copy of the app that shares the model weights of this one.
+
+Usage (from the app directory):
+    python benchmarks/bench_pipeline.py path/to/clip.mp4 --repeats 3 --baseline_ref <commit>
+"""
+import argparse
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from number_plate_recognition import pipeline
+from number_plate_recognition.paths import COCO_MODEL_PATH, SCRIPTS_WORKSPACE
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SUBPROCESS_STAGES = ['plate_recognition.py', 'add_missing_data.py', 'visualize.py']
+
+# Upload buffer and output folders the baseline scripts work in, relative to the app directory
+BASELINE_BUFFER_DIRS = [os.path.join('media', 'buffer', name) for name in ('uploads', 'outputs', 'processed_frames')]
+
+
+def stage_upload(file_path: str) -> dict[str, str]:
+    """Copies the sample file into an empty upload buffer."""
+    SCRIPTS_WORKSPACE.create()
+    shutil.copy(file_path, SCRIPTS_WORKSPACE.uploads_dir)
+    return SCRIPTS_WORKSPACE.get_uploaded_file_info()
+
+
+def run_subprocess_chain(app_dir: str = APP_DIR) -> None:
+    for stage in SUBPROCESS_STAGES:
+        subprocess.run([sys.executable, os.path.join('number_plate_recognition', stage)], cwd=app_dir, check=True,
+                       stdout=subprocess.DEVNULL)
+
+
+def checkout_baseline(ref: str, directory: str) -> str:
+    """
+    Extracts the recognition scripts of a commit into a fresh app directory, with the model weights of this app.
+
+    Args:
+        ref: Commit to take the scripts from, the first commit of the repository if empty.
+        directory: Empty directory receiving the app.
+
+    Returns:
+        str: The app directory to run the baseline scripts from.
+    """
+    if not ref:
+        ref = subprocess.run(['git', 'rev-list', '--max-parents=0', 'HEAD'], cwd=APP_DIR, check=True,
+                             capture_output=True, text=True).stdout.split()[0]
+    # Run from the app directory, git archives the paths relative to it
+    archive = subprocess.run(['git', 'archive', ref, 'number_plate_recognition'], cwd=APP_DIR, check=True,
+                             capture_output=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(directory)
+
+    os.symlink(os.path.dirname(COCO_MODEL_PATH), os.path.join(directory, 'number_plate_recognition', 'models'))
+    return directory
+
+
+def stage_baseline_upload(app_dir: str, file_path: str) -> None:
+    """Copies the sample file into the emptied upload buffer of the baseline app."""
+    for folder in BASELINE_BUFFER_DIRS:
+        shutil.rmtree(os.path.join(app_dir, folder), ignore_errors=True)
+        os.makedirs(os.path.join(app_dir, folder))
+    shutil.copy(file_path, os.path.join(app_dir, BASELINE_BUFFER_DIRS[0]))
+
+
+def timed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='In-process pipeline vs. subprocess chain')
+    parser.add_argument('file', help='Sample photo (.jpg) or video (.mp4)')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--baseline_ref', default='', help='Commit of the baseline scripts, the first one by default')
+    args = parser.parse_args()
+
+    baseline_times = []
+    with tempfile.TemporaryDirectory() as directory:
+        baseline_dir = checkout_baseline(args.baseline_ref, directory)
+        for _ in range(args.repeats):
+            stage_baseline_upload(baseline_dir, args.file)
+            baseline_times.append(timed(run_subprocess_chain, baseline_dir))
+
+    subprocess_times = []
+    for _ in range(args.repeats):
+        stage_upload(args.file)
+        subprocess_times.append(timed(run_subprocess_chain))
+
+    cold_time = timed(pipeline.run, stage_upload(args.file), SCRIPTS_WORKSPACE)
+
+    in_process_times = []
+    for _ in range(args.repeats):
+        uploaded_file = stage_upload(args.file)
+        in_process_times.append(timed(pipeline.run, uploaded_file, SCRIPTS_WORKSPACE))
+
+    SCRIPTS_WORKSPACE.create()
+
+    baseline_mean = sum(baseline_times) / len(baseline_times)
+    subprocess_mean = sum(subprocess_times) / len(subprocess_times)
+    in_process_mean = sum(in_process_times) / len(in_process_times)
+    print(f'baseline chain:        {baseline_mean:.2f} s/upload (mean of {args.repeats})')
+    print(f'subprocess chain:      {subprocess_mean:.2f} s/upload (mean of {args.repeats})')
+    print(f'in-process, cold:      {cold_time:.2f} s/upload (includes model loading)')
+    print(f'in-process, warm:      {in_process_mean:.2f} s/upload (mean of {args.repeats})')
+    print(f'speedup (warm):        {baseline_mean / in_process_mean:.1f}x over the baseline chain, '
+          f'{subprocess_mean / in_process_mean:.1f}x over the subprocess chain')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Measures video rendering time versus video length on synthetic videos, and the per-frame lookup of the results
+with the former full scan against the frame index.
+
+Usage (from the app directory):
+    python benchmarks/bench_render.py --frames 250 1000 4000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from number_plate_recognition import visualize
+from number_plate_recognition.add_missing_data import interpolate_bounding_boxes
+from number_plate_recognition.paths import Workspace
+from number_plate_recognition.results_store import RESULTS_DTYPE, FrameIndex
+
+WIDTH, HEIGHT = 640, 360
+CARS_ON_SCREEN = 4
+TRACK_LENGTH = 150
+
+
+def make_video(path: str, frame_count: int) -> None:
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 25, (WIDTH, HEIGHT))
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 255, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+    for _ in range(frame_count):
+        out.write(background)
+    out.release()
+
+
+def make_results(frame_count: int, seed: int = 0) -> np.ndarray:
+    """Cars crossing the frame one after another, with CARS_ON_SCREEN visible at any time."""
+    rng = np.random.default_rng(seed)
+    records = []
+    car_id = 0
+    for first_frame in range(0, frame_count, TRACK_LENGTH // CARS_ON_SCREEN):
+        car_id += 1
+        frames = np.arange(first_frame, min(first_frame + TRACK_LENGTH, frame_count), 3)
+        y = rng.uniform(20, HEIGHT - 140)
+        for frame_number in frames:
+            x = 20 + (WIDTH - 200) * (frame_number - first_frame) / TRACK_LENGTH
+            records.append((frame_number, car_id, (x, y, x + 160, y + 120), (x + 50, y + 90, x + 110, y + 110),
+                            0.9, 'AB12CDE', rng.uniform(0, 1)))
+    return np.array(records, dtype=RESULTS_DTYPE)
+
+
+def time_lookups(results: np.ndarray, frame_count: int) -> tuple[float, float]:
+    start = time.perf_counter()
+    for frame_number in range(frame_count):
+        results[results['frame_number'] == frame_number]
+    scan_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frame_index = FrameIndex(results)
+    for frame_number in range(frame_count):
+        frame_index.get(frame_number)
+    index_time = time.perf_counter() - start
+
+    return scan_time, index_time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Render time versus video length')
+    parser.add_argument('--frames', type=int, nargs='+', default=[250, 1000, 4000], help='Video lengths in frames')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        for frame_count in args.frames:
+            video_path = os.path.join(root, 'clip.mp4')
+            make_video(video_path, frame_count)
+            results = interpolate_bounding_boxes(make_results(frame_count))
+
+            scan_time, index_time = time_lookups(results, frame_count)
+
+            workspace = Workspace(os.path.join(root, 'workspace'))
+            workspace.create()
+            start = time.perf_counter()
+            visualize.render({'name': 'clip.mp4', 'path': video_path}, workspace, results)
+            render_time = time.perf_counter() - start
+
+            print(f'{frame_count:>6} frames, {len(results):>7} records: render {render_time:7.2f} s '
+                  f'({frame_count / render_time:6.1f} frames/s), lookups: scan {scan_time:7.3f} s, '
+                  f'index {index_time:6.3f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Reports detector speed and detection recall per model input size on a sample clip.
+
+The detections at the largest input size are the reference: recall is the share of the reference boxes found again at
+the smaller size with an IOU of at least --match_iou.
+
+Usage (from the app directory):
+    python benchmarks/bench_resolution.py path/to/clip.mp4 --imgsz 1280 960 640 480 320 --frames 64
+"""
+import argparse
+import os
+import sys
+import time
+
+from common import read_frames, use_cpu
+
+use_cpu()
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from number_plate_recognition import plate_recognition
+from number_plate_recognition.config import PipelineConfig
+from number_plate_recognition.sort.tracker import iou_batch
+
+
+def detect(frames: list, config: PipelineConfig) -> tuple[float, list[np.ndarray], list[np.ndarray]]:
+    """Returns the detection time, and the vehicle and license plate boxes of every frame."""
+    start = time.perf_counter()
+    vehicles, license_plates = [], []
+    for i in range(0, len(frames), config.batch_size):
+        vehicle_detections, license_plate_detections = plate_recognition.detect(frames[i:i + config.batch_size],
+                                                                                config)
+        vehicles += [plate_recognition.get_boxes(detections) for detections in vehicle_detections]
+        license_plates += [plate_recognition.get_boxes(detections) for detections in license_plate_detections]
+    return time.perf_counter() - start, vehicles, license_plates
+
+
+def recall(found: list[np.ndarray], reference: list[np.ndarray], match_iou: float) -> float:
+    """Share of the reference boxes overlapping a found box of the same frame by at least match_iou."""
+    matched = total = 0
+    for boxes, expected in zip(found, reference):
+        total += len(expected)
+        if len(boxes) and len(expected):
+            matched += int((iou_batch(expected[:, :4], boxes[:, :4]).max(axis=1) >= match_iou).sum())
+    return matched / total if total else 1.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Detector speed and recall per input size')
+    parser.add_argument('video', help='Sample video (.mp4)')
+    parser.add_argument('--frames', type=int, default=64, help='Number of frames to detect on')
+    parser.add_argument('--imgsz', type=int, nargs='+', default=[1280, 960, 640, 480, 320], help='Input sizes')
+    parser.add_argument('--batch_size', type=int, default=8, help='Frames per detector call')
+    parser.add_argument('--match_iou', type=float, default=0.5, help='Minimum IOU with a reference box')
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.frames)
+    if not frames:
+        sys.exit(f'No frames could be read from {args.video}')
+
+    sizes = sorted(args.imgsz, reverse=True)
+    reference = None
+
+    for imgsz in sizes:
+        config = PipelineConfig(model_imgsz=imgsz, batch_size=args.batch_size)
+        plate_recognition.load_models(config)  # load and warm up outside of the measurement
+
+        elapsed, vehicles, license_plates = detect(frames, config)
+        if reference is None:
+            reference = vehicles, license_plates
+
+        print(f'imgsz {imgsz:>4}: {len(frames) / elapsed:6.2f} frames/s, '
+              f'vehicle recall {recall(vehicles, reference[0], args.match_iou):6.1%}, '
+              f'license plate recall {recall(license_plates, reference[1], args.match_iou):6.1%} '
+              f'(reference imgsz {sizes[0]})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Tracking speed of the original SORT and the batched tracker on the recorded MOT detections shipped with sort/,
+checking that both report the same track IDs and boxes.
+
+Usage (from the app directory):
+    python benchmarks/bench_tracker.py --max_age 1 --min_hits 3
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from number_plate_recognition.sort import tracker
+from number_plate_recognition.sort.batched_sort import BatchedSort
+
+SEQ_PATH = os.path.join(os.path.dirname(__file__), '..', 'number_plate_recognition', 'sort', 'data')
+
+
+def load_sequence(seq_dets_fn: str) -> list[np.ndarray]:
+    """Returns the detections [x1, y1, x2, y2, score] of every frame of a MOT det.txt file."""
+    seq_dets = np.loadtxt(seq_dets_fn, delimiter=',')
+    frames = []
+    for frame in range(int(seq_dets[:, 0].max())):
+        frame += 1  # detection and frame numbers begin at 1
+        dets = seq_dets[seq_dets[:, 0] == frame, 2:7]
+        dets[:, 2:4] += dets[:, 0:2]  # convert to [x1,y1,w,h] to [x1,y1,x2,y2]
+        frames.append(dets)
+    return frames
+
+
+def run(tracker, frames: list[np.ndarray]) -> tuple[float, list[np.ndarray]]:
+    outputs = []
+    start = time.perf_counter()
+    for dets in frames:
+        outputs.append(tracker.update(dets))
+    return time.perf_counter() - start, outputs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='SORT vs. batched tracker speed')
+    parser.add_argument('--seq_path', help='Path to detections.', type=str, default=SEQ_PATH)
+    parser.add_argument('--phase', help='Subdirectory in seq_path.', type=str, default='train')
+    parser.add_argument('--max_age', help='Maximum number of frames to keep alive a track without associated '
+                                          'detections.', type=int, default=1)
+    parser.add_argument('--min_hits', help='Minimum number of associated detections before track is initialised.',
+                        type=int, default=3)
+    parser.add_argument('--iou_threshold', help='Minimum IOU for match.', type=float, default=0.3)
+    args = parser.parse_args()
+
+    total_frames = 0
+    sort_time = batched_time = 0.0
+    mismatched_frames = 0
+
+    pattern = os.path.join(args.seq_path, args.phase, '*', 'det', 'det.txt')
+    for seq_dets_fn in sorted(glob.glob(pattern)):
+        frames = load_sequence(seq_dets_fn)
+        total_frames += len(frames)
+
+        # Track IDs of tracker.Sort come from a process-wide counter, the batched tracker counts per instance
+        tracker.KalmanBoxTracker.count = 0
+        elapsed, expected = run(tracker.Sort(args.max_age, args.min_hits, args.iou_threshold), frames)
+        sort_time += elapsed
+
+        elapsed, outputs = run(BatchedSort(args.max_age, args.min_hits, args.iou_threshold), frames)
+        batched_time += elapsed
+
+        mismatched_frames += sum(not np.allclose(output, reference) if output.shape == reference.shape else True
+                                 for output, reference in zip(outputs, expected))
+
+    print(f'sort.py:       {sort_time:.3f} s for {total_frames} frames or {total_frames / sort_time:.1f} FPS')
+    print(f'batched:       {batched_time:.3f} s for {total_frames} frames or {total_frames / batched_time:.1f} FPS')
+    print(f'speedup:       {sort_time / batched_time:.1f}x')
+    print(f'mismatched:    {mismatched_frames} frames with different IDs or boxes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Measures the import time of the worker and the tracker in fresh interpreters, next to the plotting imports sort.py
+used to run at import time.
+
+Usage (from the app directory):
+    python benchmarks/bench_worker_startup.py --repeats 5 --slowest 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Import statements timed in a fresh interpreter each
+TARGETS = {
+    'tracker core': 'import number_plate_recognition.sort.tracker',
+    'batched tracker': 'import number_plate_recognition.sort.batched_sort',
+    'former sort.py plotting imports': "import matplotlib; matplotlib.use('TkAgg'); import matplotlib.pyplot, "
+                                       "matplotlib.patches; from skimage import io",
+    'worker (django.setup + main.jobs)': "import os, django; os.environ.setdefault('DJANGO_SETTINGS_MODULE', "
+                                         "'app.settings'); django.setup(); import main.jobs",
+}
+
+
+def run_import(statement: str, *options: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *options, '-c', statement], cwd=APP_DIR, capture_output=True, text=True)
+
+
+def time_import(statement: str, repeats: int) -> tuple[float, str]:
+    """Returns the median wall time of the import, or the last error line if it fails."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        completed = run_import(statement)
+        times.append(time.perf_counter() - start)
+        if completed.returncode != 0:
+            return 0.0, completed.stderr.strip().splitlines()[-1]
+    return statistics.median(times), ''
+
+
+def slowest_imports(statement: str, count: int) -> list[tuple[int, str]]:
+    """Returns the top-level packages with the largest cumulative import time, in microseconds."""
+    completed = run_import(statement, '-X', 'importtime')
+    cumulative = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative_us, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        if cumulative_us.isdigit() and not name.startswith(' '):
+            package = name.split('.')[0]
+            cumulative[package] = max(cumulative.get(package, 0), int(cumulative_us))
+    return sorted(((us, package) for package, us in cumulative.items()), reverse=True)[:count]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Worker and tracker import time')
+    parser.add_argument('--repeats', type=int, default=5, help='Interpreter starts per import')
+    parser.add_argument('--slowest', type=int, default=10, help='Number of slowest worker imports to list')
+    args = parser.parse_args()
+
+    baseline, _ = time_import('pass', args.repeats)
+    print(f'{"interpreter start":<36} {baseline:6.3f} s')
+
+    for name, statement in TARGETS.items():
+        elapsed, error = time_import(statement, args.repeats)
+        if error:
+            print(f'{name:<36}  failed: {error}')
+        else:
+            print(f'{name:<36} {elapsed:6.3f} s ({elapsed - baseline:+.3f} s over interpreter start)')
+
+    print('\nSlowest packages on the worker import path (cumulative):')
+    for us, package in slowest_imports(TARGETS['worker (django.setup + main.jobs)'], args.slowest):
+        print(f'  {us / 1e6:6.3f} s  {package}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+"""
+Helpers shared by the detector benchmarks, which are run as scripts from the app directory so this module is found
+next to them.
+"""
+import os
+
+import cv2
+
+
+def use_cpu() -> None:
+    """Hides the GPUs, so the benchmark runs on the CPU even if a GPU is available. Call it before loading torch."""
+    os.environ['CUDA_VISIBLE_DEVICES'] = ''
+
+
+def read_frames(video_path: str, frame_limit: int) -> list:
+    """Decodes the first frame_limit frames of a video, fewer if the video is shorter."""
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+
+    while len(frames) < frame_limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+
+    cap.release()
+    return frames
@@ -1,5 +1,19 @@
 from django import forms
 
+from main.uploads import UNREADABLE_ERROR, get_max_upload_size, get_upload_media_info, too_large_error
+
+
 # attrs = {'class': 'upload-file-field'}
 class UploadFileForm(forms.Form):
     uploaded_file = forms.FileField(label='uploaded_file')
+
+    def clean_uploaded_file(self):
+        uploaded_file = self.cleaned_data['uploaded_file']
+        if uploaded_file.size > get_max_upload_size():
+            raise forms.ValidationError(too_large_error())
+
+        # Probed by the upload handler, so unsupported files are rejected before a job is queued
+        uploaded_file.media_info = get_upload_media_info(uploaded_file)
+        if uploaded_file.media_info is None:
+            raise forms.ValidationError(UNREADABLE_ERROR)
+        return uploaded_file
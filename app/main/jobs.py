@@ -0,0 +1,340 @@
+import os
+import socket
+import time
+import traceback
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from main.models import Files, Job, Plates
+from main.outputs_cache import evict_outputs, get_outputs_cache_max_bytes
+
+from number_plate_recognition import batch, main, pipeline
+from number_plate_recognition.config import PipelineConfig
+from number_plate_recognition.paths import Workspace, move_file
+from number_plate_recognition.results_store import save_results
+from number_plate_recognition.visualize import (get_plates_with_highest_score, preview_name, processed_frame_name,
+                                                thumbnail_name)
+
+# Smallest change in progress that is written to the database
+PROGRESS_STEP = 0.01
+
+# Number of times a job is started. A job whose worker died this often is marked failed instead of queued again.
+MAX_JOB_ATTEMPTS = 2
+
+
+def worker_id() -> str:
+    """Identifies this process as the worker holding a job."""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def is_worker_alive(worker: str) -> Optional[bool]:
+    """
+    Checks whether the worker process holding a job is still running.
+
+    Args:
+        worker: Worker ID stored on the job, see worker_id. Jobs claimed before workers were recorded have none.
+
+    Returns:
+        bool: Whether the process runs, or None if it runs on another host and cannot be checked from here.
+    """
+    if not worker:
+        return False
+
+    host, _, pid = worker.rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return None
+
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # The process exists, but belongs to another user
+    return True
+
+
+def recover_orphaned_jobs() -> int:
+    """
+    Puts running jobs whose worker process died, e.g. killed or crashed, back in the queue. Jobs that were already
+    started MAX_JOB_ATTEMPTS times are marked failed instead, so that a file crashing the workers is not retried
+    forever.
+
+    Returns:
+        int: Number of recovered jobs.
+    """
+    recovered = 0
+    for job in Job.objects.filter(status=Job.RUNNING).only('worker', 'attempts'):
+        if is_worker_alive(job.worker) is not False:
+            continue
+
+        # The worker must not have changed in the meantime, another worker may have recovered and claimed the job
+        orphaned = Job.objects.filter(pk=job.pk, status=Job.RUNNING, worker=job.worker)
+        if job.attempts >= MAX_JOB_ATTEMPTS:
+            recovered += orphaned.update(status=Job.FAILED, error='The worker processing the file stopped.',
+                                         finished_at=timezone.now())
+        else:
+            recovered += orphaned.update(status=Job.QUEUED, progress=0, started_at=None, worker='')
+
+    return recovered
+
+
+def release_job(job: Job) -> None:
+    """Puts a job that its worker stops processing, e.g. on shutdown, back in the queue without counting an attempt."""
+    Job.objects.filter(pk=job.pk, status=Job.RUNNING).update(status=Job.QUEUED, progress=0, started_at=None,
+                                                             worker='', attempts=F('attempts') - 1)
+
+
+def claim_next_job() -> Optional[Job]:
+    """
+    Moves the oldest queued job to running and returns it, after recovering the jobs of workers that died.
+
+    The conditional UPDATE only succeeds for one worker, so jobs are never handed out twice,
+    without relying on row locks that SQLite does not have.
+
+    Returns:
+        Job: The claimed job, or None if the queue is empty.
+    """
+    recover_orphaned_jobs()
+
+    while True:
+        job = Job.objects.filter(status=Job.QUEUED).order_by('created_at', 'id').first()
+        if job is None:
+            return None
+
+        claimed = Job.objects.filter(pk=job.pk, status=Job.QUEUED).update(status=Job.RUNNING,
+                                                                          started_at=timezone.now(),
+                                                                          worker=worker_id(),
+                                                                          attempts=F('attempts') + 1)
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def progress_updater(job: Job) -> Callable[[float], None]:
+    """Returns a callback storing the job progress, throttled to steps of PROGRESS_STEP."""
+    last_progress = 0.0
+
+    def update(fraction: float) -> None:
+        nonlocal last_progress
+        if fraction - last_progress >= PROGRESS_STEP or (fraction >= 1.0 > last_progress):
+            last_progress = fraction
+            Job.objects.filter(pk=job.pk).update(progress=fraction)
+
+    return update
+
+
+def run_job(job: Job) -> None:
+    """Processes the job's file and records whether it succeeded."""
+    try:
+        process_job(job)
+    except Exception as e:
+        traceback.print_exc()
+        Job.objects.filter(pk=job.pk).update(status=Job.FAILED, error=str(e), finished_at=timezone.now())
+    else:
+        Job.objects.filter(pk=job.pk).update(status=Job.DONE, progress=1.0, finished_at=timezone.now())
+
+
+def get_pipeline_config() -> PipelineConfig:
+    """Returns the pipeline settings of this deployment, taken from settings.PIPELINE_CONFIG."""
+    return PipelineConfig(**getattr(settings, 'PIPELINE_CONFIG', {}))
+
+
+def process_job(job: Job) -> None:
+    """Runs plate recognition on the job's file in its own workspace and stores the processed file and plates."""
+    workspace = Workspace.for_job(job.id)
+    workspace.create()
+
+    try:
+        process_in_workspace(job, workspace)
+    finally:
+        workspace.remove()
+
+
+def store_upload(fp: Files) -> None:
+    """
+    Moves the upload of a file from the buffer to its final directory, and records the new path right away.
+
+    A job retried because its worker died between the two steps finds the upload moved already, and only records the
+    path.
+    """
+    name = f'uploads/{os.path.basename(fp.uploaded_file.name)}'
+    if fp.uploaded_file.name == name:
+        return
+
+    if os.path.exists(fp.uploaded_file.path):
+        move_file(fp.uploaded_file.path, os.path.dirname(os.path.join(settings.MEDIA_ROOT, name)))
+    fp.uploaded_file = name
+    Files.objects.filter(pk=fp.pk).update(uploaded_file=name)
+
+
+def process_in_workspace(job: Job, workspace: Workspace) -> None:
+    fp = job.file
+    config = get_pipeline_config()
+    version = pipeline.pipeline_version(config)
+    store_upload(fp)
+
+    duplicate = find_processed_duplicate(fp, version)
+    if duplicate is None:
+        run = run_batch if fp.media_type == 'batch' else run_pipeline
+        processed_file, preview_file, results_file, plates = run(job, workspace, config)
+    else:
+        print(f"File {fp.id} has the same content as file {duplicate.id}, reusing its results")
+        processed_file, preview_file, results_file, plates = reuse_results(fp, duplicate)
+
+    # Move the outputs to their final directories, then store their final paths and the plates in one transaction. A
+    # retry after a crash in between processes the file again and overwrites the moved outputs.
+    workspace.move_output_files_to_constant_dirs()
+
+    fp.processed_file = processed_file
+    fp.preview_file = preview_file
+    fp.results_file = results_file
+    fp.pipeline_version = version
+
+    with transaction.atomic():
+        fp.save()
+        # Plates of an earlier attempt that was stopped before the job was marked done
+        Plates.objects.filter(file_id=fp.id).delete()
+        Plates.objects.bulk_create(plates)
+
+    evict_outputs(get_outputs_cache_max_bytes(), keep_file_id=fp.id)
+
+
+def run_pipeline(job: Job, workspace: Workspace, config: PipelineConfig) -> tuple[str, str, str, list[Plates]]:
+    """
+    Runs plate recognition on the job's file, leaving the processed file, its derivatives and the results in the
+    workspace.
+
+    Returns:
+        tuple: Final paths of the processed file, its preview and the results array relative to the media root,
+            and the unsaved plates of the file.
+    """
+    fp = job.file
+
+    # Process the file
+    uploaded_file_path = fp.uploaded_file.path
+    uploaded_file = {'name': os.path.basename(uploaded_file_path), 'path': uploaded_file_path}
+    interpolated = main.run_plate_recognition(uploaded_file, workspace, progress_updater(job), config)
+
+    # Keep the per-frame detections for the detections export
+    results_name = f"{os.path.splitext(uploaded_file['name'])[0]}.npy"
+    save_results(interpolated, os.path.join(workspace.results_dir, results_name))
+
+    # One plate per car, each with the processed frame its best reading was taken from
+    plates = []
+    for plate in get_plates_with_highest_score(interpolated):
+        frame_number = int(plate['frame_number'])
+        accuracy = round(float(plate['license_number_score']) * 100, 2)
+        processed_frame = processed_frame_name(uploaded_file['name'], frame_number)
+        plates.append(Plates(file_id=fp.id, frame_number=frame_number, plate_number=str(plate['license_number']),
+                             accuracy=accuracy, processed_frame=f'processed_frames/{processed_frame}',
+                             thumbnail=f'thumbnails/{thumbnail_name(processed_frame)}'))
+
+    return (f"outputs/{workspace.get_output_file_info()['name']}", f"previews/{preview_name(uploaded_file['name'])}",
+            f'results/{results_name}', plates)
+
+
+def run_batch(job: Job, workspace: Workspace, config: PipelineConfig) -> tuple[str, str, str, list[Plates]]:
+    """
+    Runs batch mode on the images of the job's zip archive, leaving the processed frames and results in the
+    workspace.
+
+    Returns:
+        tuple: Like run_pipeline. A batch has no processed file or preview, only processed frames, so their paths are
+            empty. Each plate records the image it was found on.
+    """
+    fp = job.file
+
+    uploaded_file_path = fp.uploaded_file.path
+    uploaded_file = {'name': os.path.basename(uploaded_file_path), 'path': uploaded_file_path}
+    results, image_names = batch.run(uploaded_file, workspace, progress_updater(job), config)
+
+    results_name = f"{os.path.splitext(uploaded_file['name'])[0]}.npy"
+    save_results(results, os.path.join(workspace.results_dir, results_name))
+
+    plates = []
+    for plate in get_plates_with_highest_score(results):
+        frame_number = int(plate['frame_number'])
+        processed_frame = processed_frame_name(uploaded_file['name'], frame_number)
+        plates.append(Plates(file_id=fp.id, frame_number=frame_number, plate_number=str(plate['license_number']),
+                             accuracy=round(float(plate['license_number_score']) * 100, 2),
+                             processed_frame=f'processed_frames/{processed_frame}',
+                             thumbnail=f'thumbnails/{thumbnail_name(processed_frame)}',
+                             source_name=image_names[frame_number]))
+
+    return '', '', f'results/{results_name}', plates
+
+
+def find_processed_duplicate(fp: Files, version: str) -> Optional[Files]:
+    """
+    Finds an earlier upload with the same content that was processed by the same pipeline version.
+
+    Args:
+        fp: File about to be processed.
+        version: Pipeline version the file would be processed with.
+
+    Returns:
+        Files: Most recent such upload whose outputs are still cached, or None.
+    """
+    if not fp.content_hash:
+        return None
+
+    candidates = Files.objects.filter(content_hash=fp.content_hash, pipeline_version=version,
+                                      jobs__status=Job.DONE).exclude(pk=fp.pk).distinct().order_by('-id')
+
+    for candidate in candidates:
+        # Evicted outputs have empty names, see outputs_cache.evict_outputs
+        outputs = [output for output in (candidate.processed_file, candidate.results_file) if output]
+        if outputs and all(os.path.exists(output.path) for output in outputs):
+            return candidate
+
+    return None
+
+
+def reuse_results(fp: Files, source: Files) -> tuple[str, str, str, list[Plates]]:
+    """
+    Reuses the processed file, its derivatives, the results and the plates of an identical upload, instead of
+    processing the file.
+
+    Returns:
+        tuple: Paths of the shared processed file, preview and results array, and unsaved copies of the source's
+            plates.
+    """
+    # Mark the shared outputs as recently used, so that they are evicted last
+    for output in (source.processed_file, source.results_file):
+        if output:
+            os.utime(output.path)
+
+    plates = [Plates(file_id=fp.id, frame_number=plate.frame_number, plate_number=plate.plate_number,
+                     accuracy=plate.accuracy, processed_frame=plate.processed_frame.name,
+                     thumbnail=plate.thumbnail.name, source_name=plate.source_name)
+              for plate in Plates.objects.filter(file_id=source.id).order_by('id')]
+    return source.processed_file.name, source.preview_file.name, source.results_file.name, plates
+
+
+def work(poll_interval: float = 2.0) -> None:
+    """
+    Worker loop: loads the models once, then keeps pulling queued jobs from the database.
+
+    Args:
+        poll_interval: Seconds to wait before polling again when the queue is empty.
+    """
+    pipeline.load_models(get_pipeline_config())
+
+    while True:
+        close_old_connections()
+        job = claim_next_job()
+
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+
+        try:
+            run_job(job)
+        except BaseException:
+            # Stopped by Ctrl+C or by run_workers, the next worker processes the job again
+            release_job(job)
+            raise
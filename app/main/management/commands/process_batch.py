@@ -0,0 +1,93 @@
+import os
+import shutil
+import time
+import zipfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils import timezone
+
+from main import jobs
+from main.models import Files, Job, Plates
+from main.uploads import get_batch_archive_error
+
+from number_plate_recognition import pipeline
+from number_plate_recognition.batch import ImageSource, throughput_summary
+from number_plate_recognition.util import file_sha256, file_upload_path, probe_media
+
+
+def store_archive(source: str) -> str:
+    """
+    Stores a batch as an upload: a zip archive is copied, the images of a folder are stored in a new archive.
+
+    Returns:
+        str: Name of the archive relative to the media root.
+    """
+    name = file_upload_path(None, 'batch.zip')
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    if os.path.isdir(source):
+        # The images are compressed already
+        with ImageSource(source) as images, zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as archive:
+            for image_name in images.names:
+                archive.write(os.path.join(source, image_name), image_name)
+    else:
+        shutil.copyfile(source, path)
+
+    return name
+
+
+class Command(BaseCommand):
+    help = 'Processes a folder or zip archive of images in batch mode and reports the throughput.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Folder or zip archive of JPEG or PNG images.')
+        parser.add_argument('--queue', action='store_true',
+                            help='Only queue the batch for the worker processes instead of processing it here.')
+
+    def handle(self, *args, **options):
+        source = options['source']
+        if not os.path.isdir(source) and not zipfile.is_zipfile(source):
+            raise CommandError(f'{source} is neither a folder nor a zip archive.')
+
+        name = store_archive(source)
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        error = get_batch_archive_error(path)
+        if error is not None:
+            os.remove(path)
+            raise CommandError(error)
+
+        media_info = probe_media(path, 'batch')
+        if media_info is None:
+            os.remove(path)
+            raise CommandError(f'No images found in {source}.')
+
+        fp = Files.objects.create(uploaded_file=name, content_hash=file_sha256(path), file_size=os.path.getsize(path),
+                                  **media_info)
+        results_url = reverse('results', args=[fp.id])
+
+        if options['queue']:
+            Job.objects.create(file=fp)
+            self.stdout.write(f"Queued {fp.frame_count} images, see {results_url}")
+            return
+
+        # Workers only claim queued jobs, this one is processed here
+        job = Job.objects.create(file=fp, status=Job.RUNNING, started_at=timezone.now(), worker=jobs.worker_id(),
+                                 attempts=1)
+
+        # Load and warm up the models outside of the measurement
+        pipeline.load_models(jobs.get_pipeline_config())
+
+        start = time.perf_counter()
+        jobs.run_job(job)
+        elapsed = time.perf_counter() - start
+
+        job.refresh_from_db()
+        if job.status == Job.FAILED:
+            raise CommandError(f'Processing failed: {job.error}')
+
+        plate_count = Plates.objects.filter(file_id=fp.id).count()
+        self.stdout.write(f"{throughput_summary(fp.frame_count, elapsed)} end to end, "
+                          f"{plate_count} plates, see {results_url}")
@@ -0,0 +1,68 @@
+import multiprocessing
+import signal
+import sys
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from number_plate_recognition.model_registry import export_models
+
+
+# Seconds the workers get to put their jobs back in the queue on Ctrl+C before they are terminated
+SHUTDOWN_TIMEOUT = 10
+
+
+def start_worker(poll_interval: float) -> None:
+    """Entry point of a worker process."""
+    # Terminating a worker raises SystemExit, so that it puts its job back in the queue like on Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(1))
+    django.setup()
+
+    from main import jobs
+    jobs.work(poll_interval)
+
+
+class Command(BaseCommand):
+    help = 'Starts a pool of worker processes that process queued uploads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Number of worker processes.')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to wait before polling an empty queue again.')
+
+    def handle(self, *args, **options):
+        # Imported here, so that the pipeline is only imported once this command runs, not when it is listed
+        from main import jobs
+
+        # Workers load the cached exports, so that they are not created by several processes at once
+        config = jobs.get_pipeline_config()
+        export_models(config.model_backend, config.model_imgsz, config.batch_size)
+
+        # Jobs left running by workers that were killed or crashed
+        recovered = jobs.recover_orphaned_jobs()
+        if recovered:
+            self.stdout.write(f"Recovered {recovered} job(s) of stopped workers.")
+
+        # Worker processes open their own database connections
+        connections.close_all()
+
+        workers = [multiprocessing.Process(target=start_worker, args=(options['poll_interval'],), daemon=True)
+                   for _ in range(options['processes'])]
+        for worker in workers:
+            worker.start()
+
+        self.stdout.write(f"Started {len(workers)} worker process(es). Press Ctrl+C to stop.")
+
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            # The workers received the Ctrl+C as well and put their jobs back in the queue
+            for worker in workers:
+                worker.join(SHUTDOWN_TIMEOUT)
+                if worker.is_alive():
+                    worker.terminate()
+                    worker.join()
+
+            jobs.recover_orphaned_jobs()
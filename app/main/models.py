@@ -5,11 +5,58 @@ from number_plate_recognition.util import file_upload_path
 class Files(models.Model):
     uploaded_file = models.FileField(upload_to=file_upload_path, default=None)
     processed_file = models.FileField(upload_to='buffer/outputs', default=None)
+    # Interpolated per-frame detections, a results array saved with results_store.save_results
+    results_file = models.FileField(upload_to='results', blank=True, default='')
+    # Smaller version of the processed file shown on the results page, see visualize.preview_name
+    preview_file = models.FileField(upload_to='previews', blank=True, default='')
+    # SHA-256 of the uploaded content and the pipeline version that processed it, see pipeline.pipeline_version
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    pipeline_version = models.CharField(max_length=16, blank=True, default='')
+    # Probed while the file was uploaded, see util.probe_media, so the cost of a job is known before it runs.
+    # Zip archives of images are processed in batch mode, their frame count is the number of images.
+    media_type = models.CharField(max_length=8, blank=True, default='')
+    file_size = models.BigIntegerField(null=True, default=None)
+    frame_count = models.IntegerField(null=True, default=None)
+    fps = models.FloatField(null=True, default=None)
+    width = models.IntegerField(null=True, default=None)
+    height = models.IntegerField(null=True, default=None)
+    codec = models.CharField(max_length=16, blank=True, default='')
 
 
 class Plates(models.Model):
-    file = models.ForeignKey('Files', on_delete=models.CASCADE)
+    # Covered by the (file, frame_number) index, which also serves lookups by file alone
+    file = models.ForeignKey('Files', on_delete=models.CASCADE, db_index=False)
     frame_number = models.IntegerField(default=0)
     plate_number = models.CharField(max_length=32, default='Error')
     accuracy = models.FloatField(default=0)
     processed_frame = models.FileField(upload_to='buffer/outputs', default=None)
+    thumbnail = models.FileField(upload_to='thumbnails', blank=True, default='')
+    # Image of a batch the plate was found on, the frame number is its index in the batch
+    source_name = models.CharField(max_length=255, blank=True, default='')
+
+    class Meta:
+        indexes = [models.Index(fields=['file', 'frame_number'])]
+
+
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    file = models.ForeignKey('Files', on_delete=models.CASCADE, related_name='jobs')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    progress = models.FloatField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, default=None)
+    # Worker process holding a running job as 'host:pid', so that jobs of workers that died can be recovered
+    worker = models.CharField(max_length=128, blank=True, default='')
+    attempts = models.IntegerField(default=0)
+    finished_at = models.DateTimeField(null=True, default=None)
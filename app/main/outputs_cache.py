@@ -0,0 +1,92 @@
+"""
+Size limit of the outputs derived from the uploads, kept like a cache of the least recently used uploads.
+"""
+import os
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from main.models import Files, Plates
+
+from number_plate_recognition.paths import get_file_stats
+
+# Total size of the outputs kept if settings.OUTPUTS_CACHE_MAX_BYTES is not set
+DEFAULT_OUTPUTS_CACHE_MAX_BYTES = 20 * 1024 ** 3
+
+# Folders of the media root holding the outputs, all counted against the size limit
+OUTPUT_FOLDERS = ('outputs', 'previews', 'processed_frames', 'thumbnails', 'results')
+
+
+def get_outputs_cache_max_bytes() -> int:
+    """Returns the total size the outputs may take up."""
+    return getattr(settings, 'OUTPUTS_CACHE_MAX_BYTES', DEFAULT_OUTPUTS_CACHE_MAX_BYTES)
+
+
+def evict_outputs(max_bytes: int, keep_file_id: Optional[int] = None) -> list[int]:
+    """
+    Deletes the outputs of the least recently used uploads until the outputs left take up at most max_bytes.
+
+    The outputs of an upload are its processed file, preview, results array and the processed frames and thumbnails
+    of its plates, see OUTPUT_FOLDERS. They are deleted together, and their names are cleared on every row referencing
+    them, including the uploads sharing them through jobs.reuse_results. The results page then offers to process the
+    file again, and jobs.find_processed_duplicate no longer reuses them. Files no row references are not counted.
+
+    Args:
+        max_bytes: Total size the outputs may take up.
+        keep_file_id: Upload whose outputs are never deleted, e.g. the file just processed.
+
+    Returns:
+        list: IDs of the uploads whose outputs were deleted.
+    """
+    stats = {}
+    for folder in OUTPUT_FOLDERS:
+        for name, stat in get_file_stats(os.path.join(settings.MEDIA_ROOT, folder)).items():
+            stats[f'{folder}/{name}'] = stat
+
+    # Uploads sharing their outputs are grouped by their shared results array or processed file
+    groups = {}
+    group_of_file = {}
+    for file_id, results_file, processed_file, preview_file in Files.objects.values_list(
+            'id', 'results_file', 'processed_file', 'preview_file').iterator():
+        names = {name for name in (results_file, processed_file, preview_file) if name}
+        if names:
+            key = results_file or processed_file or preview_file
+            group = groups.setdefault(key, {'file_ids': set(), 'names': set()})
+            group['file_ids'].add(file_id)
+            group['names'] |= names
+            group_of_file[file_id] = group
+
+    for file_id, processed_frame, thumbnail in Plates.objects.exclude(processed_frame='').values_list(
+            'file_id', 'processed_frame', 'thumbnail').iterator():
+        if file_id in group_of_file:
+            group_of_file[file_id]['names'] |= {name for name in (processed_frame, thumbnail) if name}
+
+    def group_stats(group):
+        return [stats[name] for name in group['names'] if name in stats]
+
+    total = sum(size for group in groups.values() for _, size in group_stats(group))
+    evicted = []
+
+    # Least recently used first, jobs.reuse_results refreshes the modification time of the shared outputs
+    for group in sorted(groups.values(), key=lambda group: max((mtime for mtime, _ in group_stats(group)), default=0)):
+        if total <= max_bytes:
+            break
+        if keep_file_id in group['file_ids']:
+            continue
+
+        for name in group['names']:
+            try:
+                os.remove(os.path.join(settings.MEDIA_ROOT, name))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Could not evict {name}: {e}")
+        total -= sum(size for _, size in group_stats(group))
+
+        with transaction.atomic():
+            Files.objects.filter(id__in=group['file_ids']).update(processed_file='', preview_file='', results_file='')
+            Plates.objects.filter(file_id__in=group['file_ids']).update(processed_frame='', thumbnail='')
+        evicted.extend(group['file_ids'])
+
+    return evicted
@@ -1,3 +1,457 @@
-from django.test import TestCase
+import importlib.util
+import io
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import zipfile
+from unittest import mock
 
-# Create your tests here.
+import cv2
+
+import numpy as np
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models.query import QuerySet
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from main import jobs, outputs_cache, views
+from main.models import Files, Job, Plates
+from main.uploads import UNREADABLE_ERROR, UNSUPPORTED_TYPE_ERROR, UPLOAD_CHUNK_SIZE
+from number_plate_recognition.assignment import (assign_plates_found_in_crops, assign_plates_to_cars,
+                                                 intersection_over_area)
+from number_plate_recognition import batch, model_registry, plate_recognition
+from number_plate_recognition.config import PipelineConfig
+from number_plate_recognition.paths import Workspace
+from number_plate_recognition.sort.batched_sort import BatchedSort
+
+
+class PlateAssignmentTests(SimpleTestCase):
+    def test_intersection_over_area(self):
+        plates = np.array([[10, 10, 20, 20], [0, 0, 10, 10]])
+        cars = np.array([[0, 0, 100, 100, 1], [15, 0, 100, 100, 2]])
+
+        np.testing.assert_allclose(intersection_over_area(plates, cars), [[1., .5], [1., 0.]])
+
+    def test_plate_outside_every_car_is_unassigned(self):
+        plates = np.array([[200, 200, 240, 210, .9, 0]])
+        cars = np.array([[0, 0, 100, 100, 1]])
+
+        self.assertEqual(assign_plates_to_cars(plates, cars).tolist(), [])
+
+    def test_empty_frame(self):
+        self.assertEqual(assign_plates_to_cars(np.empty((0, 6)), np.array([[0, 0, 100, 100, 1]])).shape, (0, 2))
+        self.assertEqual(assign_plates_to_cars(np.array([[10, 10, 20, 20, .9, 0]]), np.empty((0, 5))).shape, (0, 2))
+
+    def test_overlapping_cars_get_one_plate_each(self):
+        # The car behind is partly hidden by the car in front, both plates lie inside the box of the car behind
+        cars = np.array([[0, 0, 300, 200, 1],      # behind
+                         [100, 80, 300, 200, 2]])  # in front
+        plates = np.array([[150, 170, 210, 190, .9, 0],  # plate of the car in front
+                           [20, 150, 80, 170, .9, 0]])   # plate of the car behind
+
+        self.assertEqual(assign_plates_to_cars(plates, cars).tolist(), [[0, 1], [1, 0]])
+
+    def test_result_does_not_depend_on_track_order(self):
+        cars = np.array([[0, 0, 300, 200, 1], [100, 80, 300, 200, 2]])
+        plates = np.array([[150, 170, 210, 190, .9, 0]])
+
+        self.assertEqual(assign_plates_to_cars(plates, cars).tolist(), [[0, 1]])
+        self.assertEqual(assign_plates_to_cars(plates, cars[::-1]).tolist(), [[0, 0]])
+
+    def test_car_gets_at_most_one_plate(self):
+        cars = np.array([[0, 0, 300, 200, 1]])
+        plates = np.array([[20, 150, 80, 170, .5, 0], [150, 170, 210, 190, .9, 0]])
+
+        self.assertEqual(len(assign_plates_to_cars(plates, cars)), 1)
+
+    def test_better_overlap_wins_over_smaller_car(self):
+        cars = np.array([[0, 0, 300, 200, 1], [100, 80, 250, 185, 2]])
+        plates = np.array([[150, 170, 210, 190, .9, 0]])  # sticks out of the smaller car
+
+        self.assertEqual(assign_plates_to_cars(plates, cars, min_overlap=.3).tolist(), [[0, 0]])
+        self.assertEqual(assign_plates_to_cars(plates, cars[1:], min_overlap=.3).tolist(), [[0, 0]])
+        self.assertEqual(assign_plates_to_cars(plates, cars[1:]).tolist(), [])
+
+    def test_plate_found_on_overlapping_crops_is_assigned_once(self):
+        crops = np.array([[0, 0, 300, 200],     # behind
+                          [90, 74, 300, 200]])  # in front
+        # The crop of the car behind contains both plates, the one in front was found again on its own crop
+        plates = np.array([[150, 170, 210, 190, .9, 0],
+                           [20, 150, 80, 170, .8, 0],
+                           [151, 170, 211, 190, .85, 0]])
+
+        self.assertEqual(assign_plates_found_in_crops(plates, crops).tolist(), [[0, 1], [1, 0]])
+        self.assertEqual(assign_plates_found_in_crops(plates[2:], crops).tolist(), [[0, 1]])
+        self.assertEqual(assign_plates_found_in_crops(np.empty((0, 6)), crops).shape, (0, 2))
+
+    def test_vehicles_mode_with_overlapping_vehicles(self):
+        frame = np.zeros((200, 300, 3), dtype=np.uint8)
+        cars = np.array([[0, 0, 300, 200, 1], [100, 80, 300, 200, 2]])
+        # Detections in the coordinates of each vehicle crop, the crop in front starts at (90, 74)
+        plates_per_crop = [np.array([[150, 170, 210, 190, .9, 0], [20, 150, 80, 170, .8, 0]], dtype=np.float32),
+                           np.array([[60, 96, 120, 116, .88, 0]], dtype=np.float32)]
+
+        with mock.patch.object(plate_recognition, 'detect_license_plates', return_value=plates_per_crop), \
+                mock.patch.object(plate_recognition, 'get_boxes', side_effect=np.copy):
+            assigned, = plate_recognition.detect_license_plates_in_vehicles(
+                [frame], [cars], PipelineConfig(plate_search='vehicles'))
+
+        self.assertEqual([(plate[:4].tolist(), car[4]) for plate, car in assigned],
+                         [([150, 170, 210, 190], 2), ([20, 150, 80, 170], 1)])
+
+
+class DetectionGateTests(SimpleTestCase):
+    @staticmethod
+    def frame(grey_level):
+        return np.full((90, 160, 3), grey_level, dtype=np.uint8)
+
+    def test_stride(self):
+        gate = plate_recognition.DetectionGate(stride=3)
+
+        detected = [gate.should_detect(frame_number, self.frame(0)) for frame_number in range(7)]
+        self.assertEqual(detected, [True, False, False, True, False, False, True])
+        self.assertEqual((gate.frames_total, gate.frames_detected, gate.frames_skipped), (7, 3, 4))
+        self.assertAlmostEqual(gate.speedup, 7 / 3)
+
+    def test_motion_threshold(self):
+        gate = plate_recognition.DetectionGate(motion_threshold=5)
+
+        # Compared with the last detected frame, so slow changes add up until they pass the threshold
+        detected = [gate.should_detect(frame_number, self.frame(grey_level))
+                    for frame_number, grey_level in enumerate([0, 0, 3, 6, 8, 30])]
+        self.assertEqual(detected, [True, False, False, True, False, True])
+
+    def test_summary(self):
+        gate = plate_recognition.DetectionGate(stride=2)
+        self.assertEqual(gate.speedup, 1.0)
+
+        for frame_number in range(4):
+            gate.should_detect(frame_number, self.frame(0))
+        self.assertEqual(gate.summary(), 'Detected on 2 of 4 frames, skipped 2 (2.0x fewer detector runs)')
+
+
+class TrackerTests(SimpleTestCase):
+    def test_prediction_covers_skipped_frames(self):
+        # A vehicle moving 5 px per frame, detected on every third frame
+        tracker = BatchedSort(max_age=1, min_hits=1)
+        for frame_number in range(0, 30, 3):
+            tracks = tracker.update(np.array([[5 * frame_number, 0, 5 * frame_number + 50, 50, .9]]), frame_number)
+
+        self.assertEqual(len(tracks), 1)
+        self.assertEqual(tracker.last_frame_number, 27)
+        np.testing.assert_allclose(tracker.predict(3)[0], [150, 0, 200, 50], atol=.01)
+
+
+class PaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.files = [Files.objects.create(uploaded_file=f'uploads/{i}.mp4', processed_file=f'outputs/{i}.mp4')
+                     for i in range(views.FILES_PAGE_SIZE + 5)]
+        cls.file = cls.files[0]
+        Job.objects.create(file=cls.file, status=Job.DONE, progress=1.0)
+
+        # Two plates share every frame number, so that pages also break within a frame
+        Plates.objects.bulk_create([Plates(file=cls.file, frame_number=i // 2, plate_number=f'AB{i:03d}CD', accuracy=90,
+                                           processed_frame=f'processed_frames/{i}.jpg')
+                                    for i in range(views.PLATES_PAGE_SIZE * 2 + 1)])
+
+    def test_history_page_queries(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('index'))
+        self.assertEqual(len(response.context['files']), views.FILES_PAGE_SIZE)
+        self.assertEqual(response.context['files'][0].id, self.files[-1].id)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('index'), {'before': response.context['next_cursor']})
+        self.assertEqual([file.id for file in response.context['files']], [file.id for file in self.files[4::-1]])
+        self.assertIsNone(response.context['next_cursor'])
+        self.assertEqual(response.context['files'][-1].plate_count, views.PLATES_PAGE_SIZE * 2 + 1)
+
+    def test_results_pages_queries(self):
+        url = reverse('results', args=[self.file.id])
+        plate_numbers = []
+        cursor = None
+
+        for _ in range(3):
+            with self.assertNumQueries(3):
+                response = self.client.get(url, {'after': cursor} if cursor else {})
+            self.assertEqual(response.context['file'].plate_count, views.PLATES_PAGE_SIZE * 2 + 1)
+            plate_numbers += [plate.plate_number for plate in response.context['plates']]
+            cursor = response.context['next_cursor']
+
+        self.assertIsNone(cursor)
+        self.assertEqual(plate_numbers, [f'AB{i:03d}CD' for i in range(views.PLATES_PAGE_SIZE * 2 + 1)])
+
+    def test_invalid_cursor_shows_first_page(self):
+        response = self.client.get(reverse('results', args=[self.file.id]), {'after': 'x-1'})
+        self.assertEqual(response.context['plates'][0].plate_number, 'AB000CD')
+
+
+class OutputsCacheTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root))
+
+        # The old upload's outputs are shared with a re-upload of the same content
+        self.old, self.reused = [self.create_processed_file('old', mtime=1000) for _ in range(2)]
+        self.new = self.create_processed_file('new', mtime=2000)
+
+    def create_processed_file(self, name, mtime):
+        outputs = [f'outputs/{name}.mp4', f'previews/{name}.mp4', f'results/{name}.npy',
+                   f'processed_frames/{name}.jpg', f'thumbnails/{name}.webp']
+        for output in outputs:
+            path = os.path.join(self.media_root, output)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(b'0' * 100)
+            os.utime(path, (mtime, mtime))
+
+        fp = Files.objects.create(uploaded_file=f'uploads/{name}.mp4', processed_file=outputs[0],
+                                  preview_file=outputs[1], results_file=outputs[2])
+        Job.objects.create(file=fp, status=Job.DONE, progress=1.0)
+        Plates.objects.create(file=fp, plate_number='AB123CD', accuracy=90, processed_frame=outputs[3],
+                              thumbnail=outputs[4])
+        return fp
+
+    def test_outputs_within_limit_are_kept(self):
+        self.assertEqual(outputs_cache.evict_outputs(1000), [])
+
+    def test_least_recently_used_outputs_are_evicted_with_their_rows(self):
+        self.assertEqual(sorted(outputs_cache.evict_outputs(500)), [self.old.id, self.reused.id])
+
+        for folder in outputs_cache.OUTPUT_FOLDERS:
+            self.assertEqual(len(os.listdir(os.path.join(self.media_root, folder))), 1)
+        for fp in (self.old, self.reused):
+            fp.refresh_from_db()
+            self.assertEqual((fp.processed_file.name, fp.preview_file.name, fp.results_file.name), ('', '', ''))
+            self.assertEqual(list(Plates.objects.filter(file=fp).values_list('processed_frame', 'thumbnail')),
+                             [('', '')])
+        self.assertTrue(os.path.exists(Files.objects.get(pk=self.new.id).processed_file.path))
+
+    def test_outputs_of_the_kept_file_are_not_evicted(self):
+        self.assertEqual(outputs_cache.evict_outputs(0, keep_file_id=self.old.id), [self.new.id])
+
+    def test_evicted_file_can_be_processed_again(self):
+        outputs_cache.evict_outputs(0)
+
+        response = self.client.get(reverse('results', args=[self.old.id]))
+        self.assertTrue(response.context['outputs_evicted'])
+        self.assertContains(response, reverse('reprocess_file', args=[self.old.id]))
+
+        for _ in range(2):
+            response = self.client.post(reverse('reprocess_file', args=[self.old.id]))
+        self.assertRedirects(response, reverse('results', args=[self.old.id]))
+        self.assertEqual(Job.objects.filter(file=self.old, status=Job.QUEUED).count(), 1)
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.file = Files.objects.create(uploaded_file='uploads/a.mp4')
+
+        # Process ID of a process that has exited
+        process = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process.wait()
+        self.dead_worker = f'{socket.gethostname()}:{process.pid}'
+
+    def create_running_job(self, worker, attempts=1):
+        return Job.objects.create(file=self.file, status=Job.RUNNING, worker=worker, attempts=attempts)
+
+    def test_claim_marks_the_oldest_job_running(self):
+        first, second = Job.objects.create(file=self.file), Job.objects.create(file=self.file)
+
+        job = jobs.claim_next_job()
+        self.assertEqual(job.pk, first.pk)
+        self.assertEqual((job.status, job.worker, job.attempts), (Job.RUNNING, jobs.worker_id(), 1))
+        self.assertEqual(jobs.claim_next_job().pk, second.pk)
+        self.assertIsNone(jobs.claim_next_job())
+
+    def test_job_claimed_by_another_worker_in_between_is_skipped(self):
+        stolen, other = Job.objects.create(file=self.file), Job.objects.create(file=self.file)
+        first = QuerySet.first
+
+        def first_claimed_by_other_worker(queryset):
+            # Another worker claims the job after this one read it, but before this one updates it
+            job = first(queryset)
+            if job is not None and job.pk == stolen.pk:
+                Job.objects.filter(pk=job.pk).update(status=Job.RUNNING, worker='other:1', attempts=1)
+            return job
+
+        with mock.patch.object(QuerySet, 'first', first_claimed_by_other_worker):
+            job = jobs.claim_next_job()
+
+        self.assertEqual(job.pk, other.pk)
+        stolen.refresh_from_db()
+        self.assertEqual((stolen.worker, stolen.attempts), ('other:1', 1))
+
+    def test_jobs_of_dead_workers_are_queued_again(self):
+        dead = self.create_running_job(self.dead_worker)
+        unrecorded = self.create_running_job('')
+        alive = self.create_running_job(jobs.worker_id())
+        elsewhere = self.create_running_job('elsewhere:1')
+
+        self.assertEqual(jobs.recover_orphaned_jobs(), 2)
+
+        statuses = {job.pk: (job.status, job.worker) for job in Job.objects.all()}
+        self.assertEqual(statuses[dead.pk], (Job.QUEUED, ''))
+        self.assertEqual(statuses[unrecorded.pk], (Job.QUEUED, ''))
+        self.assertEqual(statuses[alive.pk], (Job.RUNNING, jobs.worker_id()))
+        self.assertEqual(statuses[elsewhere.pk], (Job.RUNNING, 'elsewhere:1'))
+
+    def test_job_fails_after_max_attempts(self):
+        job = self.create_running_job(self.dead_worker, attempts=jobs.MAX_JOB_ATTEMPTS - 1)
+        jobs.recover_orphaned_jobs()
+        job = jobs.claim_next_job()
+        self.assertEqual(job.attempts, jobs.MAX_JOB_ATTEMPTS)
+
+        Job.objects.filter(pk=job.pk).update(worker=self.dead_worker)
+        self.assertEqual(jobs.recover_orphaned_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIsNone(jobs.claim_next_job())
+
+    def test_released_job_does_not_count_as_attempt(self):
+        Job.objects.create(file=self.file)
+        job = jobs.claim_next_job()
+        jobs.release_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 0))
+
+    def test_retry_finds_the_upload_moved_already(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        os.makedirs(os.path.join(media_root, 'uploads'))
+        open(os.path.join(media_root, 'uploads', 'b.mp4'), 'wb').close()
+
+        # The worker died after moving the upload, before recording its new path
+        fp = Files.objects.create(uploaded_file='buffer/uploads/b.mp4')
+        with override_settings(MEDIA_ROOT=media_root):
+            jobs.store_upload(fp)
+            self.assertTrue(os.path.exists(Files.objects.get(pk=fp.pk).uploaded_file.path))
+        self.assertEqual(fp.uploaded_file.name, 'uploads/b.mp4')
+
+
+class UploadValidationTests(TestCase):
+    def upload(self, name, content):
+        # The rest of a rejected upload is not read, see HashingUploadHandler.reject
+        with mock.patch('django.http.multipartparser.exhaust') as exhaust:
+            response = self.client.post(reverse('process_file'), {'uploaded_file': SimpleUploadedFile(name, content)})
+        return response, exhaust
+
+    def assertRejected(self, response, error):
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.context['upload_errors']), [error])
+        self.assertFalse(Files.objects.exists())
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(MAX_UPLOAD_SIZE=UPLOAD_CHUNK_SIZE)
+    def test_oversize_upload_is_cut_off(self):
+        response, exhaust = self.upload('a.jpg', b'\xff\xd8\xff' + b'0' * (3 * UPLOAD_CHUNK_SIZE))
+
+        self.assertRejected(response, 'The file is larger than the 1 MiB limit.')
+        exhaust.assert_not_called()
+
+    def test_unsupported_type_is_cut_off(self):
+        response, exhaust = self.upload('a.mp4', b'#!/bin/sh\n' + b'0' * (2 * UPLOAD_CHUNK_SIZE))
+
+        self.assertRejected(response, UNSUPPORTED_TYPE_ERROR)
+        exhaust.assert_not_called()
+
+    @override_settings(MAX_BATCH_IMAGES_SIZE=1024 ** 2)
+    def test_zip_inflating_beyond_the_limit_is_rejected(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as f:
+            f.writestr('a.jpg', b'\xff\xd8\xff' + b'\x00' * (2 * 1024 ** 2))
+        response, _ = self.upload('a.zip', archive.getvalue())
+
+        self.assertRejected(response, 'The images of the archive are larger than 1 MiB unpacked.')
+
+    def test_undecodable_video_is_rejected(self):
+        response, _ = self.upload('a.mp4', b'\x00\x00\x00\x18ftypmp42' + b'\x00' * 4096)
+
+        self.assertRejected(response, UNREADABLE_ERROR)
+
+
+class BatchModeTests(SimpleTestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.workspace = Workspace(root)
+        self.workspace.create()
+
+        # Two images with a car and its plate, an image without vehicles and a file that cannot be decoded
+        self.archive_path = os.path.join(root, 'batch.zip')
+        with zipfile.ZipFile(self.archive_path, 'w') as archive:
+            for name in ('a.jpg', 'b.jpg', 'c.jpg'):
+                archive.writestr(name, cv2.imencode('.jpg', np.full((240, 320, 3), 128, dtype=np.uint8))[1].tobytes())
+            archive.writestr('broken.jpg', b'not an image')
+
+    @staticmethod
+    def detect_vehicles(images, config):
+        # The last batch only holds the image without vehicles
+        return [np.empty((0, 6)) if len(images) == 1 else np.array([[20, 20, 300, 220, .9, 2]]) for _ in images]
+
+    def test_process_images(self):
+        plate = np.array([[100, 150, 200, 180, .8, 0]], dtype=np.float32)
+        progress = []
+
+        with mock.patch.object(plate_recognition, 'detect_vehicles', side_effect=self.detect_vehicles), \
+                mock.patch.object(plate_recognition, 'detect_license_plates',
+                                  side_effect=lambda images, config: [plate.copy() for _ in images]), \
+                mock.patch.object(plate_recognition, 'get_boxes', side_effect=np.copy), \
+                mock.patch.object(plate_recognition, 'read_license_plate', return_value=('AB12CDE', .9)), \
+                self.assertLogs('number_plate_recognition.batch', 'INFO') as logs, \
+                batch.ImageSource(self.archive_path) as source:
+            results = batch.process_images(source, {'name': 'batch.zip', 'path': self.archive_path}, self.workspace,
+                                           PipelineConfig(batch_size=2), progress.append)
+
+        self.assertEqual(source.names, ['a.jpg', 'b.jpg', 'broken.jpg', 'c.jpg'])
+        # Every vehicle gets its own ID across the batches
+        self.assertEqual(results['frame_number'].tolist(), [0, 1])
+        self.assertEqual(results['car_id'].tolist(), [1, 2])
+        self.assertEqual(results['license_number'].tolist(), ['AB12CDE', 'AB12CDE'])
+        self.assertEqual(len(os.listdir(self.workspace.processed_frames_dir)), 2)
+        self.assertEqual(len(os.listdir(self.workspace.thumbnails_dir)), 2)
+        self.assertEqual(progress[-1], 1.0)
+        self.assertTrue(any('Skipped 1 images that could not be decoded, e.g. broken.jpg' in line
+                            for line in logs.output))
+
+
+class ModelExportTests(SimpleTestCase):
+    # Runtime package needed to run the exports of each backend
+    RUNTIMES = {'onnx': 'onnxruntime', 'openvino': 'openvino'}
+
+    def setUp(self):
+        import torch
+        from ultralytics.nn.tasks import DetectionModel
+
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.addCleanup(model_registry.load_model.cache_clear)
+
+        # Untrained weights export and run like trained ones, without downloading them
+        torch.manual_seed(0)
+        self.model_path = os.path.join(root, 'detector.pt')
+        torch.save({'model': DetectionModel('yolov8n.yaml', nc=1, verbose=False).half(), 'train_args': {}},
+                   self.model_path)
+
+    def test_exports_run_batches_of_any_size(self):
+        frames = [np.full((48, 64, 3), i * 40, dtype=np.uint8) for i in range(3)]
+
+        for backend, runtime in self.RUNTIMES.items():
+            with self.subTest(backend=backend):
+                if importlib.util.find_spec(runtime) is None:
+                    self.skipTest(f'{runtime} is not installed')
+
+                # Exported for batches of 2, called with 3 and with 1 image
+                model = model_registry.load_model(self.model_path, backend, 64, 2)
+                self.assertTrue(os.path.exists(model_registry.exported_model_path(self.model_path, backend, 64, 2)))
+
+                results = model(frames, imgsz=64, conf=0., verbose=False)
+                self.assertEqual(len(results), 3)
+                single, = model(frames[2:], imgsz=64, conf=0., verbose=False)
+                np.testing.assert_allclose(results[2].boxes.data.cpu().numpy(), single.boxes.data.cpu().numpy(),
+                                           atol=1e-3)
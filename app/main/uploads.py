@@ -0,0 +1,164 @@
+import hashlib
+import os
+import tempfile
+import zipfile
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+
+from number_plate_recognition.util import (MEDIA_EXTENSIONS, probe_media, sha256_of_chunks, sniff_media_type,
+                                           zip_images_size)
+
+# Largest accepted upload if settings.MAX_UPLOAD_SIZE is not set
+DEFAULT_MAX_UPLOAD_SIZE = 2 * 1024 ** 3
+
+# Limits of zip archives if settings.MAX_BATCH_MEMBERS and settings.MAX_BATCH_IMAGES_SIZE are not set, so that an
+# archive passing MAX_UPLOAD_SIZE cannot make the worker inflate far more
+DEFAULT_MAX_BATCH_MEMBERS = 20000
+DEFAULT_MAX_BATCH_IMAGES_SIZE = 8 * 1024 ** 3
+
+# Bytes received per handler call, larger than Django's 64 KiB to cut the per-chunk overhead on long videos
+UPLOAD_CHUNK_SIZE = 1024 ** 2
+
+UNSUPPORTED_TYPE_ERROR = 'Unsupported file type, upload a JPEG photo, an MP4 video or a zip archive of images.'
+UNREADABLE_ERROR = 'The file could not be decoded.'
+
+
+def get_max_upload_size() -> int:
+    """Returns the largest accepted upload in bytes."""
+    return getattr(settings, 'MAX_UPLOAD_SIZE', DEFAULT_MAX_UPLOAD_SIZE)
+
+
+def too_large_error() -> str:
+    """Returns the error shown for uploads over the size limit."""
+    return f'The file is larger than the {get_max_upload_size() / 1024 ** 2:.0f} MiB limit.'
+
+
+def get_batch_archive_error(path: str) -> Optional[str]:
+    """
+    Checks a zip archive against settings.MAX_BATCH_MEMBERS and settings.MAX_BATCH_IMAGES_SIZE, reading only its
+    central directory.
+
+    Returns:
+        str: Why the archive is rejected, or None if it is within the limits or not a zip archive at all.
+    """
+    max_members = getattr(settings, 'MAX_BATCH_MEMBERS', DEFAULT_MAX_BATCH_MEMBERS)
+    max_images_size = getattr(settings, 'MAX_BATCH_IMAGES_SIZE', DEFAULT_MAX_BATCH_IMAGES_SIZE)
+
+    try:
+        with zipfile.ZipFile(path) as archive:
+            if len(archive.infolist()) > max_members:
+                return f'The archive contains more than {max_members} files.'
+            if zip_images_size(archive) > max_images_size:
+                return f'The images of the archive are larger than {max_images_size / 1024 ** 2:.0f} MiB unpacked.'
+    except zipfile.BadZipFile:
+        pass  # Rejected as undecodable by probe_media
+    return None
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """
+    Streams uploads to temporary files like Django's default handler, checking them on the way.
+
+    The SHA-256 is computed and the media type sniffed from the magic bytes while the chunks are written. Uploads of
+    an unsupported type or over settings.MAX_UPLOAD_SIZE are cut off as soon as that is known, the reason is left in
+    request.upload_error. Zip archives whose images would inflate beyond settings.MAX_BATCH_IMAGES_SIZE are rejected
+    the same way once complete. Complete uploads are probed for their frame count, frame rate, resolution and codec, and
+    renamed with the extension of their actual type.
+    """
+    chunk_size = UPLOAD_CHUNK_SIZE
+
+    def new_file(self, *args, **kwargs) -> None:
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+        self.media_type = None
+
+    def receive_data_chunk(self, raw_data: bytes, start: int) -> None:
+        if start == 0:
+            self.media_type = sniff_media_type(raw_data)
+            if self.media_type is None:
+                self.reject(UNSUPPORTED_TYPE_ERROR)
+
+        if start + len(raw_data) > get_max_upload_size():
+            self.reject(too_large_error())
+
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size: int) -> Optional[UploadedFile]:
+        file = super().file_complete(file_size)
+
+        # The size of a zip archive's content is only known from its central directory at the end
+        if self.media_type == 'batch':
+            error = get_batch_archive_error(file.temporary_file_path())
+            if error is not None:
+                self.request.upload_error = error
+                file.close()
+                return None
+
+        file.sha256 = self.sha256.hexdigest()
+        file.media_info = probe_media(file.temporary_file_path(), self.media_type) if self.media_type else None
+        if file.media_info is not None:
+            file.name = media_file_name(file.name, self.media_type)
+        return file
+
+    def reject(self, error: str) -> None:
+        """
+        Deletes the partial upload and stops reading the request. The rest of the body is not read, the connection is
+        closed after the response instead, so that a large rejected upload is not received in full.
+        """
+        self.request.upload_error = error
+        self.file.close()
+        raise StopUpload(connection_reset=True)
+
+
+def media_file_name(name: str, media_type: str) -> str:
+    """Returns the file name with the extension the pipeline expects for the media type, e.g. a.jpeg -> a.jpg."""
+    return f'{os.path.splitext(name)[0]}.{MEDIA_EXTENSIONS[media_type]}'
+
+
+def get_upload_error(request) -> Optional[str]:
+    """Returns why HashingUploadHandler stopped an upload of the request, or None."""
+    return getattr(request, 'upload_error', None)
+
+
+def get_upload_sha256(uploaded_file: UploadedFile) -> str:
+    """Returns the SHA-256 computed while receiving the upload, hashing it now if another upload handler was used."""
+    sha256 = getattr(uploaded_file, 'sha256', None)
+    if sha256 is None:
+        sha256 = sha256_of_chunks(uploaded_file.chunks())
+        uploaded_file.seek(0)
+    return sha256
+
+
+def get_upload_media_info(uploaded_file: UploadedFile) -> Optional[Dict[str, Any]]:
+    """
+    Returns the metadata probed while receiving the upload, probing it now if another upload handler was used.
+
+    Returns:
+        dict: See util.probe_media, or None if the upload is not a supported image or video.
+    """
+    if hasattr(uploaded_file, 'media_info'):
+        return uploaded_file.media_info
+
+    media_type = sniff_media_type(uploaded_file.read(12))
+    uploaded_file.seek(0)
+    if media_type is None:
+        return None
+
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        media_info = probe_media(uploaded_file.temporary_file_path(), media_type)
+    else:
+        # OpenCV only decodes files on disk
+        with tempfile.NamedTemporaryFile(suffix=f'.{MEDIA_EXTENSIONS[media_type]}') as f:
+            for chunk in uploaded_file.chunks():
+                f.write(chunk)
+            f.flush()
+            media_info = probe_media(f.name, media_type)
+        uploaded_file.seek(0)
+
+    if media_info is not None:
+        uploaded_file.name = media_file_name(uploaded_file.name, media_type)
+    return media_info
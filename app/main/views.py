@@ -1,91 +1,131 @@
-from django.shortcuts import render, redirect
-from django.http import HttpResponse, HttpResponseRedirect
+from django.db.models import Count, Q
+from django.shortcuts import get_object_or_404, render, redirect
+from django.http import FileResponse, Http404, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from openpyxl import Workbook
 
+import csv
+import io
+import itertools
 import os
-import re
+import tempfile
 
 from main.forms import UploadFileForm
-from main.models import Files, Plates
+from main.models import Files, Job, Plates
+from main.uploads import get_upload_error, get_upload_sha256
 
-from number_plate_recognition import main
-from number_plate_recognition.paths import INTERPOLATED_CSV_FILE_PATH, get_output_file_info
-from number_plate_recognition.paths import clear_buffer_directories, get_all_processed_frame_files_info
-from number_plate_recognition.paths import move_all_files_to_constant_dirs
-from number_plate_recognition.visualize import get_plates_with_highest_score
+from number_plate_recognition.results_store import iter_csv, load_results
+
+
+# Number of files per history page and of plates per results page
+FILES_PAGE_SIZE = 50
+PLATES_PAGE_SIZE = 50
+
+
+def parse_cursor(value, length):
+    """Returns the integers of a keyset pagination cursor like '120-8', or None for the first page."""
+    try:
+        keys = tuple(int(key) for key in value.split('-'))
+    except (AttributeError, ValueError):
+        return None
+    return keys if len(keys) == length else None
+
+
+def keyset_page(queryset, page_size):
+    """Returns the rows of a page and whether another page follows, fetching a single extra row to find out."""
+    rows = list(queryset[:page_size + 1])
+    return rows[:page_size], len(rows) > page_size
 
 
 def index(request):
-    return render(request, 'main/index.html', {'files': Files.objects.all()})
+    # Newest files first, continuing below the last file ID of the previous page
+    files = Files.objects.only('id').annotate(plate_count=Count('plates')).order_by('-id')
+    before = parse_cursor(request.GET.get('before'), 1)
+    if before:
+        files = files.filter(id__lt=before[0])
+
+    files, has_next = keyset_page(files, FILES_PAGE_SIZE)
+    context = {
+        'files': files,
+        'is_first_page': before is None,
+        'next_cursor': files[-1].id if has_next else None,
+    }
+    return render(request, 'main/index.html', context)
 
 
 def get_processed_file(request, file_id=None):
     if file_id is None:
         return HttpResponseRedirect('/')
 
-    file = Files.objects.get(pk=file_id)
+    file = get_object_or_404(Files.objects.only('uploaded_file', 'processed_file', 'preview_file', 'results_file',
+                                                'media_type', 'frame_count').annotate(plate_count=Count('plates')),
+                             pk=file_id)
+
+    # Plates in frame order, continuing after the (frame number, ID) of the last plate of the previous page
+    plates = Plates.objects.filter(file_id=file.id).only('frame_number', 'plate_number', 'accuracy', 'processed_frame',
+                                                         'thumbnail', 'source_name').order_by('frame_number', 'id')
+    after = parse_cursor(request.GET.get('after'), 2)
+    if after:
+        frame_number, plate_id = after
+        plates = plates.filter(Q(frame_number__gt=frame_number) | Q(frame_number=frame_number, id__gt=plate_id))
+
+    plates, has_next = keyset_page(plates, PLATES_PAGE_SIZE)
     context = {
         'file': file,
-        'file_type': determine_file_type(file.processed_file.name),
-        'plates': Plates.objects.filter(file_id=file.id),
+        'job': file.jobs.only('file', 'status', 'progress', 'error').order_by('-created_at').first(),
+        'file_type': file.media_type or determine_file_type(file.uploaded_file.name),
+        # Deleted to keep the outputs within settings.OUTPUTS_CACHE_MAX_BYTES, see jobs.evict_outputs
+        'outputs_evicted': not file.processed_file and not file.results_file,
+        'plates': plates,
+        'is_first_page': after is None,
+        'next_cursor': f'{plates[-1].frame_number}-{plates[-1].id}' if has_next else None,
     }
     return render(request, 'main/results.html', context)
 
 
-def process_file(request):
-    if request.method == 'POST':
-        clear_buffer_directories()
-
-        form = UploadFileForm(request.POST, request.FILES)
-        if form.is_valid():
-            # Save the uploaded file
-            fp = Files(uploaded_file=form.cleaned_data['uploaded_file'])
-            fp.save()
-
-            # Process the file
-            main.run_plate_recognition()
+def reprocess_file(request, file_id):
+    """Queues a file whose outputs were evicted to be processed again, unless it is queued already."""
+    file = get_object_or_404(Files.objects.only('id'), pk=file_id)
 
-            # Update processed file path to the table
-            processed_file = get_output_file_info()
-            fp.processed_file = os.path.join('buffer', 'outputs', processed_file['name'])
-            fp.save()
+    if request.method == 'POST' and not file.jobs.filter(status__in=[Job.QUEUED, Job.RUNNING]).exists():
+        Job.objects.create(file=file)
 
-            # Handle plate data
-            processed_frames = get_all_processed_frame_files_info()
-            plates_with_highest_score_data = get_plates_with_highest_score(INTERPOLATED_CSV_FILE_PATH)
+    return redirect('results', file_id=file.id)
 
-            for plate, frame in zip(plates_with_highest_score_data, processed_frames):
-                accuracy = round(float(plate['license_number_score']) * 100, 2)
-                new_plate = Plates(file_id=fp.id, frame_number=plate['frame_number'], plate_number=plate['license_number'],
-                                  accuracy=accuracy, processed_frame=f"buffer/processed_frames/{frame['name']}")
-                new_plate.save()
 
-            move_all_files_to_constant_dirs()
-            update_paths_in_database(fp)
+def get_job_status(request, file_id):
+    job = Job.objects.filter(file_id=file_id).order_by('-created_at').first()
+    if job is None:
+        raise Http404('No processing job for this file')
 
-            # Redirect to results page with the newly processed file ID
-            return redirect('results', file_id=fp.id)
+    return JsonResponse({'status': job.status, 'progress': round(job.progress * 100, 1), 'error': job.error})
 
-    return render(request, 'main/index.html', {'form': UploadFileForm()})
 
+def process_file(request):
+    upload_errors = []
+    if request.method == 'POST':
+        form = UploadFileForm(request.POST, request.FILES)
 
-def remove_buffer_directory(path: str):
-    parts = re.split(r'[\\/]', path)
-    if parts[0] == 'buffer':
-        parts.pop(0)
-    return os.path.join(*parts)
+        # Uploads stopped by the upload handler are missing from the form, the handler left the reason
+        upload_error = get_upload_error(request)
+        if upload_error is not None:
+            upload_errors = [upload_error]
+        elif form.is_valid():
+            # Save the uploaded file with the metadata probed while it was received
+            uploaded_file = form.cleaned_data['uploaded_file']
+            fp = Files(uploaded_file=uploaded_file, content_hash=get_upload_sha256(uploaded_file),
+                       file_size=uploaded_file.size, **uploaded_file.media_info)
+            fp.save()
 
+            # Queue the file for the worker processes
+            Job.objects.create(file=fp)
 
-def update_paths_in_database(file):
-    file.uploaded_file = remove_buffer_directory(str(file.uploaded_file))
-    file.processed_file = remove_buffer_directory(str(file.processed_file))
-    file.save()
+            # Redirect to results page, which shows the progress until processing is done
+            return redirect('results', file_id=fp.id)
+        else:
+            upload_errors = form.errors.get('uploaded_file', [])
 
-    file_id = file.id
-    plates = Plates.objects.filter(file_id=file_id)
-    for plate in plates:
-        plate.processed_frame = remove_buffer_directory(str(plate.processed_frame))
-        plate.save()
+    return render(request, 'main/index.html', {'form': UploadFileForm(), 'upload_errors': upload_errors},
+                  status=400 if upload_errors else 200)
 
 
 def determine_file_type(file_url):
@@ -98,19 +138,68 @@ def determine_file_type(file_url):
         return None
 
 
+# Header of the plate exports
+EXPORT_HEADER = ['Frame Number', 'Plate Number', 'Accuracy %']
+
+# Number of rows fetched from the database, and formatted per streamed CSV chunk
+EXPORT_CHUNK_SIZE = 2000
+
+
+def plate_rows(file_id):
+    """Yields the exported columns of a file's plates in frame order, fetching EXPORT_CHUNK_SIZE rows at a time."""
+    return Plates.objects.filter(file_id=file_id).order_by('frame_number', 'id').values_list(
+        'frame_number', 'plate_number', 'accuracy').iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def stream_csv(rows):
+    """Formats rows as CSV text, yielding one chunk of EXPORT_CHUNK_SIZE rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % EXPORT_CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
 def download_excel(request, file_id):
-    wb = Workbook()
-    ws = wb.active
-    ws.append(['Frame Number', 'Plate Number', 'Accuracy %'])
+    # Write-only workbooks stream the rows to a temporary file instead of keeping every cell in memory
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(EXPORT_HEADER)
+
+    for row in plate_rows(file_id):
+        ws.append(row)
+
+    workbook_file = tempfile.TemporaryFile()
+    wb.save(workbook_file)
+    workbook_file.seek(0)
+
+    return FileResponse(workbook_file, as_attachment=True, filename='processed_data.xlsx',
+                        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+
+def download_csv(request, file_id):
+    response = StreamingHttpResponse(stream_csv(itertools.chain([EXPORT_HEADER], plate_rows(file_id))),
+                                     content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename=processed_data.csv'
+    return response
 
-    processed_data = Plates.objects.filter(file_id=file_id)
 
-    for data in processed_data:
-        ws.append([data.frame_number, data.plate_number, data.accuracy])
+def download_detections(request, file_id):
+    file = get_object_or_404(Files.objects.only('results_file'), pk=file_id)
 
-    # Save workbook to HttpResponse
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=processed_data.xlsx'
-    wb.save(response)
+    # Files processed before the results arrays were stored have an empty name, their plates are still exported
+    # from the database by download_csv and download_excel
+    if file.results_file.name == '' or not os.path.exists(file.results_file.path):
+        raise Http404('No detections are stored for this file')
 
+    # The results array is memory-mapped, only the chunk being formatted is read
+    response = StreamingHttpResponse(iter_csv(load_results(file.results_file.path), EXPORT_CHUNK_SIZE),
+                                     content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename=detections.csv'
     return response
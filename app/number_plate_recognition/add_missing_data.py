@@ -1,95 +1,77 @@
-import csv
+import os
+import sys
+
 import numpy as np
-from scipy.interpolate import interp1d
-
-from paths import RESULTS_CSV_FILE_PATH, INTERPOLATED_CSV_FILE_PATH
-
-
-def interpolate_bounding_boxes(data):
-    # Extract necessary data columns from input data
-    frame_numbers = np.array([int(row['frame_number']) for row in data])
-    car_ids = np.array([int(float(row['car_id'])) for row in data])
-    car_bboxes = np.array([list(map(float, row['car_bbox'][1:-1].split())) for row in data])
-    license_plate_bboxes = np.array([list(map(float, row['license_plate_bbox'][1:-1].split())) for row in data])
-
-    interpolated_data = []
-    unique_car_ids = np.unique(car_ids)
-    for car_id in unique_car_ids:
-
-        frame_numbers_ = [p['frame_number'] for p in data if int(float(p['car_id'])) == int(float(car_id))]
-        print(frame_numbers_, car_id)
-
-        # Filter data for a specific car ID
-        car_mask = car_ids == car_id
-        car_frame_numbers = frame_numbers[car_mask]
-        car_bboxes_interpolated = []
-        license_plate_bboxes_interpolated = []
-
-        first_frame_number = car_frame_numbers[0]
-        last_frame_number = car_frame_numbers[-1]
-
-        for i in range(len(car_bboxes[car_mask])):
-            frame_number = car_frame_numbers[i]
-            car_bbox = car_bboxes[car_mask][i]
-            license_plate_bbox = license_plate_bboxes[car_mask][i]
-
-            if i > 0:
-                prev_frame_number = car_frame_numbers[i-1]
-                prev_car_bbox = car_bboxes_interpolated[-1]
-                prev_license_plate_bbox = license_plate_bboxes_interpolated[-1]
-
-                if frame_number - prev_frame_number > 1:
-                    # Interpolate missing frames' bounding boxes
-                    frames_gap = frame_number - prev_frame_number
-                    x = np.array([prev_frame_number, frame_number])
-                    x_new = np.linspace(prev_frame_number, frame_number, num=frames_gap, endpoint=False)
-                    interp_func = interp1d(x, np.vstack((prev_car_bbox, car_bbox)), axis=0, kind='linear')
-                    interpolated_car_bboxes = interp_func(x_new)
-                    interp_func = interp1d(x, np.vstack((prev_license_plate_bbox, license_plate_bbox)), axis=0, kind='linear')
-                    interpolated_license_plate_bboxes = interp_func(x_new)
-
-                    car_bboxes_interpolated.extend(interpolated_car_bboxes[1:])
-                    license_plate_bboxes_interpolated.extend(interpolated_license_plate_bboxes[1:])
-
-            car_bboxes_interpolated.append(car_bbox)
-            license_plate_bboxes_interpolated.append(license_plate_bbox)
-
-        for i in range(len(car_bboxes_interpolated)):
-            frame_number = first_frame_number + i
-            row = {}
-            row['frame_number'] = str(frame_number)
-            row['car_id'] = str(car_id)
-            row['car_bbox'] = ' '.join(map(str, car_bboxes_interpolated[i]))
-            row['license_plate_bbox'] = ' '.join(map(str, license_plate_bboxes_interpolated[i]))
-
-            if str(frame_number) not in frame_numbers_:
-                # Imputed row, set the following fields to '0'
-                row['license_plate_bbox_score'] = '0'
-                row['license_number'] = '0'
-                row['license_number_score'] = '0'
-            else:
-                # Original row, retrieve values from the input data if available
-                original_row = [p for p in data if int(p['frame_number']) == frame_number and int(float(p['car_id'])) == int(float(car_id))][0]
-                row['license_plate_bbox_score'] = original_row['license_plate_bbox_score'] if 'license_plate_bbox_score' in original_row else '0'
-                row['license_number'] = original_row['license_number'] if 'license_number' in original_row else '0'
-                row['license_number_score'] = original_row['license_number_score'] if 'license_number_score' in original_row else '0'
-
-            interpolated_data.append(row)
-
-    return interpolated_data
-
-
-# Load the CSV file
-with open(RESULTS_CSV_FILE_PATH, 'r') as file:
-    reader = csv.DictReader(file)
-    data = list(reader)
-
-# Interpolate missing data
-interpolated_data = interpolate_bounding_boxes(data)
-
-# Write updated data to a new CSV file
-header = ['frame_number', 'car_id', 'car_bbox', 'license_plate_bbox', 'license_plate_bbox_score', 'license_number', 'license_number_score']
-with open(INTERPOLATED_CSV_FILE_PATH, 'w', newline='') as file:
-    writer = csv.DictWriter(file, fieldnames=header)
-    writer.writeheader()
-    writer.writerows(interpolated_data)
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from number_plate_recognition.paths import SCRIPTS_WORKSPACE
+from number_plate_recognition.results_store import RESULTS_DTYPE, load_results, save_results, write_csv
+
+
+def interpolate_bounding_boxes(results: np.ndarray) -> np.ndarray:
+    """
+    Fills the frames missing between the detections of each car with linearly interpolated bounding boxes.
+
+    The records are sorted by car and frame, and every track is laid out over its whole frame range one after
+    another. A single np.interp call per coordinate then fills all gaps of all tracks at once, since no two tracks
+    share a gap.
+
+    Args:
+        results: Structured array of RESULTS_DTYPE, e.g. memory-mapped with load_results.
+
+    Returns:
+        np.ndarray: One record per car and frame from its first to its last detection, ordered by car ID and frame
+            number. Imputed records have their scores set to 0 and their license number to '0'.
+    """
+    if len(results) == 0:
+        return np.zeros(0, dtype=RESULTS_DTYPE)
+
+    # Sort by car ID, then frame number
+    order = np.lexsort((results['frame_number'], results['car_id']))
+    frame_numbers = results['frame_number'][order].astype(np.int64)
+    car_ids = results['car_id'][order]
+
+    # First and last detection of every track
+    track_starts = np.flatnonzero(np.r_[True, car_ids[1:] != car_ids[:-1]])
+    track_ends = np.r_[track_starts[1:], len(order)] - 1
+    track_lengths = frame_numbers[track_ends] - frame_numbers[track_starts] + 1
+    output_starts = np.r_[0, np.cumsum(track_lengths)[:-1]]
+
+    # Position of every detection in the output
+    track_of_detection = np.repeat(np.arange(len(track_starts)), track_ends - track_starts + 1)
+    positions = output_starts[track_of_detection] + frame_numbers - frame_numbers[track_starts][track_of_detection]
+
+    interpolated = np.zeros(int(track_lengths.sum()), dtype=RESULTS_DTYPE)
+    interpolated['car_id'] = np.repeat(car_ids[track_starts], track_lengths)
+    interpolated['frame_number'] = np.arange(len(interpolated)) - np.repeat(output_starts, track_lengths) + \
+        np.repeat(frame_numbers[track_starts], track_lengths)
+
+    # Interpolate missing frames' bounding boxes
+    all_positions = np.arange(len(interpolated))
+    for column in ('car_bbox', 'license_plate_bbox'):
+        bboxes = results[column][order]
+        for i in range(4):
+            interpolated[column][:, i] = np.interp(all_positions, positions, bboxes[:, i].astype(np.float64))
+
+    # Imputed records keep the scores at 0
+    interpolated['license_number'] = '0'
+    for column in ('license_plate_bbox_score', 'license_number', 'license_number_score'):
+        interpolated[column][positions] = results[column][order]
+
+    return interpolated
+
+
+def main():
+    # Load the results
+    results = load_results(SCRIPTS_WORKSPACE.results_path)
+
+    # Interpolate missing data
+    interpolated = interpolate_bounding_boxes(results)
+
+    # Save the interpolated results and export them as CSV
+    save_results(interpolated, SCRIPTS_WORKSPACE.interpolated_path)
+    write_csv(interpolated, SCRIPTS_WORKSPACE.interpolated_csv_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Assignment of the license plates of a frame to the tracked vehicles carrying them.
+
+All plates are compared with all vehicles at once, and the assignment is resolved over the whole frame, so that the
+result does not depend on the order of the tracks when vehicles overlap.
+"""
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+
+def box_areas(boxes: np.ndarray) -> np.ndarray:
+    """Returns the areas of (n, 4+) boxes [x1, y1, x2, y2], zero for degenerate boxes."""
+    return np.maximum(boxes[:, 2] - boxes[:, 0], 0.) * np.maximum(boxes[:, 3] - boxes[:, 1], 0.)
+
+
+def intersection_over_area(license_plates: np.ndarray, cars: np.ndarray) -> np.ndarray:
+    """
+    Computes the share of each license plate's area that lies inside each vehicle box.
+
+    Args:
+        license_plates: License plate boxes as (p, 4+) rows [x1, y1, x2, y2, ...].
+        cars: Vehicle boxes as (c, 4+) rows [x1, y1, x2, y2, ...].
+
+    Returns:
+        np.ndarray: (p, c) matrix between 0 and 1, 1 where the plate lies completely inside the vehicle.
+    """
+    plates = np.asarray(license_plates, dtype=float)[:, None, :4]
+    boxes = np.asarray(cars, dtype=float)[None, :, :4]
+
+    w = np.maximum(np.minimum(plates[..., 2], boxes[..., 2]) - np.maximum(plates[..., 0], boxes[..., 0]), 0.)
+    h = np.maximum(np.minimum(plates[..., 3], boxes[..., 3]) - np.maximum(plates[..., 1], boxes[..., 1]), 0.)
+
+    # Degenerate plates have no intersection, the tiny area only avoids dividing by zero
+    return w * h / np.maximum(box_areas(plates[:, 0]), 1e-9)[:, None]
+
+
+def assign_plates_to_cars(license_plates: np.ndarray, cars: np.ndarray, min_overlap: float = 1.0) -> np.ndarray:
+    """
+    Assigns every license plate to at most one vehicle and every vehicle to at most one license plate.
+
+    A plate can go to the vehicles that contain at least min_overlap of its area. When a plate or a vehicle has
+    several candidates, the pairs are chosen by a single Hungarian assignment over the frame that maximizes the
+    overlap, and among vehicles containing a plate equally well prefers the smallest one, i.e. the vehicle in front.
+
+    Args:
+        license_plates: License plate boxes as (p, 4+) rows [x1, y1, x2, y2, ...].
+        cars: Vehicle boxes as (c, 4+) rows [x1, y1, x2, y2, ...].
+        min_overlap: Share of a plate's area that must lie inside a vehicle box for the plate to be assigned to it.
+
+    Returns:
+        np.ndarray: (k, 2) array of (license plate, vehicle) index pairs, ordered by license plate.
+    """
+    if len(license_plates) == 0 or len(cars) == 0:
+        return np.empty((0, 2), dtype=int)
+
+    ioa = intersection_over_area(license_plates, cars)
+    candidates = ioa >= min_overlap
+
+    if candidates.sum(1).max() <= 1 and candidates.sum(0).max() <= 1:
+        # Unambiguous frame, every plate and every vehicle has at most one candidate
+        return np.argwhere(candidates)
+
+    # Share of the vehicle box covered by the plate, between 0 and 1, breaks ties in favour of the smaller vehicle
+    car_areas = box_areas(np.asarray(cars, dtype=float))
+    plate_areas = box_areas(np.asarray(license_plates, dtype=float))
+    fill = np.minimum(plate_areas[:, None] / np.maximum(car_areas, 1e-9), 1.)
+
+    # Overlaps are weighted so that no tie-break can outweigh a better overlap of 1e-3 or more
+    score = np.where(candidates, ioa * 1e3 + fill, 0.)
+    plate_indices, car_indices = linear_sum_assignment(score, maximize=True)
+
+    # Pairs come back sorted by license plate, the ones without a candidate are dropped
+    matched = candidates[plate_indices, car_indices]
+    return np.column_stack((plate_indices[matched], car_indices[matched]))
+
+
+def unique_plates(license_plates: np.ndarray, iou_threshold: float = 0.5) -> np.ndarray:
+    """
+    Keeps a single box of every license plate that was found several times, e.g. on the crops of two overlapping
+    vehicles.
+
+    Args:
+        license_plates: License plate boxes as (p, 5+) rows [x1, y1, x2, y2, score, ...].
+        iou_threshold: Intersection over union above which two boxes are the same plate.
+
+    Returns:
+        np.ndarray: Sorted indices of the kept plates. Of each group of duplicates the one with the highest score is
+            kept.
+    """
+    plates = np.asarray(license_plates, dtype=float)
+    areas = box_areas(plates)
+    intersections = intersection_over_area(plates, plates) * areas[:, None]
+    iou = intersections / np.maximum(areas[:, None] + areas[None, :] - intersections, 1e-9)
+
+    kept = []
+    for i in np.argsort(-plates[:, 4], kind='stable'):
+        if not kept or iou[i, kept].max() <= iou_threshold:
+            kept.append(i)
+    return np.sort(np.array(kept, dtype=int))
+
+
+def assign_plates_found_in_crops(license_plates: np.ndarray, crop_boxes: np.ndarray,
+                                 min_overlap: float = 1.0) -> np.ndarray:
+    """
+    Assigns the license plates detected on the vehicle crops of a frame to the vehicles.
+
+    The crops of overlapping vehicles overlap as well, so a plate can be found on several of them. Duplicates are
+    merged first, then the plates are assigned like by assign_plates_to_cars with the crop boxes as vehicle boxes:
+    every vehicle gets at most one plate, and a plate seen on several crops goes to the vehicle in front.
+
+    Args:
+        license_plates: License plate boxes of all crops in frame coordinates, as (p, 5+) rows
+            [x1, y1, x2, y2, score, ...].
+        crop_boxes: Boxes the vehicles were cropped with, as (c, 4+) rows [x1, y1, x2, y2, ...].
+        min_overlap: Share of a plate's area that must lie inside a crop for the plate to be assigned to its vehicle.
+
+    Returns:
+        np.ndarray: (k, 2) array of (license plate, vehicle) index pairs, ordered by license plate.
+    """
+    if len(license_plates) == 0 or len(crop_boxes) == 0:
+        return np.empty((0, 2), dtype=int)
+
+    kept = unique_plates(license_plates)
+    matches = assign_plates_to_cars(np.asarray(license_plates)[kept], crop_boxes, min_overlap)
+    return np.column_stack((kept[matches[:, 0]], matches[:, 1]))
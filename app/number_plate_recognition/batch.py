@@ -0,0 +1,186 @@
+"""
+Batch mode: plate recognition on a folder or zip archive of unrelated images, e.g. camera snapshot dumps.
+
+Decoding, detection, OCR and rendering run as separate stages on their own threads, connected by bounded queues. The
+detectors are called once per batch of config.batch_size images and stay loaded between batches and runs.
+"""
+import itertools
+import logging
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from number_plate_recognition import plate_recognition, visualize
+from number_plate_recognition.config import PipelineConfig
+from number_plate_recognition.ocr_policy import OcrPolicy
+from number_plate_recognition.paths import Workspace
+from number_plate_recognition.results_store import RESULTS_DTYPE, results_to_array
+from number_plate_recognition.stages import StagedPipeline
+from number_plate_recognition.util import is_batch_image, list_zip_images
+
+logger = logging.getLogger(__name__)
+
+
+class ImageSource:
+    """Images of a folder, including its subfolders, or of a zip archive, in name order and decoded one at a time."""
+    def __init__(self, path: str) -> None:
+        """
+        Initializes ImageSource.
+
+        Args:
+            path: Folder or zip archive containing the images.
+        """
+        self.path = path
+        self.__archive: Optional[zipfile.ZipFile] = None if os.path.isdir(path) else zipfile.ZipFile(path)
+
+        if self.__archive is None:
+            self.names = sorted(os.path.relpath(os.path.join(folder, name), path)
+                                for folder, _, names in os.walk(path) for name in names if is_batch_image(name))
+        else:
+            self.names = list_zip_images(self.__archive)
+
+    def read(self, name: str) -> Optional[np.ndarray]:
+        """Returns the decoded image, or None if it cannot be decoded."""
+        if self.__archive is None:
+            return cv2.imread(os.path.join(self.path, name))
+
+        data = np.frombuffer(self.__archive.read(name), np.uint8)
+        return cv2.imdecode(data, cv2.IMREAD_COLOR) if data.size else None
+
+    def close(self) -> None:
+        if self.__archive is not None:
+            self.__archive.close()
+
+    def __enter__(self) -> 'ImageSource':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def decode_batches(source: ImageSource, batch_size: int, unreadable: List[str]) -> Iterator[Tuple[list, list]]:
+    """
+    Decodes the images of the source and yields them in batches.
+
+    Args:
+        source: Images to decode.
+        batch_size: Maximum number of images per batch.
+        unreadable: Receives the names of the images that cannot be decoded, which are left out.
+
+    Yields:
+        tuple: Images of the batch and their indices in source.names.
+    """
+    batch, indices = [], []
+
+    for index, name in enumerate(source.names):
+        image = source.read(name)
+        if image is None:
+            unreadable.append(name)
+        else:
+            batch.append(image)
+            indices.append(index)
+
+        if len(batch) == batch_size:
+            yield batch, indices
+            batch, indices = [], []
+
+    if batch:
+        yield batch, indices
+
+
+def process_images(source: ImageSource, uploaded_file: Dict[str, str], workspace: Workspace, config: PipelineConfig,
+                   progress: Optional[Callable[[float], None]] = None) -> np.ndarray:
+    """
+    Detects and reads the license plates on every image of the source, and renders the images they were found on.
+
+    Args:
+        source: Images to process.
+        uploaded_file: Name and path of the uploaded zip archive, naming the processed frames.
+        workspace: Workspace the processed frames are written to.
+        config: Pipeline settings.
+        progress: Called with the fraction of images processed so far.
+
+    Returns:
+        np.ndarray: Results array with the image index as frame number, see results_store.RESULTS_DTYPE.
+    """
+    image_count = len(source.names)
+    unreadable = []
+    records = []
+
+    # Every vehicle of the batch gets its own ID, so every plate is read once
+    car_ids = itertools.count(1)
+    ocr_policy = OcrPolicy()
+    ocr_pool = ThreadPoolExecutor(config.ocr_workers) if config.ocr_workers > 1 else None
+
+    def detect_stage(batch):
+        images, indices = batch
+        return images, indices, plate_recognition.detect_in_images(images, car_ids, config)
+
+    def ocr_stage(batch):
+        images, indices, assigned_per_image = batch
+        return images, indices, plate_recognition.read_license_plates(images, indices, assigned_per_image,
+                                                                      ocr_policy, config.ocr_batch, ocr_pool)
+
+    def render_stage(batch):
+        for image, index, image_results in zip(*batch):
+            if image_results:
+                results = results_to_array({index: image_results})
+                visualize.render_image(image, results, index, uploaded_file, workspace)
+                records.append(results)
+
+        if progress and image_count:
+            progress((batch[1][-1] + 1) / image_count)
+
+    stages = StagedPipeline(config.queue_size)
+    stages.set_source('decode', decode_batches(source, config.batch_size, unreadable))
+    stages.add_stage('detect', detect_stage)
+    stages.add_stage('ocr', ocr_stage)
+    stages.add_stage('render', render_stage)
+
+    start = time.perf_counter()
+    try:
+        stages.run()
+    finally:
+        if ocr_pool:
+            ocr_pool.shutdown()
+    elapsed = time.perf_counter() - start
+
+    logger.info('Batch stages:\n%s', stages.summary())
+    logger.info(throughput_summary(image_count - len(unreadable), elapsed))
+    if unreadable:
+        logger.warning('Skipped %d images that could not be decoded, e.g. %s', len(unreadable), unreadable[0])
+
+    return np.concatenate(records) if records else np.zeros(0, dtype=RESULTS_DTYPE)
+
+
+def throughput_summary(image_count: int, elapsed: float) -> str:
+    """Reports the number of images processed per second."""
+    rate = image_count / elapsed if elapsed > 0 else 0.0
+    return f"Processed {image_count} images in {elapsed:.1f} s ({rate:.1f} images/s)"
+
+
+def run(uploaded_file: Dict[str, str], workspace: Workspace, progress: Optional[Callable[[float], None]] = None,
+        config: Optional[PipelineConfig] = None) -> Tuple[np.ndarray, List[str]]:
+    """
+    Runs batch mode on an uploaded zip archive or a folder of images.
+
+    Args:
+        uploaded_file: Name and path of the zip archive or folder.
+        workspace: Workspace of this run, receiving the processed frames.
+        progress: Called with the fraction of images processed so far.
+        config: Pipeline settings, defaults are used if omitted.
+
+    Returns:
+        tuple: Results array with the image index as frame number, and the image names in index order.
+    """
+    config = config or PipelineConfig()
+
+    with ImageSource(uploaded_file['path']) as source:
+        return process_images(source, uploaded_file, workspace, config, progress), source.names
@@ -0,0 +1,54 @@
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class PipelineConfig:
+    """Settings of the recognition pipeline that can be tuned per deployment."""
+    # Inference backend of the detectors: 'pytorch', or 'onnx' / 'openvino' to run CPU-optimized exports that are
+    # created on first use and cached next to the .pt files
+    model_backend: str = 'pytorch'
+    # Input size of the detectors in pixels. Smaller sizes such as 320 are faster on CPU but miss small plates.
+    model_imgsz: int = 640
+    # Minimum confidence of the vehicle and license plate detections
+    vehicle_conf: float = 0.25
+    license_plate_conf: float = 0.25
+    # IOU above which the detectors' non-maximum suppression merges overlapping boxes
+    detector_iou: float = 0.7
+    # Number of decoded video frames sent to each detector in a single call
+    batch_size: int = 1
+    # Only every n-th video frame is sent to the detectors, the gaps are filled by tracking and interpolation
+    detection_stride: int = 1
+    # Mean absolute grey level difference (0-255) to the last detected frame below which a frame counts as static
+    # and is skipped. None disables the motion gate.
+    motion_threshold: Optional[float] = None
+    # Number of frames a vehicle track is kept alive without associated detections
+    tracker_max_age: int = 1
+    # Number of associated detections before a vehicle track is reported
+    tracker_min_hits: int = 3
+    # Minimum IOU between a vehicle detection and the predicted box of a track to match them
+    tracker_iou_threshold: float = 0.3
+    # Where the license plate detector looks for plates: 'frame' runs it on the full frame, 'vehicles' only on
+    # the crops of the tracked vehicles
+    plate_search: str = 'frame'
+    # Margin added around each vehicle crop in 'vehicles' mode, as a fraction of the vehicle box size
+    vehicle_crop_padding: float = 0.05
+    # Share of a license plate's area that must lie inside a vehicle box, or its padded crop in 'vehicles' mode, for
+    # the plate to be assigned to that vehicle
+    plate_min_overlap: float = 1.0
+    # A car's plate is not read anymore once a reading reaches this score. None disables it.
+    ocr_stop_score: Optional[float] = None
+    # A car's plate is not read anymore after this many agreeing readings. None disables it.
+    ocr_stop_agreements: Optional[int] = None
+    # Minimum number of frames between two readings of the same car's plate
+    ocr_interval: int = 1
+    # Read all license plates of a frame batch with a single OCR call instead of one call per plate. The batched call
+    # skips EasyOCR's text detector, so the readings can differ from the per plate calls
+    ocr_batch: bool = False
+    # Number of threads reading license plates in parallel when OCR is not batched
+    ocr_workers: int = 1
+    # Maximum number of frame batches waiting between two stages of the video pipeline
+    queue_size: int = 4
+    # Maximum number of rendered video frames held back until the best license plate crops of their cars are
+    # captured. Frames pushed out earlier show the first crop captured for a car instead.
+    render_buffer_size: int = 64
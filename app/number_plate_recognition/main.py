@@ -1,8 +1,14 @@
-import os
+from typing import Callable, Optional
 
+import numpy as np
 
-def run_plate_recognition():
-    """Runs the code for plate recognition and visualization"""
-    os.system('python ./number_plate_recognition/plate_recognition.py')
-    os.system('python ./number_plate_recognition/add_missing_data.py')
-    os.system('python ./number_plate_recognition/visualize.py')
+from number_plate_recognition import pipeline
+from number_plate_recognition.config import PipelineConfig
+from number_plate_recognition.paths import Workspace
+
+
+def run_plate_recognition(uploaded_file: dict[str, str], workspace: Workspace,
+                          progress: Optional[Callable[[float], None]] = None,
+                          config: Optional[PipelineConfig] = None) -> np.ndarray:
+    """Runs the code for plate recognition and visualization, returning the interpolated results array"""
+    return pipeline.run(uploaded_file, workspace, progress, config)
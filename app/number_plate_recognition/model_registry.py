@@ -0,0 +1,114 @@
+"""
+Loads the detectors once per process and warms them up, optionally as CPU-optimized exports for ONNX Runtime or
+OpenVINO that are created on first use and cached next to the PyTorch weights.
+
+The exports have a dynamic batch dimension, because the pipeline calls the detectors with batches of frames and with
+a varying number of vehicle crops.
+"""
+import logging
+import os
+import shutil
+import sys
+from functools import lru_cache
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from number_plate_recognition.paths import COCO_MODEL_PATH, LICENSE_PLATE_DETECTOR_MODEL_PATH
+
+logger = logging.getLogger(__name__)
+
+# Inference backends of the detectors. 'pytorch' runs the .pt weights, the others run exports of them.
+BACKENDS = ('pytorch', 'onnx', 'openvino')
+
+
+def exported_model_path(model_path: str, backend: str, imgsz: int, batch: int = 1) -> str:
+    """
+    Returns where the export of a model for a backend, input size and batch size is cached.
+
+    Args:
+        model_path: Path to the PyTorch weights (.pt).
+        backend: One of BACKENDS.
+        imgsz: Input size the model is exported for.
+        batch: Typical number of images per call, the exports are traced and warmed up with it. Their batch
+            dimension is dynamic, so they accept any number of images per call.
+
+    Returns:
+        str: model_path itself for 'pytorch', otherwise a path next to it naming the input size and dynamic batch,
+            e.g. yolov8n_320_dynamic.onnx or yolov8n_320_dynamic_b8_openvino_model/.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown model backend '{backend}', expected one of: {', '.join(BACKENDS)}")
+
+    stem = os.path.splitext(model_path)[0]
+    if backend == 'onnx':
+        return f'{stem}_{imgsz}_dynamic.onnx'
+    if backend == 'openvino':
+        return f'{stem}_{imgsz}_dynamic_b{batch}_openvino_model'
+    return model_path
+
+
+def export_model(model_path: str, backend: str, imgsz: int, batch: int = 1) -> str:
+    """
+    Exports a model for a backend, unless an export newer than the weights is already cached.
+
+    Args:
+        model_path: Path to the PyTorch weights (.pt).
+        backend: One of BACKENDS.
+        imgsz: Input size the model is exported for.
+        batch: Typical number of images per call, see exported_model_path.
+
+    Returns:
+        str: Path to load the model from.
+    """
+    target = exported_model_path(model_path, backend, imgsz, batch)
+    if target == model_path or (os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(model_path)):
+        return target
+
+    from ultralytics import YOLO
+
+    logger.info('Exporting %s for %s at %dpx with a dynamic batch of %d', os.path.basename(model_path), backend, imgsz,
+                batch)
+    # A static export only accepts the batch size it was exported with, the pipeline sends batches of any size
+    exported = YOLO(model_path).export(format=backend, imgsz=imgsz, dynamic=True, batch=batch)
+
+    # Ultralytics names the export after the weights only, so it is moved to the name with the input size
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    shutil.move(exported, target)
+    return target
+
+
+def export_models(backend: str, imgsz: int, batch: int = 1) -> None:
+    """
+    Creates the missing exports of both detectors, before worker processes start and would export them concurrently.
+
+    Args:
+        backend: One of BACKENDS.
+        imgsz: Input size the models are exported for.
+        batch: Typical number of images per call, see exported_model_path.
+    """
+    for model_path in (COCO_MODEL_PATH, LICENSE_PLATE_DETECTOR_MODEL_PATH):
+        export_model(model_path, backend, imgsz, batch)
+
+
+@lru_cache(maxsize=None)
+def load_model(model_path: str, backend: str = 'pytorch', imgsz: int = 640, batch: int = 1):
+    """
+    Loads a detector once per process and runs a dummy inference on a full batch, so that the first frames do not
+    pay for the lazy initialization of the backend.
+
+    Args:
+        model_path: Path to the PyTorch weights (.pt).
+        backend: One of BACKENDS. Exports are created on first use.
+        imgsz: Input size of the model.
+        batch: Typical number of images per call, see exported_model_path.
+
+    Returns:
+        YOLO: Warmed up detector.
+    """
+    from ultralytics import YOLO
+
+    model = YOLO(export_model(model_path, backend, imgsz, batch), task='detect')
+    model([np.zeros((imgsz, imgsz, 3), dtype=np.uint8)] * batch, imgsz=imgsz, verbose=False)
+    return model
@@ -0,0 +1,103 @@
+from typing import Any, Dict, Optional, Tuple
+
+
+class OcrPolicy:
+    """Decides per tracked car whether its license plate still has to be read, and keeps its best reading."""
+    def __init__(self, stop_score: Optional[float] = None, stop_agreements: Optional[int] = None,
+                 interval: int = 1) -> None:
+        """
+        Initializes OcrPolicy.
+
+        Args:
+            stop_score: Reading score at which a car's plate is not read anymore. None disables it.
+            stop_agreements: Number of agreeing readings after which a car's plate is not read anymore.
+                None disables it.
+            interval: Minimum number of frames between two readings of the same car's plate.
+        """
+        self.__stop_score = stop_score
+        self.__stop_agreements = stop_agreements
+        self.__interval = max(interval, 1)
+        self.__tracks: Dict[Any, Dict[str, Any]] = {}  # Reading state of each car ID
+
+        self.ocr_calls = 0
+        self.ocr_skipped = 0
+        self.ocr_time = 0.0  # Seconds spent in OCR
+
+    @property
+    def time_saved(self) -> float:
+        """Estimated seconds saved by the skipped readings, based on the average reading time."""
+        if not self.ocr_calls:
+            return 0.0
+        return self.ocr_skipped * self.ocr_time / self.ocr_calls
+
+    def should_read(self, car_id: Any, frame_number: int) -> bool:
+        """
+        Checks whether the plate of the car has to be read in this frame.
+
+        A positive answer counts as a reading in that frame, so readings that are still pending, e.g. in a
+        batch, already respect the interval.
+
+        Args:
+            car_id: ID of the tracked car.
+            frame_number: Number of the current frame.
+
+        Returns:
+            bool: True if OCR has to run, False if the best reading so far is carried forward.
+        """
+        track = self.__tracks.get(car_id)
+        if track is None:
+            self.__tracks[car_id] = {'text': None, 'score': 0.0, 'agreements': 0, 'last_frame': frame_number,
+                                     'done': False}
+            return True
+
+        if track['done'] or frame_number - track['last_frame'] < self.__interval:
+            return False
+
+        track['last_frame'] = frame_number
+        return True
+
+    def record(self, car_id: Any, text: Any, score: float, elapsed: float) -> None:
+        """
+        Records the result of reading a car's plate.
+
+        Args:
+            car_id: ID of the tracked car.
+            text: Formatted license plate text, or 0 if it could not be read.
+            score: Confidence of the reading.
+            elapsed: Seconds the reading took.
+        """
+        self.ocr_calls += 1
+        self.ocr_time += elapsed
+        track = self.__tracks[car_id]
+
+        if not text:
+            return
+
+        if text == track['text']:
+            track['agreements'] += 1
+            track['score'] = max(track['score'], score)
+        elif score > track['score']:
+            track['text'], track['score'], track['agreements'] = text, score, 1
+
+        track['done'] = (self.__stop_score is not None and track['score'] >= self.__stop_score) or \
+                        (self.__stop_agreements is not None and track['agreements'] >= self.__stop_agreements)
+
+    def skip(self, car_id: Any) -> Tuple[Any, float]:
+        """
+        Records a skipped reading.
+
+        Args:
+            car_id: ID of the tracked car.
+
+        Returns:
+            tuple: Best text and score read for the car so far, or (0, 0) if none was read.
+        """
+        self.ocr_skipped += 1
+        track = self.__tracks[car_id]
+        if track['text'] is None:
+            return 0, 0
+        return track['text'], track['score']
+
+    def summary(self) -> str:
+        return (f"OCR ran {self.ocr_calls} times in {self.ocr_time:.1f} s, skipped {self.ocr_skipped} readings "
+                f"(~{self.time_saved:.1f} s saved)")
@@ -9,72 +9,123 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 COCO_MODEL_PATH = os.path.join(BASE_DIR, 'models', 'yolov8n.pt')
 LICENSE_PLATE_DETECTOR_MODEL_PATH = os.path.join(BASE_DIR, 'models', 'license_plate_detector.pt')
 
-# Results
-RESULTS_CSV_FILE_PATH = os.path.join(BASE_DIR, 'results.csv')
-INTERPOLATED_CSV_FILE_PATH = os.path.join(BASE_DIR, 'test_interpolated.csv')
+# Buffer for files that are still being processed
+BUFFER_DIR = os.path.join(BASE_DIR, '..', 'media', 'buffer')
+JOBS_BUFFER_DIR = os.path.join(BUFFER_DIR, 'jobs')
 
-
-def get_files_data(folder_path: str) -> list[dict[str, str]]:
-    files = os.listdir(folder_path)
-    return [{'name': file, 'path': os.path.join(folder_path, file)} for i, file in enumerate(files)]
-
-
-# Uploads
-UPLOADS_DIR = os.path.join(BASE_DIR, '..', 'media', 'buffer', 'uploads')
+# Constant directories for processed files
 UPLOADS_DIR_CONST = os.path.join(BASE_DIR, '..', 'media', 'uploads')
-
-
-def get_uploaded_file_info():
-    files_data = get_files_data(UPLOADS_DIR)
-    if files_data:
-        return files_data[0]
-    return None
-
-
-# Outputs
-OUTPUTS_DIR = os.path.join(BASE_DIR, '..', 'media', 'buffer', 'outputs')
 OUTPUTS_DIR_CONST = os.path.join(BASE_DIR, '..', 'media', 'outputs')
+PROCESSED_FRAMES_DIR_CONST = os.path.join(BASE_DIR, '..', 'media', 'processed_frames')
+RESULTS_DIR_CONST = os.path.join(BASE_DIR, '..', 'media', 'results')
+THUMBNAILS_DIR_CONST = os.path.join(BASE_DIR, '..', 'media', 'thumbnails')
+PREVIEWS_DIR_CONST = os.path.join(BASE_DIR, '..', 'media', 'previews')
 
 
-def get_output_file_info():
-    return get_files_data(OUTPUTS_DIR)[0]
-
-
-# Processed frames
-PROCESSED_FRAMES_DIR = os.path.join(BASE_DIR, '..', 'media', 'buffer', 'processed_frames')
-PROCESSED_FRAMES_DIR_CONST = os.path.join(BASE_DIR, '..', 'media', 'processed_frames')
+def get_files_data(folder_path: str) -> list[dict[str, str]]:
+    files = os.listdir(folder_path)
+    return [{'name': file, 'path': os.path.join(folder_path, file)} for i, file in enumerate(files)]
 
 
-def get_all_processed_frame_files_info():
-    return get_files_data(PROCESSED_FRAMES_DIR)
+class Workspace:
+    """Working directories and result paths of a single processing run."""
+    def __init__(self, root: str) -> None:
+        """
+        Initializes Workspace.
+
+        Args:
+            root: Directory containing all files of the run.
+        """
+        self.root = root
+        self.uploads_dir = os.path.join(root, 'uploads')
+        self.outputs_dir = os.path.join(root, 'outputs')
+        self.processed_frames_dir = os.path.join(root, 'processed_frames')
+        self.results_dir = os.path.join(root, 'results')
+        self.thumbnails_dir = os.path.join(root, 'thumbnails')
+        self.previews_dir = os.path.join(root, 'previews')
+
+        # Results, the CSV files are exports only
+        self.results_path = os.path.join(root, 'results.npy')
+        self.interpolated_path = os.path.join(root, 'interpolated.npy')
+        self.results_csv_path = os.path.join(root, 'results.csv')
+        self.interpolated_csv_path = os.path.join(root, 'test_interpolated.csv')
+
+    @classmethod
+    def for_job(cls, job_id: int) -> 'Workspace':
+        """Returns the workspace of a job, isolated from every other job."""
+        return cls(os.path.join(JOBS_BUFFER_DIR, str(job_id)))
+
+    def create(self) -> None:
+        """Creates the workspace directories, emptying them if they already exist."""
+        for folder_path in (self.uploads_dir, self.outputs_dir, self.processed_frames_dir, self.results_dir,
+                            self.thumbnails_dir, self.previews_dir):
+            clear_folder(folder_path)
+
+    def remove(self) -> None:
+        """Removes the workspace with all files left in it."""
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def get_uploaded_file_info(self):
+        files_data = get_files_data(self.uploads_dir)
+        if files_data:
+            return files_data[0]
+        return None
+
+    def get_output_file_info(self):
+        return get_files_data(self.outputs_dir)[0]
+
+    def get_all_processed_frame_files_info(self):
+        return get_files_data(self.processed_frames_dir)
+
+    def move_output_files_to_constant_dirs(self):
+        move_files(self.outputs_dir, OUTPUTS_DIR_CONST)
+        move_files(self.processed_frames_dir, PROCESSED_FRAMES_DIR_CONST)
+        move_files(self.results_dir, RESULTS_DIR_CONST)
+        move_files(self.thumbnails_dir, THUMBNAILS_DIR_CONST)
+        move_files(self.previews_dir, PREVIEWS_DIR_CONST)
+
+
+# Workspace used when the processing scripts are run on their own
+SCRIPTS_WORKSPACE = Workspace(BUFFER_DIR)
 
 
 def clear_folder(folder_path: str) -> None:
     """Clears all files in the specified folder."""
     try:
-        shutil.rmtree(folder_path)
+        shutil.rmtree(folder_path, ignore_errors=True)
         os.makedirs(folder_path)
     except Exception as e:
         print(f"An error occurred while clearing the folder: {e}")
 
 
-def clear_buffer_directories():
-    clear_folder(UPLOADS_DIR)
-    clear_folder(OUTPUTS_DIR)
-    clear_folder(PROCESSED_FRAMES_DIR)
-
-
 def move_files(source_dir: str, destination_dir: str) -> None:
     """Move files from source directory to destination directory."""
     files = os.listdir(source_dir)
 
     for file in files:
         source_path = os.path.join(source_dir, file)
-        dest_path = os.path.join(destination_dir, file)
-        shutil.move(source_path, dest_path)
+        move_file(source_path, destination_dir)
+
+
+def move_file(source_path: str, destination_dir: str) -> None:
+    """Move a single file into the destination directory."""
+    os.makedirs(destination_dir, exist_ok=True)
+    shutil.move(source_path, os.path.join(destination_dir, os.path.basename(source_path)))
+
+
+def get_file_stats(folder_path: str) -> dict[str, tuple[float, int]]:
+    """
+    Returns the modification time and size of every file of a folder, subfolders are not considered.
 
+    Returns:
+        dict: (modification time, size in bytes) by file name, empty if the folder does not exist.
+    """
+    if not os.path.isdir(folder_path):
+        return {}
 
-def move_all_files_to_constant_dirs():
-    move_files(UPLOADS_DIR, UPLOADS_DIR_CONST)
-    move_files(OUTPUTS_DIR, OUTPUTS_DIR_CONST)
-    move_files(PROCESSED_FRAMES_DIR, PROCESSED_FRAMES_DIR_CONST)
+    stats = {}
+    for entry in os.scandir(folder_path):
+        if entry.is_file():
+            stat = entry.stat()
+            stats[entry.name] = (stat.st_mtime, stat.st_size)
+    return stats
@@ -0,0 +1,84 @@
+import dataclasses
+import hashlib
+import json
+import os
+import sys
+from functools import lru_cache
+from typing import Callable, Optional
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from number_plate_recognition import add_missing_data, plate_recognition, visualize
+from number_plate_recognition.config import PipelineConfig
+from number_plate_recognition.paths import COCO_MODEL_PATH, LICENSE_PLATE_DETECTOR_MODEL_PATH, Workspace
+from number_plate_recognition.results_store import results_to_array
+from number_plate_recognition.util import file_sha256, get_reader
+
+# Version of the processing code. Bump it when a change alters the results, so that results cached by earlier
+# versions are not reused for re-uploaded files.
+PIPELINE_VERSION = 2
+
+
+def load_models(config: Optional[PipelineConfig] = None) -> None:
+    """Loads and warms up the detectors and the OCR reader so that later runs in this process reuse them."""
+    plate_recognition.load_models(config)
+    get_reader()
+
+
+@lru_cache(maxsize=None)
+def weights_sha256(model_path: str, modified: float) -> str:
+    """Returns the SHA-256 of model weights, hashed once per process and modification time."""
+    return file_sha256(model_path)
+
+
+def pipeline_version(config: PipelineConfig) -> str:
+    """
+    Identifies the code, settings and model weights producing the results, so that cached results are only reused
+    when all of them are the same.
+
+    Args:
+        config: Pipeline settings.
+
+    Returns:
+        str: Short hex digest of PIPELINE_VERSION, the settings and the weights of both detectors.
+    """
+    weights = [weights_sha256(path, os.path.getmtime(path)) if os.path.exists(path) else ''
+               for path in (COCO_MODEL_PATH, LICENSE_PLATE_DETECTOR_MODEL_PATH)]
+    fingerprint = json.dumps({'version': PIPELINE_VERSION, 'config': dataclasses.asdict(config), 'weights': weights},
+                             sort_keys=True)
+    return hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+
+
+# Share of the overall progress reported once each stage has finished
+DETECTION_PROGRESS = 0.9
+INTERPOLATION_PROGRESS = 0.92
+
+
+def run(uploaded_file: dict[str, str], workspace: Workspace, progress: Optional[Callable[[float], None]] = None,
+        config: Optional[PipelineConfig] = None) -> np.ndarray:
+    """
+    Runs plate recognition, interpolation and visualization in-process, passing the results array between stages.
+
+    Args:
+        uploaded_file: Name and path of the uploaded file.
+        workspace: Workspace of this run, receiving the processed file and frames.
+        progress: Called with the overall fraction of work done, from 0 to 1.
+        config: Pipeline settings, defaults are used if omitted.
+
+    Returns:
+        np.ndarray: Interpolated results array, see results_store.RESULTS_DTYPE.
+    """
+    config = config or PipelineConfig()
+    report = progress or (lambda fraction: None)
+
+    results = plate_recognition.process_file(uploaded_file, lambda fraction: report(fraction * DETECTION_PROGRESS),
+                                             config)
+    report(DETECTION_PROGRESS)
+
+    interpolated = add_missing_data.interpolate_bounding_boxes(results_to_array(results))
+    report(INTERPOLATION_PROGRESS)
+
+    visualize.render(uploaded_file, workspace, interpolated, config.render_buffer_size)
+    report(1.0)
+    return interpolated
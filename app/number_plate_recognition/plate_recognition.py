@@ -1,96 +1,537 @@
+import itertools
+import logging
+import os
+import sys
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Iterator, Optional
+
 from ultralytics import YOLO
 import cv2
+import numpy as np
 
-from sort.sort import *
-from util import get_car, read_license_plate, write_csv
-
-from coco_classnames import Classnames
-from paths import COCO_MODEL_PATH, LICENSE_PLATE_DETECTOR_MODEL_PATH, RESULTS_CSV_FILE_PATH, get_uploaded_file_info
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from number_plate_recognition.assignment import assign_plates_found_in_crops, assign_plates_to_cars
+from number_plate_recognition.results_store import results_to_array, save_results, write_csv
+from number_plate_recognition.sort.batched_sort import BatchedSort
+from number_plate_recognition.util import read_license_plate, read_license_plate_batch
 
-uploaded_file = get_uploaded_file_info()
+from number_plate_recognition.coco_classnames import Classnames
+from number_plate_recognition.config import PipelineConfig
+from number_plate_recognition.model_registry import load_model
+from number_plate_recognition.ocr_policy import OcrPolicy
+from number_plate_recognition.stages import StagedPipeline
+from number_plate_recognition.paths import COCO_MODEL_PATH, LICENSE_PLATE_DETECTOR_MODEL_PATH, SCRIPTS_WORKSPACE
 
-# load models
-coco_model = YOLO(COCO_MODEL_PATH)
-license_plate_detector = YOLO(LICENSE_PLATE_DETECTOR_MODEL_PATH)
+logger = logging.getLogger(__name__)
 
-mot_tracker = Sort()
 vehicles = Classnames.get_vehicles()
 
 
-def process_frame(frame):
-    _results = {}
-    # Detect vehicles
-    detections = coco_model(frame)[0]
-    detected_vehicles = []
+def load_models(config: Optional[PipelineConfig] = None) -> tuple[YOLO, YOLO]:
+    """Returns the vehicle and license plate detectors for the backend of the config, loaded once per process."""
+    config = config or PipelineConfig()
+    coco_model = load_model(COCO_MODEL_PATH, config.model_backend, config.model_imgsz, config.batch_size)
+    license_plate_detector = load_model(LICENSE_PLATE_DETECTOR_MODEL_PATH, config.model_backend, config.model_imgsz,
+                                        config.batch_size)
+    return coco_model, license_plate_detector
+
+
+def detect_vehicles(frames: list[np.ndarray], config: Optional[PipelineConfig] = None) -> list:
+    """Runs the vehicle detector on a batch of frames in a single call, returning one result per frame."""
+    config = config or PipelineConfig()
+    coco_model, _ = load_models(config)
+    return coco_model(frames, imgsz=config.model_imgsz, conf=config.vehicle_conf, iou=config.detector_iou,
+                      classes=vehicles)
+
+
+def detect_license_plates(images: list[np.ndarray], config: Optional[PipelineConfig] = None) -> list:
+    """Runs the license plate detector on a batch of frames or crops in a single call, returning one result each."""
+    config = config or PipelineConfig()
+    _, license_plate_detector = load_models(config)
+    return license_plate_detector(images, imgsz=config.model_imgsz, conf=config.license_plate_conf,
+                                  iou=config.detector_iou)
+
+
+def detect(frames: list[np.ndarray], config: Optional[PipelineConfig] = None) -> tuple[list, list]:
+    """
+    Runs both detectors on a batch of frames, one call per detector.
+
+    Args:
+        frames: Decoded frames, in frame order.
+        config: Pipeline settings, defaults are used if omitted.
+
+    Returns:
+        tuple: Vehicle detections and license plate detections, one result per frame.
+    """
+    return detect_vehicles(frames, config), detect_license_plates(frames, config)
+
+
+def get_boxes(detections) -> np.ndarray:
+    """Returns the detections of one image as an (n, 6) array of rows [x1, y1, x2, y2, score, class_id]."""
+    return detections.boxes.data.cpu().numpy().reshape(-1, 6)
+
+
+def get_vehicle_boxes(detections) -> np.ndarray:
+    """Returns the boxes and scores of the detected vehicles, in the format expected by the tracker."""
+    boxes = get_boxes(detections)
+
+    # The detector only reports vehicle classes already, the mask guards against models ignoring the filter
+    return boxes[np.isin(boxes[:, 5], vehicles), :5]
+
+
+def assign_license_plates(license_plates, track_ids: np.ndarray,
+                          min_overlap: float = 1.0) -> list[tuple[np.ndarray, np.ndarray]]:
+    """
+    Assigns license plates detected on a full frame to the tracked vehicles containing them.
+
+    Args:
+        license_plates: License plate detections of the frame.
+        track_ids: Tracked vehicle boxes and IDs.
+        min_overlap: Share of a plate's area that must lie inside a vehicle box for the plate to be assigned to it.
+
+    Returns:
+        list: Pairs of license plate (x1, y1, x2, y2, score, class_id) and vehicle (x1, y1, x2, y2, car_id).
+    """
+    plates = get_boxes(license_plates)
+    matches = assign_plates_to_cars(plates, np.asarray(track_ids).reshape(-1, 5), min_overlap)
+
+    return [(plates[plate], track_ids[car]) for plate, car in matches]
+
+
+def crop_vehicle(frame: np.ndarray, car: np.ndarray, padding: float) -> tuple[np.ndarray, int, int]:
+    """
+    Crops a tracked vehicle out of the frame.
+
+    Args:
+        frame: Decoded frame.
+        car: Tracked vehicle box and ID.
+        padding: Margin added around the box, as a fraction of its width and height.
+
+    Returns:
+        tuple: Vehicle crop and the frame coordinates of its top left corner.
+    """
+    x1, y1, x2, y2, _ = car
+    height, width, _ = frame.shape
+    pad_x, pad_y = (x2 - x1) * padding, (y2 - y1) * padding
+
+    left, top = max(int(x1 - pad_x), 0), max(int(y1 - pad_y), 0)
+    right, bottom = min(int(x2 + pad_x), width), min(int(y2 + pad_y), height)
+    return frame[top:bottom, left:right, :], left, top
+
+
+def detect_license_plates_in_vehicles(frames: list[np.ndarray], track_ids_per_frame: list[np.ndarray],
+                                      config: PipelineConfig) -> list[list[tuple[np.ndarray, np.ndarray]]]:
+    """
+    Runs the license plate detector only on the tracked vehicles, with the crops of all frames in a single call.
+
+    Every plate found is mapped back to frame coordinates. Overlapping vehicles have overlapping crops, so a plate can
+    be found on several crops and a crop can contain the plates of several vehicles. Both are resolved per frame by
+    assignment.assign_plates_found_in_crops, so every vehicle gets at most one plate and every plate one vehicle.
+
+    Args:
+        frames: Decoded frames.
+        track_ids_per_frame: Tracked vehicle boxes and IDs of each frame.
+        config: Pipeline settings.
+
+    Returns:
+        list: For each frame, pairs of license plate in frame coordinates and the vehicle it was assigned to.
+    """
+    crops, owners = [], []
+    crop_boxes = [np.zeros((len(track_ids), 4)) for track_ids in track_ids_per_frame]
+
+    for i, (frame, track_ids) in enumerate(zip(frames, track_ids_per_frame)):
+        for j, car in enumerate(track_ids):
+            crop, left, top = crop_vehicle(frame, car, config.vehicle_crop_padding)
+
+            if crop.size:
+                crops.append(crop)
+                owners.append((i, left, top))
+                crop_boxes[i][j] = left, top, left + crop.shape[1], top + crop.shape[0]
+
+    assigned = [[] for _ in frames]
+    if not crops:
+        return assigned
+
+    found = [[] for _ in frames]
+    for license_plates, (i, left, top) in zip(detect_license_plates(crops, config), owners):
+        plates = get_boxes(license_plates)
+        plates[:, [0, 2]] += left
+        plates[:, [1, 3]] += top
+        found[i].append(plates)
+
+    for i, plates_per_crop in enumerate(found):
+        if not plates_per_crop:
+            continue
+
+        plates = np.concatenate(plates_per_crop)
+        for p, c in assign_plates_found_in_crops(plates, crop_boxes[i], config.plate_min_overlap):
+            assigned[i].append((plates[p], track_ids_per_frame[i][c]))
+
+    return assigned
+
+
+def threshold_license_plate(frame: np.ndarray, license_plate: np.ndarray) -> np.ndarray:
+    """Crops the license plate out of the frame and binarizes it for OCR."""
+    x1, y1, x2, y2, *_ = license_plate
+
+    # Crop license plate
+    license_plate_crop = frame[int(y1):int(y2), int(x1):int(x2), :]
+
+    # License plate filtering
+    license_plate_crop_gray = cv2.cvtColor(license_plate_crop, cv2.COLOR_BGR2GRAY)
+    _, license_plate_crop_threshold = cv2.threshold(license_plate_crop_gray, 64, 255, cv2.THRESH_BINARY_INV)
+    return license_plate_crop_threshold
+
+
+def read_license_plates(frames: list[np.ndarray], frame_numbers: list[int],
+                        assigned_per_frame: list[list[tuple[np.ndarray, np.ndarray]]], ocr_policy: OcrPolicy,
+                        batched: bool = False, ocr_pool: Optional[Executor] = None) -> list[dict]:
+    """
+    Reads the license plates assigned to tracked vehicles, unless the OCR policy carries a reading forward.
+
+    Args:
+        frames: Decoded frames, in frame order.
+        frame_numbers: Frame number of each frame.
+        assigned_per_frame: For each frame, pairs of license plate and the vehicle it belongs to.
+        ocr_policy: Per-track OCR policy of the file.
+        batched: Read all plates of the frames with a single OCR call instead of one call per plate.
+        ocr_pool: Pool reading the plates in parallel, one call per plate. Ignored if batched.
+
+    Returns:
+        list: Results of each frame keyed by car ID.
+    """
+    readings = []
+    pending = []  # Readings waiting for the batched or pooled OCR calls, with their binarized crops
+
+    for i, frame in enumerate(frames):
+        for license_plate, car in assigned_per_frame[i]:
+            car_id = car[-1]
+            reading = {'frame': i, 'license_plate': license_plate, 'car': car, 'text': 0, 'text_score': 0}
+            readings.append(reading)
+
+            if not ocr_policy.should_read(car_id, frame_numbers[i]):
+                # Carry the best reading of the car forward
+                reading['text'], reading['text_score'] = ocr_policy.skip(car_id)
+            elif batched or ocr_pool:
+                pending.append((reading, threshold_license_plate(frame, license_plate)))
+            else:
+                # Read license plate number
+                start = time.perf_counter()
+                reading['text'], reading['text_score'] = read_license_plate(threshold_license_plate(frame,
+                                                                                                    license_plate))
+                ocr_policy.record(car_id, reading['text'], reading['text_score'], time.perf_counter() - start)
+
+    if pending:
+        start = time.perf_counter()
+        crops = [crop for _, crop in pending]
+        texts = read_license_plate_batch(crops) if batched else list(ocr_pool.map(read_license_plate, crops))
+        elapsed_per_crop = (time.perf_counter() - start) / len(pending)
+
+        for (reading, _), (text, text_score) in zip(pending, texts):
+            reading['text'], reading['text_score'] = text, text_score
+            ocr_policy.record(reading['car'][-1], text, text_score, elapsed_per_crop)
+
+    results_per_frame = [{} for _ in frames]
+
+    for reading in readings:
+        x1, y1, x2, y2, license_plate_bbox_score, _ = reading['license_plate']
+        *car_bbox_coords, car_id = reading['car']
+
+        if reading['text'] is not None and not 0:
+            results_per_frame[reading['frame']][car_id] = {'car': {'bbox': car_bbox_coords},
+                                                           'license_plate': {'bbox': (x1, y1, x2, y2),
+                                                                             'text': reading['text'],
+                                                                             'bbox_score': license_plate_bbox_score,
+                                                                             'text_score': reading['text_score']},
+                                                           }
+
+    return results_per_frame
+
 
-    for detection in detections.boxes.data.tolist():
-        *vehicle_data, class_id = detection
+class DetectionGate:
+    """Decides which video frames are sent to the detectors and counts the skipped ones."""
+    # Width the frames are downscaled to before they are compared
+    motion_width = 160
 
-        if int(class_id) in vehicles:
-            detected_vehicles.append(vehicle_data)
+    def __init__(self, stride: int = 1, motion_threshold: Optional[float] = None) -> None:
+        """
+        Initializes DetectionGate.
+
+        Args:
+            stride: Only every n-th frame is detected on.
+            motion_threshold: Mean grey level difference to the last detected frame below which a frame is skipped.
+        """
+        self.__stride = max(stride, 1)
+        self.__motion_threshold = motion_threshold
+        self.__last_detected: Optional[np.ndarray] = None  # Downscaled grey version of the last detected frame
+
+        self.frames_total = 0
+        self.frames_detected = 0
+
+    @property
+    def frames_skipped(self) -> int:
+        return self.frames_total - self.frames_detected
+
+    @property
+    def speedup(self) -> float:
+        """Ratio of decoded frames to detected frames, i.e. how many times fewer detector runs were needed."""
+        return self.frames_total / self.frames_detected if self.frames_detected else 1.0
+
+    def should_detect(self, frame_number: int, frame: np.ndarray) -> bool:
+        """
+        Checks whether the frame has to go through the detectors.
+
+        Args:
+            frame_number: Number of the frame in the video.
+            frame: Decoded frame.
+
+        Returns:
+            bool: True if the frame is detected on, False if it is skipped.
+        """
+        self.frames_total += 1
+
+        if frame_number % self.__stride != 0:
+            return False
+
+        if self.__motion_threshold is not None:
+            small_frame = self.downscale(frame)
+            if self.__last_detected is not None and \
+               cv2.absdiff(small_frame, self.__last_detected).mean() < self.__motion_threshold:
+                return False
+            self.__last_detected = small_frame
+
+        self.frames_detected += 1
+        return True
+
+    def downscale(self, frame: np.ndarray) -> np.ndarray:
+        height, width, _ = frame.shape
+        size = (self.motion_width, max(int(height * self.motion_width / width), 1))
+        return cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), size, interpolation=cv2.INTER_AREA)
+
+    def summary(self) -> str:
+        return (f"Detected on {self.frames_detected} of {self.frames_total} frames, "
+                f"skipped {self.frames_skipped} ({self.speedup:.1f}x fewer detector runs)")
+
+
+def create_tracker(config: PipelineConfig) -> BatchedSort:
+    """Returns a vehicle tracker for a new file, with the tracker settings of the config."""
+    return BatchedSort(config.tracker_max_age, config.tracker_min_hits, config.tracker_iou_threshold)
+
+
+def detect_and_track(frames: list[np.ndarray], frame_numbers: list[int], mot_tracker: BatchedSort,
+                     config: PipelineConfig) -> list[list[tuple[np.ndarray, np.ndarray]]]:
+    """
+    Detects vehicles on a batch of frames, tracks them in frame order and finds the license plates they carry.
+
+    Args:
+        frames: Decoded frames, in frame order.
+        frame_numbers: Frame number of each frame, the tracker predicts through the frames skipped in between.
+        mot_tracker: Tracker of the vehicles in the file.
+        config: Pipeline settings.
+
+    Returns:
+        list: For each frame, pairs of license plate and the vehicle it belongs to.
+    """
+    vehicle_detections = detect_vehicles(frames, config)
 
     # Track vehicles
-    track_ids = mot_tracker.update(np.asarray(detected_vehicles))
+    track_ids_per_frame = [mot_tracker.update(get_vehicle_boxes(detections), frame_number)
+                           for detections, frame_number in zip(vehicle_detections, frame_numbers)]
+
+    return find_license_plates(frames, track_ids_per_frame, config)
+
+
+def detect_in_images(images: list[np.ndarray], car_ids: Iterator[int],
+                     config: PipelineConfig) -> list[list[tuple[np.ndarray, np.ndarray]]]:
+    """
+    Detects vehicles on a batch of unrelated images, e.g. camera snapshots, and finds the license plates they carry.
+
+    The vehicles are not tracked across images. Each one takes the next ID of car_ids instead, so that sharing one
+    counter keeps the car IDs unique across all images of a batch.
+
+    Args:
+        images: Decoded images.
+        car_ids: IDs given to the vehicles found, in image order, e.g. itertools.count(1).
+        config: Pipeline settings.
+
+    Returns:
+        list: For each image, pairs of license plate and the vehicle it belongs to.
+    """
+    car_ids_per_image = []
+    for detections in detect_vehicles(images, config):
+        boxes = get_vehicle_boxes(detections)[:, :4]
+        ids = np.fromiter(itertools.islice(car_ids, len(boxes)), dtype=boxes.dtype, count=len(boxes))
+        car_ids_per_image.append(np.column_stack((boxes, ids)))
+
+    return find_license_plates(images, car_ids_per_image, config)
+
+
+def find_license_plates(frames: list[np.ndarray], track_ids_per_frame: list[np.ndarray],
+                        config: PipelineConfig) -> list[list[tuple[np.ndarray, np.ndarray]]]:
+    """
+    Detects license plates on the frames or on the vehicle crops, depending on config.plate_search.
 
-    # Detect license plates
-    license_plates = license_plate_detector(frame)[0]
+    Args:
+        frames: Decoded frames.
+        track_ids_per_frame: Vehicle boxes and IDs of each frame.
+        config: Pipeline settings.
 
-    for license_plate in license_plates.boxes.data.tolist():
-        x1, y1, x2, y2, license_plate_bbox_score, _ = license_plate
-        license_plate_bbox_coords = x1, y1, x2, y2
+    Returns:
+        list: For each frame, pairs of license plate and the vehicle it belongs to.
+    """
+    if config.plate_search == 'vehicles':
+        return detect_license_plates_in_vehicles(frames, track_ids_per_frame, config)
 
-        # Assign license plate to the car
-        *car_bbox_coords, car_id = get_car(license_plate, track_ids)
+    return [assign_license_plates(license_plates, track_ids, config.plate_min_overlap)
+            for license_plates, track_ids in zip(detect_license_plates(frames, config), track_ids_per_frame)]
 
-        if car_id != -1:
-            # Crop license plate
-            license_plate_crop = frame[int(y1):int(y2), int(x1):int(x2), :]
 
-            # License plate filtering
-            license_plate_crop_gray = cv2.cvtColor(license_plate_crop, cv2.COLOR_BGR2GRAY)
-            _, license_plate_crop_threshold = cv2.threshold(license_plate_crop_gray, 64, 255, cv2.THRESH_BINARY_INV)
+def process_frames(frames: list[np.ndarray], frame_numbers: list[int], results: dict, mot_tracker: BatchedSort,
+                   ocr_policy: OcrPolicy, config: PipelineConfig) -> None:
+    """
+    Detects vehicles and license plates on a batch of frames, then tracks and reads them in frame order.
 
-            # Read license plate number
-            license_plate_text, license_plate_text_score = read_license_plate(license_plate_crop_threshold)
+    Args:
+        frames: Decoded frames, in frame order.
+        frame_numbers: Frame number of each frame in the batch.
+        results: Results keyed by frame number, updated in place.
+        mot_tracker: Tracker of the vehicles in the file.
+        ocr_policy: Per-track OCR policy of the file.
+        config: Pipeline settings.
+    """
+    assigned_per_frame = detect_and_track(frames, frame_numbers, mot_tracker, config)
 
-            if license_plate_text is not None and not 0:
-                _results[car_id] = {'car': {'bbox': car_bbox_coords},
-                                    'license_plate': {'bbox': license_plate_bbox_coords,
-                                                      'text': license_plate_text,
-                                                      'bbox_score': license_plate_bbox_score,
-                                                      'text_score': license_plate_text_score},
-                                   }
+    results_per_frame = read_license_plates(frames, frame_numbers, assigned_per_frame, ocr_policy, config.ocr_batch)
+    for frame_number, frame_results in zip(frame_numbers, results_per_frame):
+        results[frame_number] = frame_results
 
-    return _results
 
+def decode_batches(cap: cv2.VideoCapture, gate: DetectionGate, batch_size: int):
+    """
+    Decodes the video and yields the frames passing the detection gate in batches.
 
-def process_file(file_name: str, results) -> None:
+    Args:
+        cap: VideoCapture object.
+        gate: Detection gate of the video.
+        batch_size: Maximum number of frames per batch.
+
+    Yields:
+        tuple: Frames of the batch and their frame numbers.
+    """
     frame_number = 0
+    batch, batch_frame_numbers = [], []
+    ret = True
 
-    if file_name.lower().endswith('.jpg'):  # ('.png', '.jpg', '.jpeg')
-        frame = cv2.imread(uploaded_file['path'])
-        results[frame_number] = process_frame(frame)
-    elif file_name.lower().endswith('.mp4'):  # ('.mp4', '.avi', '.mov')
-        ret = True
-        cap = cv2.VideoCapture(uploaded_file['path'])
+    # read frames
+    while ret:
+        ret, frame = cap.read()
 
-        # read frames
-        while ret:
-            ret, frame = cap.read()
+        if ret and gate.should_detect(frame_number, frame):
+            batch.append(frame)
+            batch_frame_numbers.append(frame_number)
 
-            if ret:
-                results[frame_number] = process_frame(frame)
+        if batch and (len(batch) == batch_size or not ret):
+            yield batch, batch_frame_numbers
+            batch, batch_frame_numbers = [], []
+
+        if ret:
             frame_number += 1
+
+
+def process_video(video_path: str, results: dict, ocr_policy: OcrPolicy, config: PipelineConfig,
+                  progress: Optional[Callable[[float], None]] = None) -> DetectionGate:
+    """
+    Detects, tracks and reads license plates in the frames of a video that pass the detection gate.
+
+    Decoding, detection with tracking and OCR run as separate stages on their own threads, connected by
+    bounded queues. Frames that are skipped are not detected on, the tracker's Kalman filter predicts through them,
+    and they get their results later by interpolating the tracked boxes.
+
+    Args:
+        video_path: Path to the video.
+        results: Results keyed by frame number, updated in place.
+        ocr_policy: Per-track OCR policy of the file.
+        config: Pipeline settings.
+        progress: Called with the fraction of frames processed so far.
+
+    Returns:
+        DetectionGate: Gate holding the number of detected and skipped frames.
+    """
+    mot_tracker = create_tracker(config)
+    gate = DetectionGate(config.detection_stride, config.motion_threshold)
+    cap = cv2.VideoCapture(video_path)
+    frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    ocr_pool = ThreadPoolExecutor(config.ocr_workers) if config.ocr_workers > 1 else None
+
+    def detect_stage(batch):
+        frames, frame_numbers = batch
+        return frames, frame_numbers, detect_and_track(frames, frame_numbers, mot_tracker, config)
+
+    def ocr_stage(batch):
+        frames, frame_numbers, assigned_per_frame = batch
+        results_per_frame = read_license_plates(frames, frame_numbers, assigned_per_frame, ocr_policy,
+                                                config.ocr_batch, ocr_pool)
+        for frame_number, frame_results in zip(frame_numbers, results_per_frame):
+            results[frame_number] = frame_results
+
+        if progress and frame_count > 0:
+            progress(min((frame_numbers[-1] + 1) / frame_count, 1.0))
+
+    stages = StagedPipeline(config.queue_size)
+    stages.set_source('decode', decode_batches(cap, gate, config.batch_size))
+    stages.add_stage('detect', detect_stage)
+    stages.add_stage('ocr', ocr_stage)
+
+    try:
+        stages.run()
+    finally:
+        cap.release()
+        if ocr_pool:
+            ocr_pool.shutdown()
+
+    logger.info('Video stages:\n%s', stages.summary())
+    return gate
+
+
+def process_file(uploaded_file: dict[str, str], progress: Optional[Callable[[float], None]] = None,
+                 config: Optional[PipelineConfig] = None) -> dict:
+    """
+    Detects, tracks and reads license plates in an uploaded photo or video.
+
+    Args:
+        uploaded_file: Name and path of the uploaded file.
+        progress: Called with the fraction of frames processed so far.
+        config: Pipeline settings, defaults are used if omitted.
+
+    Returns:
+        dict: Results keyed by frame number and car ID.
+    """
+    config = config or PipelineConfig()
+    results = {}
+    file_name = uploaded_file['name']
+    ocr_policy = OcrPolicy(config.ocr_stop_score, config.ocr_stop_agreements, config.ocr_interval)
+
+    if file_name.lower().endswith('.jpg'):  # ('.png', '.jpg', '.jpeg')
+        frame = cv2.imread(uploaded_file['path'])
+        process_frames([frame], [0], results, create_tracker(config), ocr_policy, config)
+    elif file_name.lower().endswith('.mp4'):  # ('.mp4', '.avi', '.mov')
+        gate = process_video(uploaded_file['path'], results, ocr_policy, config, progress)
+        logger.info(gate.summary())
+        logger.info(ocr_policy.summary())
     else:
         print(f"Unsupported file format: {file_name}")
 
+    return results
+
 
 def main():
-    results = {}
-    process_file(uploaded_file['name'], results)
+    results = results_to_array(process_file(SCRIPTS_WORKSPACE.get_uploaded_file_info()))
     # write results
-    write_csv(results, RESULTS_CSV_FILE_PATH)
+    save_results(results, SCRIPTS_WORKSPACE.results_path)
+    write_csv(results, SCRIPTS_WORKSPACE.results_csv_path)
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     main()
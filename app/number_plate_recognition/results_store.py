@@ -0,0 +1,136 @@
+from typing import Iterator, Tuple
+
+import numpy as np
+
+# Longest license number kept, longer readings are truncated
+LICENSE_NUMBER_LENGTH = 16
+
+# One record per car and frame. Boxes are (x1, y1, x2, y2) in pixels.
+RESULTS_DTYPE = np.dtype([('frame_number', np.int32),
+                          ('car_id', np.int32),
+                          ('car_bbox', np.float32, (4,)),
+                          ('license_plate_bbox', np.float32, (4,)),
+                          ('license_plate_bbox_score', np.float32),
+                          ('license_number', f'U{LICENSE_NUMBER_LENGTH}'),
+                          ('license_number_score', np.float32)])
+
+CSV_HEADER = list(RESULTS_DTYPE.names)
+
+
+def results_to_array(results: dict) -> np.ndarray:
+    """
+    Converts the per-frame results of plate_recognition.py into a results array.
+
+    Args:
+        results: Dictionary containing the results, keyed by frame number and car ID.
+
+    Returns:
+        np.ndarray: Structured array of RESULTS_DTYPE, one record per car with a read license plate.
+    """
+    records = []
+    for frame_nmr in results.keys():
+        for car_id in results[frame_nmr].keys():
+            if 'car' in results[frame_nmr][car_id].keys() and \
+               'license_plate' in results[frame_nmr][car_id].keys() and \
+               'text' in results[frame_nmr][car_id]['license_plate'].keys():
+                car = results[frame_nmr][car_id]['car']
+                license_plate = results[frame_nmr][car_id]['license_plate']
+                records.append((frame_nmr, car_id, car['bbox'][:4], license_plate['bbox'][:4],
+                                license_plate['bbox_score'], str(license_plate['text']), license_plate['text_score']))
+    return np.array(records, dtype=RESULTS_DTYPE)
+
+
+def save_results(results: np.ndarray, path: str) -> None:
+    """Saves a results array as a .npy file."""
+    np.save(path, results, allow_pickle=False)
+
+
+def load_results(path: str) -> np.ndarray:
+    """Memory-maps a results array saved with save_results, without reading it into memory."""
+    return np.load(path, mmap_mode='r', allow_pickle=False)
+
+
+def format_bbox(bbox: np.ndarray) -> str:
+    return '[' + ' '.join(map(str, bbox)) + ']'
+
+
+def results_to_rows(results: np.ndarray) -> list[dict[str, str]]:
+    """
+    Formats a results array as CSV rows, for exporting only.
+
+    Args:
+        results: Structured array of RESULTS_DTYPE.
+
+    Returns:
+        list: Rows keyed by CSV_HEADER, with every value as a string and boxes as '[x1 y1 x2 y2]'.
+    """
+    return [{'frame_number': str(record['frame_number']),
+             'car_id': str(record['car_id']),
+             'car_bbox': format_bbox(record['car_bbox']),
+             'license_plate_bbox': format_bbox(record['license_plate_bbox']),
+             'license_plate_bbox_score': str(record['license_plate_bbox_score']),
+             'license_number': str(record['license_number']),
+             'license_number_score': str(record['license_number_score'])} for record in results]
+
+
+def iter_csv(results: np.ndarray, chunk_size: int = 10000) -> Iterator[str]:
+    """
+    Formats a results array as CSV text, a chunk of records at a time, so that large arrays can be streamed.
+
+    Args:
+        results: Structured array of RESULTS_DTYPE, may be memory-mapped.
+        chunk_size: Number of records formatted per yielded chunk.
+
+    Yields:
+        str: The header line first, then the lines of up to chunk_size records.
+    """
+    yield ','.join(CSV_HEADER) + '\n'
+
+    for start in range(0, len(results), chunk_size):
+        yield ''.join(','.join(row[column] for column in CSV_HEADER) + '\n'
+                      for row in results_to_rows(results[start:start + chunk_size]))
+
+
+def write_csv(results: np.ndarray, output_path: str) -> None:
+    """
+    Exports a results array to a CSV file.
+
+    Args:
+        results: Structured array of RESULTS_DTYPE.
+        output_path: Path to the output CSV file.
+    """
+    with open(output_path, 'w') as f:
+        f.writelines(iter_csv(results))
+
+
+class FrameIndex:
+    """
+    Results grouped by frame number, so that every frame looks up only its own records.
+
+    The records are sorted by frame number once, and every frame maps to a slice of the sorted array.
+    """
+    def __init__(self, results: np.ndarray) -> None:
+        """
+        Initializes FrameIndex.
+
+        Args:
+            results: Structured array of RESULTS_DTYPE, in any order.
+        """
+        self.__results = results[np.argsort(results['frame_number'], kind='stable')]
+
+        frame_numbers, starts, counts = np.unique(self.__results['frame_number'], return_index=True,
+                                                  return_counts=True)
+        self.__slices = {frame_number: slice(start, start + count) for frame_number, start, count in
+                         zip(frame_numbers.tolist(), starts.tolist(), counts.tolist())}
+
+    def __len__(self) -> int:
+        return len(self.__slices)
+
+    def get(self, frame_number: int) -> np.ndarray:
+        """Returns the records of a frame, an empty array if it has none."""
+        return self.__results[self.__slices.get(frame_number, slice(0, 0))]
+
+    def items(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """Yields every frame number with a record and the records of that frame, in frame order."""
+        for frame_number, frame_slice in self.__slices.items():
+            yield frame_number, self.__results[frame_slice]
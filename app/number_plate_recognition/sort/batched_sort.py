@@ -0,0 +1,231 @@
+"""
+SORT with the Kalman filters of all tracks stacked into arrays.
+
+Follows tracker.Sort step by step, including the order in which tracks are created, matched and removed, so it
+produces the same track IDs and boxes. Instead of one filterpy KalmanFilter per track, the states and covariances of
+all tracks live in (n, 7) and (n, 7, 7) arrays and every predict and update is a single batched operation.
+"""
+import os
+import sys
+from typing import Optional
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from number_plate_recognition.sort.tracker import iou_batch, linear_assignment
+
+# Constant velocity model of the box centre, area and aspect ratio: state [x, y, s, r, vx, vy, vs]
+DIM_X = 7
+DIM_Z = 4
+
+F = np.eye(DIM_X)
+F[0, 4] = F[1, 5] = F[2, 6] = 1.
+
+R = np.eye(DIM_Z)
+R[2:, 2:] *= 10.
+
+P0 = np.eye(DIM_X)
+P0[4:, 4:] *= 1000.  # give high uncertainty to the unobservable initial velocities
+P0 *= 10.
+
+Q = np.eye(DIM_X)
+Q[-1, -1] *= 0.01
+Q[4:, 4:] *= 0.01
+
+
+def convert_bboxes_to_z(bboxes: np.ndarray) -> np.ndarray:
+    """Converts (n, 4+) boxes [x1, y1, x2, y2] to (n, 4) measurements [x, y, s, r]."""
+    w = bboxes[:, 2] - bboxes[:, 0]
+    h = bboxes[:, 3] - bboxes[:, 1]
+    return np.column_stack((bboxes[:, 0] + w / 2., bboxes[:, 1] + h / 2., w * h, w / h))
+
+
+def convert_x_to_bboxes(x: np.ndarray) -> np.ndarray:
+    """Converts (n, 7) states to (n, 4) boxes [x1, y1, x2, y2]. Invalid states give NaN boxes."""
+    with np.errstate(invalid='ignore'):
+        w = np.sqrt(x[:, 2] * x[:, 3])
+        h = x[:, 2] / w
+    return np.column_stack((x[:, 0] - w / 2., x[:, 1] - h / 2., x[:, 0] + w / 2., x[:, 1] + h / 2.))
+
+
+def associate_detections_to_trackers(detections: np.ndarray, trackers: np.ndarray,
+                                     iou_threshold: float = 0.3) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Assigns detections to tracked objects, both represented as bounding boxes.
+
+    Same as tracker.associate_detections_to_trackers, including the order of the unmatched detections, with the
+    membership tests done by masks instead of Python loops.
+
+    Returns:
+        tuple: Matches as (detection, tracker) index pairs, unmatched detections and unmatched trackers.
+    """
+    if len(trackers) == 0:
+        return np.empty((0, 2), dtype=int), np.arange(len(detections)), np.empty((0,), dtype=int)
+
+    iou_matrix = iou_batch(detections, trackers)
+
+    if min(iou_matrix.shape) > 0:
+        a = (iou_matrix > iou_threshold).astype(np.int32)
+        if a.sum(1).max() == 1 and a.sum(0).max() == 1:
+            matched_indices = np.stack(np.where(a), axis=1)
+        else:
+            matched_indices = linear_assignment(-iou_matrix)
+    else:
+        matched_indices = np.empty(shape=(0, 2), dtype=int)
+    matched_indices = matched_indices.reshape(-1, 2).astype(int)
+
+    detection_matched = np.zeros(len(detections), dtype=bool)
+    detection_matched[matched_indices[:, 0]] = True
+    tracker_matched = np.zeros(len(trackers), dtype=bool)
+    tracker_matched[matched_indices[:, 1]] = True
+
+    # filter out matched with low IOU
+    low_iou = iou_matrix[matched_indices[:, 0], matched_indices[:, 1]] < iou_threshold
+    unmatched_detections = np.r_[np.flatnonzero(~detection_matched), matched_indices[low_iou, 0]]
+    unmatched_trackers = np.r_[np.flatnonzero(~tracker_matched), matched_indices[low_iou, 1]]
+
+    return matched_indices[~low_iou], unmatched_detections, unmatched_trackers
+
+
+class BatchedSort:
+    """SORT tracker keeping the Kalman filters of all tracks in stacked arrays."""
+    def __init__(self, max_age: int = 1, min_hits: int = 3, iou_threshold: float = 0.3) -> None:
+        """
+        Initializes BatchedSort.
+
+        Args:
+            max_age: Number of updates a track is kept alive without associated detections.
+            min_hits: Number of associated detections before a track is reported.
+            iou_threshold: Minimum IOU between a detection and a predicted box to match them.
+        """
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.iou_threshold = iou_threshold
+        self.frame_count = 0
+        self.last_frame_number = None
+        self.__next_id = 0
+
+        # One row per track, in the order tracker.Sort keeps its KalmanBoxTracker list
+        self.__x = np.empty((0, DIM_X))
+        self.__P = np.empty((0, DIM_X, DIM_X))
+        self.__ids = np.empty(0, dtype=int)
+        self.__time_since_update = np.empty(0, dtype=int)
+        self.__hit_streak = np.empty(0, dtype=int)
+
+    def __len__(self) -> int:
+        return len(self.__ids)
+
+    def update(self, dets: np.ndarray = np.empty((0, 5)), frame_number: Optional[int] = None) -> np.ndarray:
+        """
+        Tracks the detections of the next frame.
+
+        Must be called once for every frame that was detected on, with np.empty((0, 5)) for frames without
+        detections. Frames skipped in between, e.g. by a detection stride, are covered by the Kalman prediction when
+        frame numbers are given, so that the velocities stay per frame. max_age and min_hits count updates.
+
+        Args:
+            dets: Detections as rows [x1, y1, x2, y2, score].
+            frame_number: Number of the frame in the video. If omitted, every update is one frame after the last.
+
+        Returns:
+            np.ndarray: Reported tracks as rows [x1, y1, x2, y2, id], in the same order as tracker.Sort. Their number
+                may differ from the number of detections.
+        """
+        self.frame_count += 1
+        dets = np.asarray(dets, dtype=float).reshape(-1, 5)
+
+        steps = 1
+        if frame_number is not None:
+            if self.last_frame_number is not None:
+                steps = max(frame_number - self.last_frame_number, 1)
+            self.last_frame_number = frame_number
+
+        # get predicted locations from existing trackers and drop the invalid ones
+        predicted = self.predict(steps)
+        valid = ~np.any(np.isnan(predicted), axis=1)
+        if not valid.all():
+            self.keep(valid)
+            predicted = predicted[valid]
+
+        matched, unmatched_dets, _ = associate_detections_to_trackers(dets, predicted, self.iou_threshold)
+
+        # update matched trackers with assigned detections
+        self.correct(matched[:, 1], convert_bboxes_to_z(dets[matched[:, 0]]))
+
+        # create and initialise new trackers for unmatched detections
+        self.add(convert_bboxes_to_z(dets[unmatched_dets.astype(int)]))
+
+        # report the confirmed tracks, newest first like tracker.Sort
+        boxes = convert_x_to_bboxes(self.__x)
+        reported = (self.__time_since_update < 1) & ((self.__hit_streak >= self.min_hits) |
+                                                     (self.frame_count <= self.min_hits))
+        ret = np.column_stack((boxes, self.__ids + 1))[reported][::-1]  # +1 as MOT benchmark requires positive
+
+        # remove dead tracklets
+        self.keep(self.__time_since_update <= self.max_age)
+
+        return ret if len(ret) else np.empty((0, 5))
+
+    def predict(self, steps: int = 1) -> np.ndarray:
+        """
+        Advances the states of all tracks and returns their predicted boxes.
+
+        Args:
+            steps: Number of frames to predict ahead, one Kalman prediction each.
+        """
+        for _ in range(steps):
+            x = self.__x
+            x[x[:, 6] + x[:, 2] <= 0, 6] *= 0.0
+
+            self.__x = x @ F.T
+            self.__P = F @ self.__P @ F.T + Q
+
+        self.__hit_streak[self.__time_since_update > 0] = 0
+        self.__time_since_update += 1
+        return convert_x_to_bboxes(self.__x)
+
+    def correct(self, tracks: np.ndarray, z: np.ndarray) -> None:
+        """Updates the given tracks with their measurements [x, y, s, r]."""
+        if len(tracks) == 0:
+            return
+
+        x = self.__x[tracks]
+        P = self.__P[tracks]
+
+        # H selects the first four state variables, so PH' and HPH' are slices of P
+        y = z - x[:, :DIM_Z]
+        PHT = P[:, :, :DIM_Z]
+        S = P[:, :DIM_Z, :DIM_Z] + R
+        K = PHT @ np.linalg.inv(S)
+
+        I_KH = np.broadcast_to(np.eye(DIM_X), P.shape).copy()
+        I_KH[:, :, :DIM_Z] -= K
+
+        self.__x[tracks] = x + (K @ y[:, :, None])[:, :, 0]
+        self.__P[tracks] = I_KH @ P @ I_KH.transpose(0, 2, 1) + K @ R @ K.transpose(0, 2, 1)
+
+        self.__time_since_update[tracks] = 0
+        self.__hit_streak[tracks] += 1
+
+    def add(self, z: np.ndarray) -> None:
+        """Starts a new track for every measurement [x, y, s, r]."""
+        count = len(z)
+        if count == 0:
+            return
+
+        x = np.zeros((count, DIM_X))
+        x[:, :DIM_Z] = z
+        self.__x = np.concatenate((self.__x, x))
+        self.__P = np.concatenate((self.__P, np.broadcast_to(P0, (count, DIM_X, DIM_X))))
+        self.__ids = np.r_[self.__ids, np.arange(self.__next_id, self.__next_id + count)]
+        self.__time_since_update = np.r_[self.__time_since_update, np.zeros(count, dtype=int)]
+        self.__hit_streak = np.r_[self.__hit_streak, np.zeros(count, dtype=int)]
+        self.__next_id += count
+
+    def keep(self, mask: np.ndarray) -> None:
+        """Keeps only the tracks selected by the mask, in their order."""
+        self.__x = self.__x[mask]
+        self.__P = self.__P[mask]
+        self.__ids = self.__ids[mask]
+        self.__time_since_update = self.__time_since_update[mask]
+        self.__hit_streak = self.__hit_streak[mask]
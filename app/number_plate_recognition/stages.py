@@ -0,0 +1,158 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, List, Optional
+
+# Marks the end of the items flowing through the stages
+_END = object()
+
+
+class StageStats:
+    """Utilization of a pipeline stage and depth of the queue feeding it."""
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.items = 0
+        self.busy_time = 0.0    # Seconds spent working on items
+        self.wall_time = 0.0    # Seconds from the start of the stage until it finished
+        self.max_queue_depth = 0
+        self.__queue_depth_sum = 0
+        self.__queue_depth_samples = 0
+
+    @property
+    def utilization(self) -> float:
+        return self.busy_time / self.wall_time if self.wall_time else 0.0
+
+    @property
+    def mean_queue_depth(self) -> float:
+        return self.__queue_depth_sum / self.__queue_depth_samples if self.__queue_depth_samples else 0.0
+
+    def sample_queue_depth(self, depth: int) -> None:
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        self.__queue_depth_sum += depth
+        self.__queue_depth_samples += 1
+
+    def summary(self) -> str:
+        return (f"{self.name}: {self.items} items, busy {self.busy_time:.2f} s, "
+                f"utilization {self.utilization:.0%}, input queue mean {self.mean_queue_depth:.1f} "
+                f"max {self.max_queue_depth}")
+
+
+class StagedPipeline:
+    """
+    Runs a source and a chain of stages on their own threads, connected by bounded queues.
+
+    A full queue blocks the stage in front of it, so a slow stage holds back decoding instead of letting
+    decoded frames pile up in memory.
+    """
+    def __init__(self, queue_size: int = 8) -> None:
+        """
+        Initializes StagedPipeline.
+
+        Args:
+            queue_size: Maximum number of items waiting between two stages.
+        """
+        self.__queue_size = max(queue_size, 1)
+        self.__source: Optional[Iterable] = None
+        self.__stages: List[tuple[Callable[[Any], Any], StageStats]] = []
+        self.__stop = threading.Event()
+        self.__errors: List[BaseException] = []
+
+        self.stats: List[StageStats] = []
+
+    def set_source(self, name: str, items: Iterable) -> 'StagedPipeline':
+        """Sets the iterable producing the items, e.g. a frame decoder."""
+        self.__source = items
+        self.stats.insert(0, StageStats(name))
+        return self
+
+    def add_stage(self, name: str, func: Callable[[Any], Any]) -> 'StagedPipeline':
+        """Appends a stage applying func to every item; the last stage's return values are discarded."""
+        stats = StageStats(name)
+        self.__stages.append((func, stats))
+        self.stats.append(stats)
+        return self
+
+    def run(self) -> None:
+        """
+        Runs all stages until the source is exhausted, re-raising the first error of any stage.
+
+        The last stage runs on the calling thread, so it may safely use thread-bound resources such as
+        database connections.
+        """
+        queues = [queue.Queue(maxsize=self.__queue_size) for _ in self.__stages]
+        threads = [threading.Thread(target=self.__run_source, args=(queues[0],), daemon=True)]
+
+        for i, (func, stats) in enumerate(self.__stages[:-1]):
+            threads.append(threading.Thread(target=self.__run_stage, args=(func, stats, queues[i], queues[i + 1]),
+                                            daemon=True))
+
+        for thread in threads:
+            thread.start()
+
+        last_func, last_stats = self.__stages[-1]
+        self.__run_stage(last_func, last_stats, queues[-1], None)
+
+        for thread in threads:
+            thread.join()
+
+        if self.__errors:
+            raise self.__errors[0]
+
+    def summary(self) -> str:
+        return '\n'.join(stats.summary() for stats in self.stats)
+
+    def __run_source(self, output_queue: queue.Queue) -> None:
+        stats = self.stats[0]
+        start = time.perf_counter()
+
+        try:
+            iterator = iter(self.__source)
+            while not self.__stop.is_set():
+                item_start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                stats.busy_time += time.perf_counter() - item_start
+                stats.items += 1
+                output_queue.put(item)
+        except BaseException as e:
+            self.__fail(e)
+        finally:
+            output_queue.put(_END)
+            stats.wall_time = time.perf_counter() - start
+
+    def __run_stage(self, func: Callable[[Any], Any], stats: StageStats, input_queue: queue.Queue,
+                    output_queue: Optional[queue.Queue]) -> None:
+        start = time.perf_counter()
+
+        try:
+            while True:
+                stats.sample_queue_depth(input_queue.qsize())
+                item = input_queue.get()
+                if item is _END:
+                    break
+                if self.__stop.is_set():
+                    # Drain the queue so that the stages in front are never blocked
+                    continue
+
+                item_start = time.perf_counter()
+                result = func(item)
+                stats.busy_time += time.perf_counter() - item_start
+                stats.items += 1
+
+                if output_queue is not None:
+                    output_queue.put(result)
+        except BaseException as e:
+            self.__fail(e)
+            # Keep draining until the end marker arrives
+            while input_queue.get() is not _END:
+                pass
+        finally:
+            if output_queue is not None:
+                output_queue.put(_END)
+            stats.wall_time = time.perf_counter() - start
+
+    def __fail(self, error: BaseException) -> None:
+        self.__errors.append(error)
+        self.__stop.set()
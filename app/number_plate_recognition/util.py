@@ -1,10 +1,13 @@
+import hashlib
 import string
-import easyocr
 import os
+import zipfile
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
 from uuid import uuid4
 
-# Initialize the OCR reader
-reader = easyocr.Reader(['en'], gpu=False)
+import cv2
+import numpy as np
 
 # Mapping dictionaries for character conversion
 dict_char_to_int = {'O': '0',
@@ -22,40 +25,69 @@ dict_int_to_char = {'0': 'O',
                     '5': 'S'}
 
 
-def write_csv(results: dict, output_path: str):
+# Extension the pipeline expects for each supported media type, see visualize.render and batch.run
+MEDIA_EXTENSIONS = {'image': 'jpg', 'video': 'mp4', 'batch': 'zip'}
+
+# Files of folders and zip archives that are processed in batch mode
+BATCH_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Brands of ISO base media files that hold still images rather than video
+IMAGE_BRANDS = (b'heic', b'heix', b'mif1', b'msf1', b'avif')
+
+# Size of the blank license plate crop the OCR reader is warmed up on
+OCR_WARMUP_WIDTH = 320
+OCR_WARMUP_HEIGHT = 80
+
+
+@lru_cache(maxsize=None)
+def get_reader():
     """
-    Write the results to a CSV file.
+    Returns the OCR reader, initializing it on first use so it is loaded once per process.
+
+    The reader is warmed up on a blank crop, so that the first license plate does not pay for the lazy initialization
+    of its networks.
+    """
+    import easyocr
+
+    reader = easyocr.Reader(['en'], gpu=False)
+    reader.readtext(np.zeros((OCR_WARMUP_HEIGHT, OCR_WARMUP_WIDTH), dtype=np.uint8))
+    return reader
+
+
+def recognize_crops(reader, license_plate_crops):
+    """
+    Recognizes the text of binarized license plate crops with a single OCR call.
+
+    The crops are stacked into one image and each is passed as a text box of it, so EasyOCR skips its text detector
+    and resizes every crop to the recognition network's height keeping its aspect ratio. On the CPU EasyOCR still
+    runs the network on one box at a time, on a GPU it runs all boxes as one batch.
 
     Args:
-        results: Dictionary containing the results.
-        output_path: Path to the output CSV file.
-    """
-    with open(output_path, 'w') as f:
-        f.write('{},{},{},{},{},{},{}\n'.format('frame_number', 'car_id', 'car_bbox',
-                                                'license_plate_bbox', 'license_plate_bbox_score',
-                                                'license_number', 'license_number_score'))
-
-        for frame_nmr in results.keys():
-            for car_id in results[frame_nmr].keys():
-                if 'car' in results[frame_nmr][car_id].keys() and \
-                   'license_plate' in results[frame_nmr][car_id].keys() and \
-                   'text' in results[frame_nmr][car_id]['license_plate'].keys():
-                    f.write('{},{},{},{},{},{},{}\n'.format(frame_nmr,
-                                                            car_id,
-                                                            '[{} {} {} {}]'.format(
-                                                                results[frame_nmr][car_id]['car']['bbox'][0],
-                                                                results[frame_nmr][car_id]['car']['bbox'][1],
-                                                                results[frame_nmr][car_id]['car']['bbox'][2],
-                                                                results[frame_nmr][car_id]['car']['bbox'][3]),
-                                                            '[{} {} {} {}]'.format(
-                                                                results[frame_nmr][car_id]['license_plate']['bbox'][0],
-                                                                results[frame_nmr][car_id]['license_plate']['bbox'][1],
-                                                                results[frame_nmr][car_id]['license_plate']['bbox'][2],
-                                                                results[frame_nmr][car_id]['license_plate']['bbox'][3]),
-                                                            results[frame_nmr][car_id]['license_plate']['bbox_score'],
-                                                            results[frame_nmr][car_id]['license_plate']['text'],
-                                                            results[frame_nmr][car_id]['license_plate']['text_score'])
-                            )
+        reader (easyocr.Reader): OCR reader.
+        license_plate_crops (list): Binarized crops as 2D uint8 arrays.
+
+    Returns:
+        list: OCR detections of each crop as (bbox, text, score) tuples, in the same order.
+    """
+    width = max(crop.shape[1] for crop in license_plate_crops)
+    tops = np.cumsum([0] + [crop.shape[0] for crop in license_plate_crops])
+    canvas = np.zeros((tops[-1], width), dtype=np.uint8)
+
+    boxes = []
+    for crop, top in zip(license_plate_crops, tops):
+        height, crop_width = crop.shape
+        canvas[top:top + height, :crop_width] = crop
+        boxes.append([0, crop_width, int(top), int(top + height)])
+
+    detections = reader.recognize(canvas, horizontal_list=boxes, free_list=[], batch_size=len(boxes))
+
+    # The detections come back ordered by EasyOCR, each box's top edge tells its crop
+    detections_per_crop = [[] for _ in license_plate_crops]
+    crop_of_top = {int(top): i for i, top in enumerate(tops[:-1])}
+    for detection in detections:
+        bbox = detection[0]
+        detections_per_crop[crop_of_top[int(bbox[0][1])]].append(detection)
+    return detections_per_crop
 
 
 def license_complies_format(text):
@@ -116,8 +148,40 @@ def read_license_plate(license_plate_crop):
         tuple: Tuple containing the formatted license plate text and its confidence score.
     """
 
-    detections = reader.readtext(license_plate_crop)
+    detections = get_reader().readtext(license_plate_crop)
+    return parse_license_plate_detections(detections)
+
+
+def read_license_plate_batch(license_plate_crops):
+    """
+    Read the license plate texts of several cropped images with a single batched OCR call, see recognize_crops.
+
+    Unlike read_license_plate, the crops skip EasyOCR's text detector, which can change the readings. Only used when
+    PipelineConfig.ocr_batch is enabled.
+
+    Args:
+        license_plate_crops (list): Cropped images containing the license plates.
+
+    Returns:
+        list: Formatted license plate text and confidence score for each crop, in the same order.
+    """
+    if not license_plate_crops:
+        return []
+
+    detections_per_crop = recognize_crops(get_reader(), license_plate_crops)
+    return [parse_license_plate_detections(detections) for detections in detections_per_crop]
+
+
+def parse_license_plate_detections(detections):
+    """
+    Pick the first OCR detection that complies with the license plate format.
+
+    Args:
+        detections (list): OCR detections as (bbox, text, score) tuples.
 
+    Returns:
+        tuple: Tuple containing the formatted license plate text and its confidence score.
+    """
     for detection in detections:
         _, text, score = detection
 
@@ -129,29 +193,110 @@ def read_license_plate(license_plate_crop):
     return 0, 0
 
 
-def get_car(license_plate, vehicle_track_ids):
+def file_upload_path(instance, filename):
+    unique_filename = str(uuid4())
+    ext = filename.split('.')[-1]
+    return os.path.join('buffer/uploads', f'{unique_filename}.{ext}')
+
+
+def sha256_of_chunks(chunks: Iterable[bytes]) -> str:
+    """Returns the hex SHA-256 of content read in chunks, without holding it in memory."""
+    sha256 = hashlib.sha256()
+    for chunk in chunks:
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """Returns the hex SHA-256 of a file, read in chunks of chunk_size bytes."""
+    with open(path, 'rb') as f:
+        return sha256_of_chunks(iter(lambda: f.read(chunk_size), b''))
+
+
+def sniff_media_type(header: bytes) -> Optional[str]:
     """
-    Retrieve the vehicle coordinates and ID based on the license plate coordinates.
+    Returns the media type of a file from its first bytes, instead of trusting its extension.
 
     Args:
-        license_plate (tuple): Tuple containing the coordinates of the license plate (x1, y1, x2, y2, score, class_id).
-        vehicle_track_ids (list): List of vehicle track IDs and their corresponding coordinates.
+        header: At least the first 12 bytes of the file.
 
     Returns:
-        tuple: Tuple containing the vehicle coordinates (x1, y1, x2, y2) and ID.
+        str: 'image' for JPEG, 'video' for MP4 and other ISO base media files, 'batch' for zip archives, None for
+            anything else.
     """
-    x1, y1, x2, y2, *_ = license_plate
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'image'
+    if header[4:8] == b'ftyp' and header[8:12] not in IMAGE_BRANDS:
+        return 'video'
+    if header.startswith(b'PK\x03\x04'):
+        return 'batch'
+    return None
 
-    for j in range(len(vehicle_track_ids)):
-        xcar1, ycar1, xcar2, ycar2, _ = vehicle_track_ids[j]
 
-        if x1 > xcar1 and y1 > ycar1 and x2 < xcar2 and y2 < ycar2:
-            return vehicle_track_ids[j]
+def is_batch_image(name: str) -> bool:
+    """Checks whether a file of a folder or zip archive is an image processed in batch mode."""
+    return name.lower().endswith(BATCH_IMAGE_EXTENSIONS) and not os.path.basename(name).startswith('.')
 
-    return -1, -1, -1, -1, -1
 
+def list_zip_images(archive: zipfile.ZipFile) -> List[str]:
+    """Returns the names of the images in a zip archive, in name order."""
+    return sorted(info.filename for info in archive.infolist() if not info.is_dir() and is_batch_image(info.filename))
 
-def file_upload_path(instance, filename):
-    unique_filename = str(uuid4())
-    ext = filename.split('.')[-1]
-    return os.path.join('buffer/uploads', f'{unique_filename}.{ext}')
+
+def zip_images_size(archive: zipfile.ZipFile) -> int:
+    """
+    Returns the decompressed size of the images in a zip archive, as declared by its central directory.
+
+    zipfile stops decompressing a member at its declared size, so this bounds what reading the images inflates.
+    """
+    return sum(info.file_size for info in archive.infolist() if not info.is_dir() and is_batch_image(info.filename))
+
+
+def fourcc_to_str(fourcc: float) -> str:
+    """Returns the four characters of an OpenCV FOURCC codec code."""
+    code = int(fourcc)
+    return ''.join(chr((code >> 8 * i) & 0xFF) for i in range(4)).strip('\x00 ')
+
+
+def probe_media(path: str, media_type: str) -> Optional[Dict[str, Any]]:
+    """
+    Reads the frame count, frame rate, resolution and codec of an image or video file.
+
+    Only the container header and, for videos, the first frame are decoded. The frame count of a zip archive is
+    its number of images.
+
+    Args:
+        path: Path of the file.
+        media_type: Type returned by sniff_media_type.
+
+    Returns:
+        dict: Keys media_type, frame_count, fps, width, height and codec, or None if the file cannot be decoded.
+    """
+    if media_type == 'batch':
+        try:
+            with zipfile.ZipFile(path) as archive:
+                image_count = len(list_zip_images(archive))
+        except zipfile.BadZipFile:
+            return None
+        if not image_count:
+            return None
+        return {'media_type': media_type, 'frame_count': image_count, 'fps': None, 'width': None, 'height': None,
+                'codec': 'zip'}
+
+    if media_type == 'image':
+        image = cv2.imread(path)
+        if image is None:
+            return None
+        height, width = image.shape[:2]
+        return {'media_type': media_type, 'frame_count': 1, 'fps': None, 'width': width, 'height': height,
+                'codec': 'jpeg'}
+
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened() or not cap.read()[0]:
+            return None
+        return {'media_type': media_type, 'frame_count': int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+                'fps': cap.get(cv2.CAP_PROP_FPS), 'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), 'codec': fourcc_to_str(cap.get(cv2.CAP_PROP_FOURCC))}
+    finally:
+        cap.release()
@@ -1,50 +1,60 @@
-import ast
-
+import logging
 import os
 import sys
-import csv
 import cv2
 import numpy as np
-import pandas as pd
 import math
 
-from typing import List, Dict, Tuple, Any, Optional
+from collections import deque
+from typing import List, Dict, Tuple, Any, Optional, Deque, Set, Sequence
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from number_plate_recognition.paths import get_uploaded_file_info, INTERPOLATED_CSV_FILE_PATH
-from number_plate_recognition.paths import OUTPUTS_DIR, PROCESSED_FRAMES_DIR
+from number_plate_recognition.paths import SCRIPTS_WORKSPACE, Workspace
+from number_plate_recognition.stages import StagedPipeline
+from number_plate_recognition.results_store import FrameIndex, load_results
+
+logger = logging.getLogger(__name__)
 
 
-uploaded_file = get_uploaded_file_info()
+# Maximum number of frames waiting between two stages of the rendering pipeline
+RENDER_QUEUE_SIZE = 16
+# Default maximum number of frames held back until the license plate crops they need are captured
+RENDER_BUFFER_SIZE = 64
+
+# Width and WebP quality (0-100) of the thumbnails shown for the processed frames on the results page
+THUMBNAIL_WIDTH = 320
+THUMBNAIL_QUALITY = 75
+# Width of the preview of the processed video or photo, and every n-th video frame kept in the preview
+PREVIEW_WIDTH = 480
+PREVIEW_FRAME_STEP = 2
 
 
 class LicensePlateProcessor:
     """A class to process license plate data and overlay onto frames."""
-    def __init__(self, results: pd.DataFrame, *, cap: Optional[cv2.VideoCapture] = None,
-                 frame: Optional[np.ndarray] = None) -> None:
+    def __init__(self, results: np.ndarray, *, frame: Optional[np.ndarray] = None) -> None:
         """
         Initializes LicensePlateProcessor.
 
         Args:
-            results: DataFrame containing license plate data.
-            cap: VideoCapture object for reading frames.
-            frame: Initial frame.
+            results: Results array containing license plate data.
+            frame: Initial frame. If given, the license plate crops are captured from it right away, otherwise
+                they are captured later with capture_license_plate.
 
         Returns:
             None
         """
 
         self.__coeff = 0.107                    # Coefficient for resizing the license plate crop.
-        self.__cap = cap                        # Object for reading frames.
         self.__frame: np.ndarray = frame        # Current frame.
-        self.__results: pd.DataFrame = results  # Contains license plate data.
+        self.__results: np.ndarray = results  # Contains license plate data.
 
         self.license_plate: Dict[int, Dict[str, Any]] = {}  # Stores license plate data.
         self.license_crop: np.ndarray = None                # Cropped license plate image.
         self.license_plate_number: str = ''
         self.license_crop_shape: Dict[str, int] = None
 
-        self.process_license_plate_data()
+        if frame is not None:
+            self.process_license_plate_data()
 
     def get_license_plate(self) -> Dict[int, Dict[str, Any]]:
         """Returns license plate data."""
@@ -60,7 +70,7 @@ class LicensePlateProcessor:
 
     def process_license_plate_data(self) -> None:
         """
-        Processes license plate data from results DataFrame.
+        Processes license plate data from results array.
 
         Returns:
             None
@@ -68,60 +78,53 @@ class LicensePlateProcessor:
         license_plate_data = self.extract_license_plate_data()
 
         for car_id, data in license_plate_data.items():
-            if self.__cap:
-                self.read_frame(data)
-
-            # Capture the license plate crop
-            try:
-                self.license_crop = self.capture_license_plate_crop(data['license_bbox'])
-            except Exception as e:
-                print(f"Error capturing license plate crop for car ID {car_id}: {e}")
-                continue
+            self.capture_license_plate(car_id, self.__frame, data['license_bbox'], data['license_plate_number'])
 
-            # Store license plate crop and number
-            self.license_plate[car_id] = {'license_crop': self.license_crop,
-                                          'license_plate_number': data['license_plate_number']}
-
-    def extract_license_plate_data(self) -> Dict[int, Dict[str, Any]]:
+    def capture_license_plate(self, car_id: int, frame: np.ndarray, license_bbox: np.ndarray,
+                              license_plate_number: str) -> None:
         """
-        Extracts license plate data from results DataFrame.
+        Captures the license plate crop of a car from a frame and stores it with the plate number.
+
+        Args:
+            car_id: ID of the car.
+            frame: Frame containing the license plate, not yet drawn on.
+            license_bbox: Bounding box coordinates of the license plate.
+            license_plate_number: License plate number shown next to the crop.
 
         Returns:
-            Dict[int, Dict[str, Any]]: Extracted license plate data.
+            None
         """
-        license_plate_data = {}
-        grouped_results = self.__results.groupby('car_id')
-
-        for car_id, group in grouped_results:
-            max_row = group.loc[group['license_number_score'].idxmax()]
-
-            license_bbox_str = max_row['license_plate_bbox']
-            license_plate = [float(coord) for coord in license_bbox_str.split()]
+        self.__frame = frame
 
-            license_plate_data[car_id] = {'max_score': max_row['license_number_score'],
-                                          'license_plate_number': max_row['license_number'],
-                                          'frame_number': max_row['frame_number'],
-                                          'license_bbox': license_plate, }
+        # Capture the license plate crop
+        try:
+            self.license_crop = self.capture_license_plate_crop(license_bbox)
+        except Exception as e:
+            print(f"Error capturing license plate crop for car ID {car_id}: {e}")
+            return
 
-        return license_plate_data
+        # Store license plate crop and number
+        self.license_plate[car_id] = {'license_crop': self.license_crop,
+                                      'license_plate_number': license_plate_number}
 
-    def read_frame(self, data: Dict[str, Any]) -> None:
+    def extract_license_plate_data(self) -> Dict[int, Dict[str, Any]]:
         """
-        Reads frame from video capture object.
-
-        Args:
-            data: Data containing frame number.
+        Extracts license plate data from results array.
 
         Returns:
-            None
+            Dict[int, Dict[str, Any]]: Extracted license plate data.
         """
-        # Set video capture to the frame containing the license plate
-        self.__cap.set(cv2.CAP_PROP_POS_FRAMES, data['frame_number'])
+        license_plate_data = {}
 
-        # Read the frame
-        ret, self.__frame = self.__cap.read()
+        for max_row in get_plates_with_highest_score(self.__results):
+            license_plate_data[int(max_row['car_id'])] = {'max_score': float(max_row['license_number_score']),
+                                                          'license_plate_number': str(max_row['license_number']),
+                                                          'frame_number': int(max_row['frame_number']),
+                                                          'license_bbox': max_row['license_plate_bbox'], }
+
+        return license_plate_data
 
-    def capture_license_plate_crop(self, license_bbox: List[float]) -> np.ndarray:
+    def capture_license_plate_crop(self, license_bbox: np.ndarray) -> np.ndarray:
         """
         Captures license plate crop from frame.
 
@@ -145,7 +148,7 @@ class LicensePlateProcessor:
 
         return license_crop
 
-    def add_license_plate_overlay(self, license_plate_bbox: str) -> None:
+    def add_license_plate_overlay(self, license_plate_bbox: Sequence[float]) -> None:
         """
         Adds license plate overlay to the frame.
 
@@ -156,8 +159,8 @@ class LicensePlateProcessor:
             None
         """
         try:
-            # Parse bounding box coordinates
-            car_x1, car_y1, car_x2, car_y2 = self.parse_bbox(license_plate_bbox)
+            # Bounding box coordinates
+            car_x1, car_y1, car_x2, car_y2 = license_plate_bbox
 
             # Get dimensions of the license crop
             H, W, _ = self.license_crop.shape
@@ -256,24 +259,7 @@ class LicensePlateProcessor:
         return x_left, x_right
 
     @staticmethod
-    def parse_bbox(bbox: str) -> Tuple[float, float, float, float]:
-        """
-        Parses bounding box coordinates.
-
-        Args:
-            bbox: String representation of bounding box.
-
-        Returns:
-            Tuple[float, float, float, float]: Parsed bounding box coordinates.
-        """
-        # Replace multiple spaces with single space and remove leading space inside brackets
-        bbox = bbox.replace('[ ', '[').replace('   ', ' ').replace('  ', ' ').replace(' ', ',')
-        # Convert string representation of tuple to actual tuple using ast.literal_eval
-        x1, y1, x2, y2 = ast.literal_eval(bbox)
-        return x1, y1, x2, y2
-
-    @staticmethod
-    def draw_border(frame: np.ndarray, bbox: str, color: Tuple[int, int, int] = (0, 0, 255),
+    def draw_border(frame: np.ndarray, bbox: Sequence[float], color: Tuple[int, int, int] = (0, 0, 255),
                     thickness: int = 8) -> None:
         """
         Draws border around a bounding box on the frame.
@@ -288,12 +274,12 @@ class LicensePlateProcessor:
             None
         """
         # Extract coordinates from the bounding box
-        x1, y1, x2, y2 = LicensePlateProcessor.parse_bbox(bbox)
+        x1, y1, x2, y2 = bbox
 
         # Draw rectangle border on the frame
         cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, thickness)
 
-    def crop_license_plate(self, license_plate_bbox: str, license_plate: Dict[str, Any]) -> None:
+    def crop_license_plate(self, license_plate_bbox: Sequence[float], license_plate: Dict[str, Any]) -> None:
         """
         Crops license plate from license_plate dictionary and overlays onto the frame.
 
@@ -312,42 +298,38 @@ class LicensePlateProcessor:
         self.add_license_plate_overlay(license_plate_bbox)
 
 
-def get_plates_with_highest_score(csv_file: str):
-    # Dictionary to store data for each unique license number
-    license_data = {}
-
-    # Read the CSV file
-    with open(csv_file, 'r') as file:
-        _reader = csv.DictReader(file)
+def get_plates_with_highest_score(results: np.ndarray) -> np.ndarray:
+    """
+    Selects the record with the highest license number score of each car.
 
-        # Iterate through each row in the CSV file
-        for row in _reader:
-            car_id = row['car_id']
-            license_number_score = float(row['license_number_score'])
+    Args:
+        results: Results array containing license plate data.
 
-            # If license number already exists in dictionary, update if current score is higher
-            if car_id in license_data:
-                if license_number_score > float(license_data[car_id]['license_number_score']):
-                    license_data[car_id] = row
-            # If license number is new, add it to dictionary
-            else:
-                license_data[car_id] = row
+    Returns:
+        np.ndarray: One record per car, in the order the cars first appear. Ties keep the earliest record.
+    """
+    if len(results) == 0:
+        return results[:0]
 
-    # Convert dictionary values to list
-    filtered_data = list(license_data.values())
+    # Sort by car ID, then by descending score. The sort is stable, so the earliest record wins a tie.
+    order = np.lexsort((-results['license_number_score'], results['car_id']))
+    car_ids = results['car_id'][order]
+    highest = order[np.r_[True, car_ids[1:] != car_ids[:-1]]]
 
-    return filtered_data
+    # Restore the order of first appearance
+    _, first_appearance = np.unique(results['car_id'], return_index=True)
+    return results[highest[np.argsort(first_appearance)]]
 
 
-def process_frame(frame: np.ndarray, results: pd.DataFrame, license_plate: Dict[int, Dict[str, Any]], frame_number: int,
-                  license_plate_processor: LicensePlateProcessor,
+def process_frame(frame: np.ndarray, frame_index: FrameIndex, license_plate: Dict[int, Dict[str, Any]],
+                  frame_number: int, license_plate_processor: LicensePlateProcessor,
                   bbox_color: Tuple[int, int, int] = (0, 0, 255)) -> np.ndarray:
     """
     Processes a single frame by overlaying license plate information.
 
     Args:
         frame: Input frame.
-        results: DataFrame containing license plate data.
+        frame_index: Results grouped by frame number.
         license_plate: Dictionary containing license plate data.
         frame_number: Frame number.
         license_plate_processor: Instance of LicensePlateProcessor.
@@ -356,106 +338,264 @@ def process_frame(frame: np.ndarray, results: pd.DataFrame, license_plate: Dict[
     Returns:
         np.ndarray: Processed frame.
     """
-    # Filter results DataFrame for the current frame number
-    df_ = results[results['frame_number'] == frame_number]
+    # Look up the results of the current frame number
+    frame_results = frame_index.get(frame_number)
 
-    for row in range(len(df_)):
-        LicensePlateProcessor.draw_border(frame, df_.iloc[row]['car_bbox'], color=bbox_color)
-        LicensePlateProcessor.draw_border(frame, df_.iloc[row]['license_plate_bbox'], color=bbox_color)
+    for car_id, car_bbox, license_plate_bbox in zip(frame_results['car_id'].tolist(),
+                                                    frame_results['car_bbox'].tolist(),
+                                                    frame_results['license_plate_bbox'].tolist()):
+        LicensePlateProcessor.draw_border(frame, car_bbox, color=bbox_color)
+        LicensePlateProcessor.draw_border(frame, license_plate_bbox, color=bbox_color)
 
         # Get license plate data for the current car
-        license_plate_data = license_plate[df_.iloc[row]['car_id']]
+        license_plate_data = license_plate.get(car_id)
+        if license_plate_data is None:
+            # The crop could not be captured
+            continue
 
         # Overlay license plate crop onto the frame
-        license_plate_processor.crop_license_plate(df_.iloc[row]['license_plate_bbox'], license_plate_data)
+        license_plate_processor.crop_license_plate(license_plate_bbox, license_plate_data)
 
     return license_plate_processor.get_frame()
 
 
-def process_high_score_frames(cap: cv2.VideoCapture, results: pd.DataFrame, license_plate: Dict[int, Dict[str, Any]],
-                              license_plate_processor: LicensePlateProcessor) -> None:
+def remove_file_extension(filename: str):
+    """Removes the file extension from a given filename."""
+    return os.path.splitext(filename)[0]
+
+
+def scaled_size(width: int, height: int, max_width: int) -> Tuple[int, int]:
+    """Returns the (width, height) of an image scaled down to max_width keeping its aspect ratio."""
+    if width <= max_width:
+        return width, height
+    return max_width, max(int(height * max_width / width), 1)
+
+
+def downscale(image: np.ndarray, max_width: int) -> np.ndarray:
+    """Resizes an image to max_width keeping its aspect ratio, unless it is narrower already."""
+    height, width = image.shape[:2]
+    size = scaled_size(width, height, max_width)
+    if size == (width, height):
+        return image
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def save_thumbnail(image: np.ndarray, path: str, width: int = THUMBNAIL_WIDTH) -> None:
+    """Saves a downscaled copy of an image as WebP."""
+    cv2.imwrite(path, downscale(image, width), [cv2.IMWRITE_WEBP_QUALITY, THUMBNAIL_QUALITY])
+
+
+def thumbnail_name(processed_frame_name: str) -> str:
+    """Returns the file name of the thumbnail of a processed frame."""
+    return f'{remove_file_extension(processed_frame_name)}.webp'
+
+
+def preview_name(uploaded_file_name: str) -> str:
+    """Returns the file name of the preview of a processed video or photo."""
+    if uploaded_file_name.lower().endswith('.mp4'):
+        return f'preview_{uploaded_file_name}'
+    return f'preview_{remove_file_extension(uploaded_file_name)}.webp'
+
+
+def processed_frame_name(uploaded_file_name: str, frame_number: int) -> str:
     """
-    Process frames with the highest score from a CSV file.
+    Returns the file name a processed frame is saved under.
 
     Args:
-        cap: VideoCapture object.
-        results: DataFrame containing license plate data.
-        license_plate: Dictionary containing license plate data.
-        license_plate_processor: Instance of LicensePlateProcessor.
+        uploaded_file_name: Name of the uploaded file.
+        frame_number: Frame the best license plate of a car was read on, or image of a zip archive. Photos have a
+            single processed frame.
 
     Returns:
-        None
+        str: File name in the processed frames directory.
     """
-    plates_with_highest_score_data = get_plates_with_highest_score(INTERPOLATED_CSV_FILE_PATH)
-    for item in plates_with_highest_score_data:
-        frame_number = int(item['frame_number'])
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-        ret, frame = cap.read()
+    if uploaded_file_name.lower().endswith(('.mp4', '.zip')):
+        return f'processed_frame_{frame_number}{remove_file_extension(uploaded_file_name)}.jpg'
+    return f'processed_frame_{uploaded_file_name}'
 
-        if ret:
-            # Process the frame
-            license_plate_processor.set_frame(frame)
-            process_frame(frame, results, license_plate, frame_number, license_plate_processor, (0, 255, 0))
 
-            uploaded_file_without_extension = remove_file_extension(uploaded_file['name'])
-            processed_frame_path = str(os.path.join(PROCESSED_FRAMES_DIR,
-                                       f'processed_frame_{frame_number}{uploaded_file_without_extension}.jpg'))
-            cv2.imwrite(processed_frame_path, frame)
+class DelayedRenderBuffer:
+    """
+    Renders the frames of a video in a single forward pass, capturing the license plate crops on the way.
 
+    A frame can only be rendered once the best license plate crops of all its cars are known, and the best frame of
+    a car usually comes after its first appearance. Decoded frames are therefore held back until the decoder has
+    passed the best frames of all their cars. If more than buffer_size frames are waiting, the oldest one is
+    rendered with the first crop captured for each of its cars instead.
+    """
+    def __init__(self, frame_index: FrameIndex, license_plate_processor: LicensePlateProcessor,
+                 key_frame_numbers: Set[int], buffer_size: int) -> None:
+        """
+        Initializes DelayedRenderBuffer.
 
-def remove_file_extension(filename: str):
-    """Removes the file extension from a given filename."""
-    return os.path.splitext(filename)[0]
+        Args:
+            frame_index: Results grouped by frame number.
+            license_plate_processor: Instance of LicensePlateProcessor without captured crops.
+            key_frame_numbers: Frames that are also saved as processed frames, highlighted in green.
+            buffer_size: Maximum number of frames held back.
+
+        Returns:
+            None
+        """
+        self.__frame_index = frame_index
+        self.__processor = license_plate_processor
+        self.__key_frame_numbers = key_frame_numbers
+        self.__buffer_size = max(buffer_size, 1)
+        self.__frames: Deque[Tuple[int, np.ndarray]] = deque()
+
+        self.__best_plates = license_plate_processor.extract_license_plate_data()
+        self.__cars_per_frame: Dict[int, List[Tuple[int, List[float]]]] = {
+            frame_number: list(zip(frame_results['car_id'].tolist(), frame_results['license_plate_bbox'].tolist()))
+            for frame_number, frame_results in frame_index.items()}
+
+        # Last frame that has to be decoded before a frame can be rendered
+        self.__ready_frame = {frame_number: max(self.__best_plates[car_id]['frame_number'] for car_id, _ in cars)
+                              for frame_number, cars in self.__cars_per_frame.items()}
+        self.__first_crop_attempted: Set[int] = set()
 
+        self.key_frames: List[Tuple[int, np.ndarray]] = []  # Key frames rendered by the last call
 
-def process_video(cap: cv2.VideoCapture, results: pd.DataFrame, license_plate: Dict[int, Dict[str, Any]],
-                  out: cv2.VideoWriter, license_plate_processor: LicensePlateProcessor) -> None:
+    def push(self, frame_number: int, frame: np.ndarray) -> List[np.ndarray]:
+        """
+        Captures the crops found in a decoded frame and renders the frames that are ready.
+
+        Args:
+            frame_number: Frame number.
+            frame: Decoded frame, not drawn on yet.
+
+        Returns:
+            List[np.ndarray]: Rendered frames in order, possibly empty.
+        """
+        self.capture_crops(frame_number, frame)
+        self.__frames.append((frame_number, frame))
+
+        ready = []
+        while self.__frames and (self.__ready_frame.get(self.__frames[0][0], -1) <= frame_number
+                                 or len(self.__frames) > self.__buffer_size):
+            ready.append(self.__frames.popleft())
+        return self.render(ready)
+
+    def flush(self) -> List[np.ndarray]:
+        """Renders all frames still held back."""
+        ready = list(self.__frames)
+        self.__frames.clear()
+        return self.render(ready)
+
+    def capture_crops(self, frame_number: int, frame: np.ndarray) -> None:
+        """Captures the best crops in this frame, and the first crop of cars whose best frame comes later."""
+        for car_id, license_bbox in self.__cars_per_frame.get(frame_number, []):
+            data = self.__best_plates[car_id]
+            if data['frame_number'] == frame_number:
+                self.__processor.capture_license_plate(car_id, frame, data['license_bbox'],
+                                                       data['license_plate_number'])
+            elif car_id not in self.__first_crop_attempted:
+                self.__first_crop_attempted.add(car_id)
+                self.__processor.capture_license_plate(car_id, frame, license_bbox, data['license_plate_number'])
+
+    def render(self, frames: List[Tuple[int, np.ndarray]]) -> List[np.ndarray]:
+        license_plate = self.__processor.get_license_plate()
+        self.key_frames = []
+
+        for frame_number, frame in frames:
+            if frame_number in self.__key_frame_numbers:
+                key_frame = frame.copy()
+                self.__processor.set_frame(key_frame)
+                process_frame(key_frame, self.__frame_index, license_plate, frame_number, self.__processor, (0, 255, 0))
+                self.key_frames.append((frame_number, key_frame))
+
+            self.__processor.set_frame(frame)
+            process_frame(frame, self.__frame_index, license_plate, frame_number, self.__processor)
+
+        return [frame for _, frame in frames]
+
+
+def process_video(cap: cv2.VideoCapture, frame_index: FrameIndex, out: cv2.VideoWriter,
+                  license_plate_processor: LicensePlateProcessor, uploaded_file: Dict[str, str], workspace: Workspace,
+                  plates_with_highest_score_data: np.ndarray, buffer_size: int,
+                  preview_out: Optional[cv2.VideoWriter] = None) -> None:
     """
     Processes a video by overlaying license plate information and writes the processed frames to output video.
 
+    The video is decoded once: license plate crops are captured, frames rendered and the frames with the highest
+    score saved in the same forward pass, see DelayedRenderBuffer. Decoding, rendering and encoding run as separate
+    stages on their own threads, connected by bounded queues.
+
     Args:
         cap: VideoCapture object.
-        results: DataFrame containing license plate data.
-        license_plate: Dictionary containing license plate data.
+        frame_index: Results grouped by frame number.
         out: VideoWriter object for output video.
-        license_plate_processor: Instance of LicensePlateProcessor.
+        license_plate_processor: Instance of LicensePlateProcessor without captured crops.
+        uploaded_file: Name and path of the uploaded file.
+        workspace: Workspace the processed frames are written to.
+        plates_with_highest_score_data: Records with the highest score for each car.
+        buffer_size: Maximum number of frames held back until the crops they need are captured.
+        preview_out: VideoWriter of the preview, receiving every PREVIEW_FRAME_STEP-th frame downscaled.
 
     Returns:
         None
     """
-    frame_number = -1
-    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    key_frame_numbers = set(plates_with_highest_score_data['frame_number'].tolist())
+    buffer = DelayedRenderBuffer(frame_index, license_plate_processor, key_frame_numbers, buffer_size)
+
+    def decode_frames():
+        frame_number = 0
+        while True:
+            ret, frame = cap.read()
+
+            # Break the loop if no frame is returned
+            if not ret:
+                break
+
+            yield frame_number, frame
+            frame_number += 1
+
+        # Marks the end of the video, so that the held back frames are rendered
+        yield None, None
+
+    def render_stage(item: Tuple[Optional[int], Optional[np.ndarray]]) -> List[np.ndarray]:
+        frame_number, frame = item
+        rendered = buffer.flush() if frame is None else buffer.push(frame_number, frame)
 
-    while True:
-        ret, frame = cap.read()
-        frame_number += 1
+        for key_frame_number, key_frame in buffer.key_frames:
+            frame_name = processed_frame_name(uploaded_file['name'], key_frame_number)
+            cv2.imwrite(os.path.join(workspace.processed_frames_dir, frame_name), key_frame)
+            save_thumbnail(key_frame, os.path.join(workspace.thumbnails_dir, thumbnail_name(frame_name)))
 
-        # Break the loop if no frame is returned
-        if not ret:
-            break
+        return rendered
 
-        # Process the current frame
-        license_plate_processor.set_frame(frame)
-        process_frame(frame, results, license_plate, frame_number, license_plate_processor)
+    encoded_frames = 0
 
-        # Write the processed frame to the output video
-        out.write(frame)
+    def encode_stage(frames: List[np.ndarray]) -> None:
+        nonlocal encoded_frames
+        for frame in frames:
+            out.write(frame)
 
-        frame = cv2.resize(frame, (1280, 720))
+            if preview_out is not None and encoded_frames % PREVIEW_FRAME_STEP == 0:
+                preview_out.write(downscale(frame, PREVIEW_WIDTH))
+            encoded_frames += 1
 
-    process_high_score_frames(cap, results, license_plate, license_plate_processor)
+    # Write the processed frames to the output video
+    stages = StagedPipeline(RENDER_QUEUE_SIZE)
+    stages.set_source('decode', decode_frames())
+    stages.add_stage('render', render_stage)
+    stages.add_stage('encode', encode_stage)
+    stages.run()
+    logger.info('Render stages:\n%s', stages.summary())
 
 
-def process_photo(image: np.ndarray, results: pd.DataFrame, license_plate: Dict[int, Dict[str, Any]],
-                  license_plate_processor: LicensePlateProcessor) -> None:
+def process_photo(image: np.ndarray, frame_index: FrameIndex, license_plate: Dict[int, Dict[str, Any]],
+                  license_plate_processor: LicensePlateProcessor, uploaded_file: Dict[str, str],
+                  workspace: Workspace) -> None:
     """
     Processes a single photo by overlaying license plate information and saves the processed photo.
 
     Args:
         image: Input image.
-        results: DataFrame containing license plate data.
+        frame_index: Results grouped by frame number.
         license_plate: Dictionary containing license plate data.
         license_plate_processor: Instance of LicensePlateProcessor.
+        uploaded_file: Name and path of the uploaded file.
+        workspace: Workspace the processed photo is written to.
 
     Returns:
         None
@@ -463,22 +603,55 @@ def process_photo(image: np.ndarray, results: pd.DataFrame, license_plate: Dict[
     frame_number = 0
 
     license_plate_processor.set_frame(image)
-    process_frame(image, results, license_plate, frame_number, license_plate_processor)
+    process_frame(image, frame_index, license_plate, frame_number, license_plate_processor)
 
-    output_path = str(os.path.join(OUTPUTS_DIR, 'processed_' + uploaded_file['name']))
+    output_path = str(os.path.join(workspace.outputs_dir, 'processed_' + uploaded_file['name']))
     cv2.imwrite(output_path, image)
 
-    process_frame(image, results, license_plate, frame_number, license_plate_processor, (0, 255, 0))
-    processed_frames_path = str(os.path.join(PROCESSED_FRAMES_DIR, f'processed_frame_' + uploaded_file['name']))
-    cv2.imwrite(processed_frames_path, image)
+    save_thumbnail(image, os.path.join(workspace.previews_dir, preview_name(uploaded_file['name'])), PREVIEW_WIDTH)
 
+    process_frame(image, frame_index, license_plate, frame_number, license_plate_processor, (0, 255, 0))
+    frame_name = processed_frame_name(uploaded_file['name'], frame_number)
+    cv2.imwrite(os.path.join(workspace.processed_frames_dir, frame_name), image)
+    save_thumbnail(image, os.path.join(workspace.thumbnails_dir, thumbnail_name(frame_name)))
 
-def start_with_video(results: pd.DataFrame) -> None:
+
+def render_image(image: np.ndarray, results: np.ndarray, frame_number: int, uploaded_file: Dict[str, str],
+                 workspace: Workspace) -> None:
+    """
+    Overlays the license plates found on one image of a batch, and saves it as a processed frame with its thumbnail.
+
+    Args:
+        image: Decoded image, drawn on in place.
+        results: Results array of the image.
+        frame_number: Index of the image in the batch.
+        uploaded_file: Name and path of the uploaded zip archive.
+        workspace: Workspace the processed frame is written to.
+
+    Returns:
+        None
+    """
+    license_plate_processor = LicensePlateProcessor(results, frame=image)
+    process_frame(image, FrameIndex(results), license_plate_processor.get_license_plate(), frame_number,
+                  license_plate_processor, (0, 255, 0))
+
+    frame_name = processed_frame_name(uploaded_file['name'], frame_number)
+    cv2.imwrite(os.path.join(workspace.processed_frames_dir, frame_name), image)
+    save_thumbnail(image, os.path.join(workspace.thumbnails_dir, thumbnail_name(frame_name)))
+
+
+def start_with_video(results: np.ndarray, uploaded_file: Dict[str, str], workspace: Workspace,
+                     plates_with_highest_score_data: np.ndarray,
+                     buffer_size: int = RENDER_BUFFER_SIZE) -> None:
     """
     Starts processing with a video input.
 
     Args:
-        results: DataFrame containing license plate data.
+        results: Results array containing license plate data.
+        uploaded_file: Name and path of the uploaded file.
+        workspace: Workspace the processed video and frames are written to.
+        plates_with_highest_score_data: Records with the highest score for each car.
+        buffer_size: Maximum number of frames held back until the crops they need are captured.
 
     Returns:
         None
@@ -491,26 +664,35 @@ def start_with_video(results: pd.DataFrame) -> None:
     fps = cap.get(cv2.CAP_PROP_FPS)
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    output_path = str(os.path.join(OUTPUTS_DIR, 'processed_' + uploaded_file['name']))
+    output_path = str(os.path.join(workspace.outputs_dir, 'processed_' + uploaded_file['name']))
     out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
 
-    license_plate_processor = LicensePlateProcessor(results, cap=cap)
-    license_plate = license_plate_processor.get_license_plate()
+    # Smaller, lower frame rate preview shown on the results page, the full video is linked
+    preview_size = scaled_size(width, height, PREVIEW_WIDTH)
+    preview_path = os.path.join(workspace.previews_dir, preview_name(uploaded_file['name']))
+    preview_out = cv2.VideoWriter(preview_path, fourcc, fps / PREVIEW_FRAME_STEP, preview_size)
+
+    # The license plate crops are captured while the video is decoded
+    license_plate_processor = LicensePlateProcessor(results)
 
     # Process each frame of the video and write processed frames to output video
-    process_video(cap, results, license_plate, out, license_plate_processor)
+    process_video(cap, FrameIndex(results), out, license_plate_processor, uploaded_file, workspace,
+                  plates_with_highest_score_data, buffer_size, preview_out)
 
     # Release resources
     out.release()
+    preview_out.release()
     cap.release()
 
 
-def start_with_photo(results: pd.DataFrame) -> None:
+def start_with_photo(results: np.ndarray, uploaded_file: Dict[str, str], workspace: Workspace) -> None:
     """
     Starts processing with a photo input.
 
     Args:
-        results: DataFrame containing license plate data.
+        results: Results array containing license plate data.
+        uploaded_file: Name and path of the uploaded file.
+        workspace: Workspace the processed photo is written to.
 
     Returns:
         None
@@ -520,18 +702,36 @@ def start_with_photo(results: pd.DataFrame) -> None:
     license_plate_processor = LicensePlateProcessor(results, frame=image)
     license_plate = license_plate_processor.get_license_plate()
 
-    process_photo(image, results, license_plate, license_plate_processor)
+    process_photo(image, FrameIndex(results), license_plate, license_plate_processor, uploaded_file, workspace)
 
 
-def main() -> None:
-    """Main function to start the processing."""
-    results = pd.read_csv(INTERPOLATED_CSV_FILE_PATH)
+def render(uploaded_file: Dict[str, str], workspace: Workspace, results: np.ndarray,
+           buffer_size: int = RENDER_BUFFER_SIZE) -> None:
+    """
+    Renders the processed photo or video and the frames with the highest score.
 
+    Args:
+        uploaded_file: Name and path of the uploaded file.
+        workspace: Workspace the rendered files are written to.
+        results: Interpolated results array.
+        buffer_size: Maximum number of video frames held back until the crops they need are captured.
+
+    Returns:
+        None
+    """
     if uploaded_file['name'].lower().endswith('.jpg'):  # ('.png', '.jpg', '.jpeg')
-        start_with_photo(results)
+        start_with_photo(results, uploaded_file, workspace)
     elif uploaded_file['name'].lower().endswith('.mp4'):  # ('.mp4', '.avi', '.mov')
-        start_with_video(results)
+        start_with_video(results, uploaded_file, workspace, get_plates_with_highest_score(results), buffer_size)
+
+
+def main() -> None:
+    """Main function to start the processing."""
+    results = load_results(SCRIPTS_WORKSPACE.interpolated_path)
+
+    render(SCRIPTS_WORKSPACE.get_uploaded_file_info(), SCRIPTS_WORKSPACE, results)
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     main()
@@ -0,0 +1,28 @@
+document.addEventListener('DOMContentLoaded', function () {
+    const statusElement = document.getElementById('job-status');
+    if (!statusElement) {
+        return;
+    }
+
+    const statusUrl = statusElement.dataset.statusUrl;
+    const pollInterval = 2000;
+
+    function pollStatus() {
+        fetch(statusUrl)
+            .then(response => response.json())
+            .then(job => {
+                if (job.status === 'done') {
+                    window.location.reload();
+                } else if (job.status === 'failed') {
+                    statusElement.textContent = 'Processing failed: ' + job.error;
+                } else {
+                    document.getElementById('job-state').textContent = job.status;
+                    document.getElementById('job-progress').textContent = job.progress;
+                    setTimeout(pollStatus, pollInterval);
+                }
+            })
+            .catch(() => setTimeout(pollStatus, pollInterval));
+    }
+
+    setTimeout(pollStatus, pollInterval);
+});